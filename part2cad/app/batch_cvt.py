@@ -0,0 +1,74 @@
+import os
+import argparse
+from functools import partial
+
+from part2cad.batch import BatchRunner, list_scenes, estimate_scene_cost
+from part2cad.cost_model import schedule_length
+
+from cvt_scene import arg_parser as cvt_arg_parser, run_cvt, load_cost_model
+
+
+def convert_scene_job(cvt_argv, scene):
+    # runs in a worker process
+    run_cvt(cvt_arg_parser(["--src", scene] + cvt_argv))
+
+
+def scene_cost_fn(cvt_args):
+    """estimate_scene_cost() with the loader and cost model of the
+    conversion arguments"""
+    return partial(estimate_scene_cost, loader_mode=cvt_args.loader, model=load_cost_model(cvt_args))
+
+
+##############################################################
+# Convert every scene of a dataset, resumable
+##############################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Batch Convert Part Scenes',
+        description="Other arguments are those of app/cvt_scene.py, applied to every scene")
+    parser.add_argument(
+        "--src",
+        dest="src",
+        type=str,
+        required=True,
+        help="Dataset root with one scene per entry, or a text file listing one scene per line"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        dest="checkpoint",
+        type=str,
+        default="batch_checkpoint.jsonl",
+        help="Checkpoint file, converted scenes are skipped when rerun (default: batch_checkpoint.jsonl)"
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        help="Number of scenes converted at once (default: #cpu)"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        help="Print the scenes left to convert and their estimated fitting time, without converting"
+    )
+
+    args, cvt_argv = parser.parse_known_args()
+
+    # fail early on invalid conversion arguments
+    cvt_args = cvt_arg_parser(["--src", args.src] + cvt_argv)
+
+    runner = BatchRunner(partial(convert_scene_job, cvt_argv), args.checkpoint, args.jobs, scene_cost_fn(cvt_args))
+
+    if args.dry_run:
+        jobs, n_skipped = runner.plan(list_scenes(args.src))
+        print("[INFO] {} scenes to convert, {} already done".format(len(jobs), n_skipped))
+        for scene, cost in jobs:
+            print("    {:>10.1f}s  {}".format(cost, scene))
+
+        n_jobs = args.jobs or os.cpu_count()
+        print("[INFO] Estimated {:.1f}s of fitting, {:.1f}s with {} jobs".format(
+            sum([c for _, c in jobs]), schedule_length([c for _, c in jobs], n_jobs), n_jobs))
+    else:
+        runner.run(list_scenes(args.src))
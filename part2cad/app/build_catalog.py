@@ -0,0 +1,29 @@
+import argparse
+
+from part2cad.catalog import build_catalog
+
+
+def arg_parser():
+    parser = argparse.ArgumentParser(prog='Build Dataset Catalog')
+    parser.add_argument(
+        "--root",
+        dest="root",
+        type=str,
+        required=True,
+        help="Dataset root: a scene directory or a directory of scenes"
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        type=str,
+        default=None,
+        help="Index file (default: <root>/part2cad_catalog.json)"
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = arg_parser()
+
+    build_catalog(args.root, args.output)
@@ -0,0 +1,131 @@
+import os
+import sys
+import argparse
+
+from part2cad.loader import get_scene_name
+from part2cad.precision import set_precision
+from part2cad.tracing import start_trace, finish_trace, get_trace_file
+
+from cvt_scene import arg_parser as cvt_arg_parser, cvt_options, convert_scene, print_fit_stats
+
+##############################################################
+# Convert a scene and build its xacro scene in one process,
+# without the scene_builder/input round trip
+##############################################################
+def build_scene(scene_root_dir, loader_mode, scene_builder_root, output_name=None, articulated_mesh_db=None,
+        enable_vrgym=False, enable_physics=True, enable_gazebo=False, dedup=False, **options):
+    # the scene builder is a ROS package with flat imports
+    sys.path.insert(0, os.path.join(os.path.abspath(scene_builder_root), "scripts"))
+    from xacro_scene_builder import XacroSceneBuilder
+    from scene_builder_config import SceneBuilderConfig
+    from tracing import set_trace_file as set_builder_trace_file
+
+    # the scene builder has its own copy of the tracing module
+    set_builder_trace_file(get_trace_file())
+
+    kgraph = convert_scene(scene_root_dir, loader_mode, **options)
+
+    # equal part geometries share one mesh, as with cvt_scene --dedup
+    if dedup:
+        kgraph.assign_content_ids()
+
+    config = SceneBuilderConfig(
+        input_scene_dir=scene_root_dir,
+        scene_builder_root=os.path.abspath(scene_builder_root),
+        output_dir_name=output_name or get_scene_name(scene_root_dir),
+        rigid_mesh_db=None,
+        articulated_mesh_db=articulated_mesh_db,
+        enable_vrgym=enable_vrgym,
+        enable_physics=enable_physics,
+        enable_gazebo=enable_gazebo
+    )
+
+    builder = XacroSceneBuilder()
+    builder.generate(config, graph=kgraph.dump(), meshes=kgraph.meshes())
+
+
+def arg_parser():
+    parser = argparse.ArgumentParser(prog='Build Part Scene',
+        description="Other arguments are those of app/cvt_scene.py")
+    parser.add_argument(
+        "--scene-builder-root",
+        dest="scene_builder_root",
+        type=str,
+        default="scene_builder",
+        help="Directory of the scene_builder package (default: scene_builder)"
+    )
+    parser.add_argument(
+        "--name",
+        dest="name",
+        type=str,
+        default=None,
+        help="Output scene name (default: name of the input scene)"
+    )
+    parser.add_argument(
+        "--articulated-mesh-db",
+        dest="articulated_mesh_db",
+        type=str,
+        default=None,
+        help="Articulated CAD database"
+    )
+    parser.add_argument(
+        "--vrgym",
+        dest="vrgym",
+        action="store_true",
+        help="Enable VRGym export"
+    )
+    parser.add_argument(
+        "--no-physics",
+        dest="physics",
+        action="store_false",
+        help="Disable the physical properties of the objects"
+    )
+    parser.add_argument(
+        "--gazebo",
+        dest="gazebo",
+        action="store_true",
+        help="Enable Gazebo export"
+    )
+
+    args, cvt_argv = parser.parse_known_args()
+    cvt_args = cvt_arg_parser(cvt_argv)
+
+    # the scene is converted in memory, nothing of part2cad is written
+    for flag in ["pipeline", "stream", "dry_run"]:
+        if getattr(cvt_args, flag):
+            raise Exception("Does not support conversion mode: `--{}`".format(flag.replace("_", "-")))
+
+    if cvt_args.bundle is not None:
+        raise Exception("Does not support mesh bundle mode: `{}`".format(cvt_args.bundle))
+
+    return args, cvt_args
+
+
+if __name__ == "__main__":
+    args, cvt_args = arg_parser()
+
+    set_precision(cvt_args.precision)
+
+    options = cvt_options(cvt_args)
+    options.pop("bundle")
+    options.pop("graph_format")
+
+    if cvt_args.trace is not None:
+        start_trace(cvt_args.trace)
+
+    try:
+        build_scene(
+            cvt_args.src,
+            cvt_args.loader,
+            args.scene_builder_root,
+            output_name=args.name,
+            articulated_mesh_db=args.articulated_mesh_db,
+            enable_vrgym=args.vrgym,
+            enable_physics=args.physics,
+            enable_gazebo=args.gazebo,
+            **options
+        )
+    finally:
+        finish_trace()
+
+    print_fit_stats(options["cache"], options["library"])
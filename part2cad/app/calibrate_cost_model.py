@@ -0,0 +1,112 @@
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from part2cad.batch import list_scenes
+from part2cad.loader import scene_backend, OBJECT_LOADERS
+from part2cad.types import parse_seg_object_pointclouds
+from part2cad.core import fit_object
+from part2cad.cost_model import part_label_histogram, fit_cost_model
+from part2cad.constants import DBSCAN_EPS, CONTACT_DIST_THRESHOLD
+
+
+def measure_object_fit(obj_points, object_idx, dbscan_eps, contact_dist):
+    """Fit an object and record what the cost model is calibrated on"""
+    instances = dict()
+    for pc in parse_seg_object_pointclouds(obj_points, dbscan_eps):
+        instances[int(pc.part_id)] = instances.get(int(pc.part_id), 0) + 1
+
+    start = time.time()
+    fit_object(obj_points, object_idx, dbscan_eps=dbscan_eps, contact_dist=contact_dist)
+    seconds = time.time() - start
+
+    # tracing slows the fit down, memory is measured on a second fit
+    tracemalloc.start()
+    fit_object(obj_points, object_idx, dbscan_eps=dbscan_eps, contact_dist=contact_dist)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "n_points": int(obj_points.shape[0]),
+        "labels": part_label_histogram(obj_points),
+        "instances": instances,
+        "seconds": seconds,
+        "memory": peak
+    }
+
+
+##############################################################
+# Calibrate the cost model of the dry-run planner on scenes
+##############################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Calibrate Cost Model')
+    parser.add_argument(
+        "--src",
+        dest="src",
+        type=str,
+        required=True,
+        help="Scene, dataset root or text file listing one scene per line"
+    )
+    parser.add_argument(
+        "--loader",
+        dest="loader",
+        type=str,
+        default="gt",
+        help="Loader: <gt>, <snet>"
+    )
+    parser.add_argument(
+        "--fractions",
+        dest="fractions",
+        type=float,
+        nargs="+",
+        default=[1.0],
+        help="Also fit evenly spaced subsamples of each object, for more samples (default: 1.0)"
+    )
+    parser.add_argument(
+        "--dbscan-eps",
+        dest="dbscan_eps",
+        type=float,
+        default=DBSCAN_EPS
+    )
+    parser.add_argument(
+        "--contact-dist",
+        dest="contact_dist",
+        type=float,
+        default=CONTACT_DIST_THRESHOLD
+    )
+    parser.add_argument(
+        "--out",
+        dest="out",
+        type=str,
+        default="cost_model.json",
+        help="Calibrated model file (default: cost_model.json)"
+    )
+
+    args = parser.parse_args()
+
+    samples = []
+    for scene in list_scenes(args.src):
+        with scene_backend(scene) as backend:
+            for object_idx, name in enumerate(backend.list_objects()):
+                obj_points = OBJECT_LOADERS[args.loader](backend, name)
+
+                for fraction in args.fractions:
+                    n_points = max(int(len(obj_points) * fraction), 1)
+                    points = obj_points[np.linspace(0, len(obj_points) - 1, n_points).astype(int)]
+
+                    sample = measure_object_fit(points, object_idx, args.dbscan_eps, args.contact_dist)
+                    samples.append(sample)
+
+                    print("[INFO] `{}/{}` x{}: {} points, {} parts in {:.2f}s, peak {:.1f}MB".format(
+                        scene, name, fraction, sample["n_points"], sum(sample["instances"].values()),
+                        sample["seconds"], sample["memory"] / (1 << 20)))
+
+    model = fit_cost_model(samples)
+    model.save(args.out)
+
+    print("[INFO] Cost model of {} samples saved at `{}`".format(len(samples), args.out))
+    for s in samples:
+        print("    {} points: measured {:.2f}s, predicted {:.2f}s".format(
+            s["n_points"], s["seconds"], model.predict(s["n_points"], s["labels"])["seconds"]))
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import socket
+import argparse
+
+# only standard modules here, the client must start instantly
+
+DAEMON_SOCKET = "/tmp/part2cad.sock"
+
+
+##############################################################
+# Line-delimited JSON messages over a Unix socket
+#
+#   client -> daemon    {"argv": [...], "cwd": str}     convert a scene
+#                       {"shutdown": true}              stop the daemon
+#   daemon -> client    {"type": "log", "line": str}    progress output
+#                       {"type": "result", "ok": bool, "elapsed": float,
+#                        "error": str}                  end of the job
+##############################################################
+def send_message(sock, msg):
+    sock.sendall((json.dumps(msg) + "\n").encode())
+
+
+def iter_messages(sock):
+    buf = b""
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return
+
+        buf += data
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            yield json.loads(line.decode())
+
+
+def submit_job(socket_path, msg, out=sys.stdout):
+    """Send a job to the daemon and echo its progress
+
+    Returns:
+        dict: the result message, None if the daemon closed the connection
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        raise Exception("No conversion daemon on `{}`, start app/cvt_daemon.py".format(socket_path))
+
+    with sock:
+        send_message(sock, msg)
+
+        for reply in iter_messages(sock):
+            if reply["type"] == "log":
+                out.write(reply["line"] + "\n")
+                out.flush()
+            elif reply["type"] == "result":
+                return reply
+
+    return None
+
+
+##############################################################
+# Convert a scene in a running app/cvt_daemon.py
+##############################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Convert Part Scene Client',
+        description="Other arguments are those of app/cvt_scene.py")
+    parser.add_argument(
+        "--socket",
+        dest="socket",
+        type=str,
+        default=DAEMON_SOCKET,
+        help="Daemon socket (default: {})".format(DAEMON_SOCKET)
+    )
+    parser.add_argument(
+        "--shutdown",
+        dest="shutdown",
+        action="store_true",
+        help="Stop the daemon once its current jobs are done"
+    )
+
+    args, cvt_argv = parser.parse_known_args()
+
+    if args.shutdown:
+        msg = {"shutdown": True}
+    else:
+        msg = {"argv": cvt_argv, "cwd": os.getcwd()}
+
+    result = submit_job(args.socket, msg)
+
+    if result is None:
+        print("[ERROR] Daemon closed the connection")
+        sys.exit(1)
+
+    if not result["ok"]:
+        print("[ERROR] {}".format(result["error"]))
+        sys.exit(1)
+
+    if not args.shutdown:
+        print("[INFO] Converted in {:.2f}s".format(result["elapsed"]))
@@ -0,0 +1,206 @@
+import os
+import io
+import time
+import argparse
+import threading
+import traceback
+import socketserver
+from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# the conversion modules are imported once here, forked workers inherit them
+from cvt_scene import arg_parser as cvt_arg_parser, run_cvt
+from cvt_client import DAEMON_SOCKET, send_message, iter_messages
+
+
+def warm_up_task(_):
+    return os.getpid()
+
+
+class SocketWriter(io.TextIOBase):
+    """Text stream forwarding complete lines to a client as log messages"""
+
+    def __init__(self, sock):
+        self.sock_ = sock
+        self.buf_ = ""
+
+
+    def writable(self):
+        return True
+
+
+    def write(self, s):
+        self.buf_ += s
+        while "\n" in self.buf_:
+            line, self.buf_ = self.buf_.split("\n", 1)
+            self.send_(line)
+        return len(s)
+
+
+    def flush(self):
+        if len(self.buf_) > 0:
+            self.send_(self.buf_)
+            self.buf_ = ""
+
+
+    def send_(self, line):
+        try:
+            send_message(self.sock_, {"type": "log", "line": line})
+        except OSError:
+            # client went away, the job still completes
+            pass
+
+
+class ConversionDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, n_workers=None):
+        """Conversion server keeping the modules imported and a process pool
+        alive between jobs
+
+        Clients connect to `socket_path`, see app/cvt_client.py for the
+        messages. Jobs run one at a time: they redirect the output and
+        change the working directory of the daemon. Pipeline jobs fit
+        their objects in the shared pool.
+
+        Args:
+            socket_path (str): Unix socket path, replaced if stale
+            n_workers (int): size of the process pool (default: #cpu)
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        socketserver.UnixStreamServer.__init__(self, socket_path, JobHandler)
+
+        self.socket_path_ = socket_path
+        self.n_workers_ = n_workers or os.cpu_count()
+        self.job_lock_ = threading.Lock()
+        self.executor_ = None
+
+        self.start_executor_()
+
+
+    def start_executor_(self):
+        self.executor_ = ProcessPoolExecutor(max_workers=self.n_workers_)
+
+        # spawn the workers now rather than on the first job
+        list(self.executor_.map(warm_up_task, range(self.n_workers_)))
+
+
+    def run_job(self, argv, cwd, out):
+        """Convert a scene as app/cvt_scene.py would with `argv`, run from
+        `cwd`
+
+        Returns:
+            str: error message, None on success
+        """
+        with self.job_lock_:
+            prev_cwd = os.getcwd()
+            start = time.time()
+            error, broken = None, False
+
+            try:
+                with redirect_stdout(out), redirect_stderr(out):
+                    os.chdir(cwd)
+                    args = cvt_arg_parser(argv)
+                    if args.pipeline and args.workers is None:
+                        args.workers = self.n_workers_
+                    run_cvt(args, executor=self.executor_)
+            except SystemExit:
+                # argparse has written the usage to the client
+                error = "Invalid arguments"
+            except BrokenProcessPool as e:
+                error, broken = "Worker process died: {}".format(e), True
+            except Exception as e:
+                traceback.print_exc()
+                error = str(e)
+            finally:
+                out.flush()
+                os.chdir(prev_cwd)
+
+            # respawned workers start from the daemon directory, not the job's
+            if broken:
+                print("[WARN] Process pool broken, restarting it")
+                self.executor_.shutdown(wait=False)
+                self.start_executor_()
+
+            # still under the lock, output redirection is process-wide and
+            # the next job may redirect it to its own client
+            print("[INFO] Job {} in {:.2f}s".format("done" if error is None else "failed", time.time() - start))
+
+        return error
+
+
+    def shutdown_(self):
+        # shutdown() waits for serve_forever(), which runs in another thread
+        threading.Thread(target=self.shutdown).start()
+
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+
+        self.executor_.shutdown()
+        if os.path.exists(self.socket_path_):
+            os.remove(self.socket_path_)
+
+
+class JobHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        msg = next(iter_messages(self.request), None)
+        if msg is None:
+            return
+
+        if msg.get("shutdown"):
+            send_message(self.request, {"type": "result", "ok": True, "elapsed": 0.0, "error": None})
+            self.server.shutdown_()
+            return
+
+        out = SocketWriter(self.request)
+        if self.server.job_lock_.locked():
+            out.write("Waiting for the running job\n")
+
+        start = time.time()
+        error = self.server.run_job(msg["argv"], msg["cwd"], out)
+        elapsed = time.time() - start
+
+        try:
+            send_message(self.request, {"type": "result", "ok": error is None, "elapsed": elapsed, "error": error})
+        except OSError:
+            pass
+
+
+##############################################################
+# Persistent conversion daemon, jobs are sent by app/cvt_client.py
+##############################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Convert Part Scene Daemon')
+    parser.add_argument(
+        "--socket",
+        dest="socket",
+        type=str,
+        default=DAEMON_SOCKET,
+        help="Socket to listen on (default: {})".format(DAEMON_SOCKET)
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="Number of warm fitting processes (default: #cpu)"
+    )
+    args = parser.parse_args()
+
+    daemon = ConversionDaemon(args.socket, args.workers)
+    print("Listening on {} with {} workers".format(args.socket, daemon.n_workers_))
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+
+    print("[INFO] Daemon stopped")
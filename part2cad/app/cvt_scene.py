@@ -1,45 +1,250 @@
 import os
 import sys
+import random
 import argparse
+from functools import partial
 
-from part2cad.types import parse_seg_object_pointclouds
 from part2cad.loader import load_gt_scene, load_structurenet_scene
-from part2cad.core import CadScene
+from part2cad.loader import open_scene, get_scene_name, load_background, OBJECT_LOADERS
+from part2cad.catalog import DatasetCatalog
+from part2cad.cost_model import CostModel, scan_scene
+from part2cad.core import CadScene, ObjectCache, ShapeLibrary, fit_object
+from part2cad.constants import ASSET_DIR, DBSCAN_EPS, CONTACT_DIST_THRESHOLD
+from part2cad.pipeline import Stage, StagedPipeline
+from part2cad.precision import set_precision, get_precision
+from part2cad.shm import share_array, receive_array, release_arrays
+from part2cad.shm import share_graph_meshes, receive_graph_meshes, release_graph_meshes
+from part2cad.tracing import span, start_trace, finish_trace, set_trace_file, get_trace_file
 from part2cad.visualization import show_part_pointclouds
 
 ##############################################################
 # Convert scene to part-based CAD objects
 ##############################################################
-def cvt_scene(scene_root_dir, loader_mode):
+def cvt_scene(scene_root_dir, loader_mode, catalog=None, bundle=None, graph_format="json", dedup=False, bg_voxel=None,
+        fit_params=None, cache=None, library=None):
+    kgraph = convert_scene(scene_root_dir, loader_mode, catalog, bg_voxel, fit_params, cache, library)
+    
+    output_dir = get_output_dir(scene_root_dir)
+    kgraph.save(output_dir, bundle=bundle, graph_format=graph_format, dedup=dedup)
+
+
+@span("convert_scene")
+def convert_scene(scene_root_dir, loader_mode, catalog=None, bg_voxel=None, fit_params=None, cache=None, library=None):
+    """Convert a scene in memory
+
+    Returns:
+        KinoGraph: the scene graph, meshes included
+    """
     if loader_mode == "gt":
         print("Load from ground-truth outputs")
-        bg_points, obj_points_list = load_gt_scene(scene_root_dir)
+        bg_points, obj_points_list = load_gt_scene(scene_root_dir, catalog, bg_voxel)
     elif loader_mode == "snet":
         print("Load from structurenet outputs")
-        bg_points, obj_points_list = load_structurenet_scene(scene_root_dir)
+        bg_points, obj_points_list = load_structurenet_scene(scene_root_dir, catalog, bg_voxel)
     
     scene = CadScene()
 
     scene.add_background(bg_points)
 
-    for obj_points in obj_points_list:
-        obj_pcs = parse_seg_object_pointclouds(obj_points)
-        scene.add_object(obj_pcs)
+    for object_idx, obj_points in enumerate(obj_points_list):
+        scene.add_object_graph(fit_scene_object(obj_points, object_idx, loader_mode, fit_params, cache, library)[0])
+
+    return scene.create_kino_graph()
+
+
+def cvt_scene_stream(scene_root_dir, loader_mode, catalog=None, bundle=None, graph_format="json", dedup=False,
+        bg_voxel=None, fit_params=None, cache=None, library=None):
+    """Convert a scene in bounded memory
+
+    Objects are loaded one at a time, written out as soon as they are
+    added and released, so only one object is held at any time.
+    """
+    output_dir = get_output_dir(scene_root_dir)
+
+    scene = CadScene(output_dir, bundle=bundle, dedup=dedup)
+    loader = OBJECT_LOADERS[loader_mode]
+
+    with open_scene(scene_root_dir, catalog) as backend:
+        scene.add_background(load_background(backend, bg_voxel))
+
+        for object_idx, obj_name in enumerate(backend.list_objects()):
+            obj_points = loader(backend, obj_name)
+            scene.add_object_graph(fit_scene_object(obj_points, object_idx, loader_mode, fit_params, cache, library)[0])
+
+    scene.finish_export(graph_format)
+
+
+def get_output_dir(scene_root_dir):
+    return os.path.join("scene_builder", "input", get_scene_name(scene_root_dir))
+
+
+def fit_scene_object(obj_points, object_idx, loader_mode, fit_params=None, cache=None, library=None, prior=None):
+    """Fit an object, through the result cache and the shape library
+    when given
+
+    Args:
+        prior (list of tuple): mesh states of a previous fit to start from,
+            not part of the cache key
+
+    Returns:
+        PartGraph: the object part graph indexed from 0
+        list of tuple: mesh states of the parts, None if reused from the
+            shape library
+    """
+    # part colors are drawn from `random`, seed each object so that the
+    # output does not depend on the mode or on which worker fits it
+    random.seed(object_idx)
+
+    fit_params = fit_params or dict()
+    fit_fn = library.fit if library is not None else fit_object
+
+    if "time_budget_factor" in fit_params:
+        # budget relative to the predicted fitting time of the object
+        fit_params = dict(fit_params)
+        factor = fit_params.pop("time_budget_factor")
+        model = CostModel(fit_params.pop("cost_model", None))
+        fit_params["time_budget"] = factor * model.predict_points(obj_points)["seconds"]
+
+    if prior is not None:
+        fit_fn = partial(fit_fn, prior=prior)
+
+    if cache is None:
+        return fit_fn(obj_points, object_idx, **fit_params)
+
+    return cache.fit(obj_points, object_idx, loader_mode, fit_fn=fit_fn, **fit_params)
+
+
+def load_object_task(backend, loader, job):
+    object_idx, obj_name = job
+    # points and meshes cross process boundaries in shared memory
+    return object_idx, share_array(loader(backend, obj_name))
+
+
+def fit_object_task(precision, trace_file, loader_mode, fit_params, cache, library, job):
+    # runs in a worker process, must stay at module level to be picklable
+    object_idx, shared_points = job
+    obj_points = receive_array(shared_points)
+    set_precision(precision)
+    set_trace_file(trace_file)
+
+    # hits and misses of this fit, counted back by register_object_task()
+    before = [c.stats if c is not None else None for c in [cache, library]]
+    pg = fit_scene_object(obj_points, object_idx, loader_mode, fit_params, cache, library)[0]
+    stats = [{k: c.stats[k] - b[k] for k in b.keys()} if c is not None else None for c, b in zip([cache, library], before)]
+
+    return share_graph_meshes(pg), stats
+
+
+def register_object_task(scene, cache, library, result):
+    shared_pg, stats = result
+    for c, s in zip([cache, library], stats):
+        if c is not None:
+            c.add_stats(s)
+
+    return scene.add_object_graph(receive_graph_meshes(shared_pg))
+
+
+# shared memory blocks of items dropped by a failed pipeline, freed rather
+# than left until the process exits
+def discard_points_(job):
+    release_arrays(job[1])
+
+
+def discard_graph_(result):
+    release_graph_meshes(result[0])
+
+
+def save_object_task(asset_dir, bundle, dedup, pg):
+    pg.save_mesh(asset_dir, bundle=bundle == "object", dedup=dedup)
+    return pg
+
+
+##############################################################
+# Staged pipeline: load -> fit -> register -> save
+##############################################################
+def cvt_scene_pipeline(scene_root_dir, loader_mode, n_workers=None, queue_size=2, catalog=None, bundle=None,
+        graph_format="json", dedup=False, stream=False, bg_voxel=None, fit_params=None, cache=None, library=None,
+        executor=None):
+    """Convert a scene with overlapping I/O and compute stages
+
+    Object arrays are prefetched by loader threads while previous
+    objects are segmented, fitted and assembled in worker processes.
+    Finished object graphs are registered in scene order and their
+    meshes are written by a saver thread as later objects compute.
+    A scene bundle needs every object, it is written once the pipeline
+    is drained. In streaming mode objects are written and released as
+    they are registered, see cvt_scene_stream(). Object points and
+    fitted meshes are passed to and from the workers in shared memory,
+    see shm.py. The result cache and the shape library are shared by the
+    worker processes through their directories. A warm process pool can
+    be passed as `executor`, it is left running, see app/cvt_daemon.py.
+    """
+    n_workers = n_workers or os.cpu_count()
+
+    output_dir = get_output_dir(scene_root_dir)
+    asset_dir = "{}/{}".format(output_dir, ASSET_DIR)
+
+    scene = CadScene(output_dir, bundle=bundle, dedup=dedup) if stream else CadScene()
+
+    backend = open_scene(scene_root_dir, catalog, read_ahead=2)
+    obj_names = backend.list_objects()
+    scene.add_background(load_background(backend, bg_voxel))
+
+    load_task = partial(load_object_task, backend, OBJECT_LOADERS[loader_mode])
+
+    stages = [
+        Stage("load", load_task, mode="thread", n_workers=2),
+        Stage("fit", partial(fit_object_task, get_precision(), get_trace_file(), loader_mode, fit_params, cache, library), mode="process", n_workers=n_workers,
+            discard=discard_points_),
+        Stage("register", partial(register_object_task, scene, cache, library), mode="thread", ordered=True,
+            discard=discard_graph_)
+    ]
+    if bundle != "scene" and not stream:
+        stages.append(Stage("save", partial(save_object_task, asset_dir, bundle, dedup), mode="thread"))
+
+    pipeline = StagedPipeline(stages, queue_size=queue_size, executor=executor)
+
+    print("Run staged pipeline on {} objects with {} workers".format(len(obj_names), n_workers))
+    try:
+        pipeline.run(list(enumerate(obj_names)))
+    finally:
+        backend.close()
+
+    if stream:
+        scene.finish_export(graph_format)
+        return
 
     kgraph = scene.create_kino_graph()
-    
-    output_dir = os.path.join("scene_builder", "input", scene_root_dir.split('/')[-1])
-    kgraph.save(output_dir)
 
+    if bundle == "scene":
+        kgraph.save(output_dir, bundle=bundle, graph_format=graph_format, dedup=dedup)
+        return
+
+    kgraph.save(output_dir, save_mesh=False, graph_format=graph_format, dedup=dedup)
+
+    # objects were saved by the pipeline, only the background is left
+    for bg in scene.backgrounds:
+        bg.save_mesh(asset_dir)
+
+
+def print_cost_estimate(scene_dir, estimate, n_workers):
+    print("[INFO] Estimated cost of `{}`".format(scene_dir))
+    print("    {:<24}{:>10}{:>8}{:>8}{:>10}{:>12}".format("object", "points", "labels", "parts", "fit (s)", "memory (MB)"))
+    for o in estimate["objects"]:
+        print("    {:<24}{:>10}{:>8}{:>8.1f}{:>10.1f}{:>12.1f}".format(
+            o["name"], o["n_points"], len(o["labels"]), o["parts"], o["seconds"], o["memory"] / (1 << 20)))
+    print("    {:.1f}s of fitting, {:.1f}s with {} workers, peak {:.1f}MB".format(
+        estimate["seconds"], estimate["wall"], n_workers, estimate["memory"] / (1 << 20)))
 
-def arg_parser():
+
+def arg_parser(argv=None):
     parser = argparse.ArgumentParser(prog='Convert Part Scene')
     parser.add_argument(
         "--src",
         dest="src",
         type=str,
         required=True,
-        help="Input scene directory"
+        help="Input scene directory, tar / zip archive or packed scene file (.p2cs)"
     )
     parser.add_argument(
         "--loader",
@@ -48,21 +253,241 @@ def arg_parser():
         required=True,
         help="Loader mode: <gt>, <snet>"
     )
+    parser.add_argument(
+        "--pipeline",
+        dest="pipeline",
+        action="store_true",
+        help="Overlap loading, fitting and saving in a staged pipeline"
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="Number of fitting processes in pipeline mode (default: #cpu)"
+    )
+    parser.add_argument(
+        "--catalog",
+        dest="catalog",
+        type=str,
+        default=None,
+        help="Dataset catalog index built by app/build_catalog.py"
+    )
+    parser.add_argument(
+        "--bundle",
+        dest="bundle",
+        type=str,
+        default=None,
+        help="Bundle part meshes: <object>, <scene> (default: one .stl per part)"
+    )
+    parser.add_argument(
+        "--dedup",
+        dest="dedup",
+        action="store_true",
+        help="Save each distinct part geometry once, named by its content hash"
+    )
+    parser.add_argument(
+        "--stream",
+        dest="stream",
+        action="store_true",
+        help="Write and release each object once converted, stitch the graph at the end"
+    )
+    parser.add_argument(
+        "--graph-format",
+        dest="graph_format",
+        type=str,
+        default="json",
+        help="Kinematic graph format: <json>, <json-stream>, <npz>"
+    )
+    parser.add_argument(
+        "--bg-voxel",
+        dest="bg_voxel",
+        type=float,
+        default=None,
+        help="Voxel-downsample the background to this resolution in meters (default: keep all points)"
+    )
+    parser.add_argument(
+        "--dbscan-eps",
+        dest="dbscan_eps",
+        type=float,
+        default=DBSCAN_EPS,
+        help="Radius splitting a part label into instances (default: {})".format(DBSCAN_EPS)
+    )
+    parser.add_argument(
+        "--contact-dist",
+        dest="contact_dist",
+        type=float,
+        default=CONTACT_DIST_THRESHOLD,
+        help="Max distance between parts in contact (default: {})".format(CONTACT_DIST_THRESHOLD)
+    )
+    parser.add_argument(
+        "--time-budget",
+        dest="time_budget",
+        type=float,
+        default=None,
+        help="Seconds to fit each object, the fit degrades to cheaper steps as they run out (default: no limit)"
+    )
+    parser.add_argument(
+        "--time-budget-factor",
+        dest="time_budget_factor",
+        type=float,
+        default=None,
+        help="Time budget of each object as a multiple of its predicted fitting time, see --cost-model"
+    )
+    parser.add_argument(
+        "--cost-model",
+        dest="cost_model",
+        type=str,
+        default=None,
+        help="Cost model file written by app/calibrate_cost_model.py (default: built-in model)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        help="Print the estimated runtime and memory of the conversion, without converting"
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        type=str,
+        default=None,
+        help="Cache fitted objects in this directory, reused while points and parameters are unchanged"
+    )
+    parser.add_argument(
+        "--cache-size",
+        dest="cache_size",
+        type=int,
+        default=1024,
+        help="Cache size bound in MB, least recently used objects are evicted (default: 1024)"
+    )
+    parser.add_argument(
+        "--library",
+        dest="library",
+        type=str,
+        default=None,
+        help="Shape library directory, near-duplicate objects reuse stored fits"
+    )
+    parser.add_argument(
+        "--trace",
+        dest="trace",
+        type=str,
+        default=None,
+        help="Save the timings of the conversion stages to this Chrome trace JSON file (chrome://tracing, ui.perfetto.dev)"
+    )
+    parser.add_argument(
+        "--precision",
+        dest="precision",
+        type=str,
+        default="float64",
+        help="Point cloud precision: <float64>, <float32>"
+    )
     # by default args.output == False
     parser.add_argument("-v", "--verbose", action="store_true")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.loader not in ["gt", "snet"]:
         raise Exception("Does not support loader: `{}`".format(args.loader))
+
+    if args.bundle not in [None, "object", "scene"]:
+        raise Exception("Does not support mesh bundle mode: `{}`".format(args.bundle))
+
+    if args.graph_format not in ["json", "json-stream", "npz"]:
+        raise Exception("Does not support graph format: `{}`".format(args.graph_format))
+
+    if args.time_budget is not None and args.time_budget <= 0:
+        raise Exception("Invalid time budget: `{}`".format(args.time_budget))
+
+    if args.time_budget_factor is not None and args.time_budget_factor <= 0:
+        raise Exception("Invalid time budget factor: `{}`".format(args.time_budget_factor))
+
+    if args.time_budget is not None and args.time_budget_factor is not None:
+        raise Exception("Use either --time-budget or --time-budget-factor")
+
+    if args.stream and args.bundle == "scene":
+        raise Exception("Streaming export does not support mesh bundle mode: `scene`")
     
     return args
 
 
-if __name__ == "__main__":
-    args = arg_parser()
+def cvt_options(args):
+    """Keyword arguments of cvt_scene() given by parsed command line
+    arguments, see arg_parser()
+    """
+    catalog = DatasetCatalog(args.catalog) if args.catalog is not None else None
+
+    fit_params = {"enable_scale": True, "dbscan_eps": args.dbscan_eps, "contact_dist": args.contact_dist}
+    if args.time_budget is not None:
+        fit_params["time_budget"] = args.time_budget
+    if args.time_budget_factor is not None:
+        fit_params["time_budget_factor"] = args.time_budget_factor
+        fit_params["cost_model"] = load_cost_model(args).params
+    cache = ObjectCache(args.cache, args.cache_size << 20) if args.cache is not None else None
+    library = ShapeLibrary(args.library) if args.library is not None else None
+
+    return {
+        "catalog": catalog,
+        "bundle": args.bundle,
+        "graph_format": args.graph_format,
+        "dedup": args.dedup,
+        "bg_voxel": args.bg_voxel,
+        "fit_params": fit_params,
+        "cache": cache,
+        "library": library
+    }
 
+
+def load_cost_model(args):
+    return CostModel.load(args.cost_model) if args.cost_model is not None else CostModel()
+
+
+def print_fit_stats(cache=None, library=None):
+    if cache is not None:
+        print("[INFO] Object cache: {hits} hits, {misses} misses".format(**cache.stats))
+
+    if library is not None:
+        print("[INFO] Shape library: {hits} hits, {misses} misses".format(**library.stats))
+
+
+def run_cvt(args, executor=None):
+    """Convert the scene described by parsed command line arguments
+
+    Args:
+        args (argparse.Namespace): see arg_parser()
+        executor (ProcessPoolExecutor): warm pool for the fitting stage in
+            pipeline mode, a private pool is created otherwise
+    """
     scene_dir = args.src
     loader_mode = args.loader
 
-    cvt_scene(scene_dir, loader_mode)
\ No newline at end of file
+    set_precision(args.precision)
+
+    if args.dry_run:
+        catalog = DatasetCatalog(args.catalog) if args.catalog is not None else None
+        n_workers = (args.workers or os.cpu_count()) if args.pipeline else 1
+        print_cost_estimate(scene_dir, load_cost_model(args).estimate_scene(scan_scene(scene_dir, loader_mode, catalog),
+            n_workers), n_workers)
+        return
+
+    options = cvt_options(args)
+
+    if args.trace is not None:
+        start_trace(args.trace)
+
+    try:
+        with span("convert", scene=scene_dir):
+            if args.pipeline:
+                cvt_scene_pipeline(scene_dir, loader_mode, args.workers, stream=args.stream, executor=executor, **options)
+            elif args.stream:
+                cvt_scene_stream(scene_dir, loader_mode, **options)
+            else:
+                cvt_scene(scene_dir, loader_mode, **options)
+    finally:
+        finish_trace()
+
+    print_fit_stats(options["cache"], options["library"])
+
+
+if __name__ == "__main__":
+    run_cvt(arg_parser())
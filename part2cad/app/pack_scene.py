@@ -0,0 +1,53 @@
+import os
+import argparse
+
+from part2cad.loader import get_scene_name
+from part2cad.catalog import DatasetCatalog
+from part2cad.constants import PACKED_SCENE_EXT
+from part2cad.packed_scene import pack_scene
+
+
+def arg_parser():
+    parser = argparse.ArgumentParser(prog='Pack Scene')
+    parser.add_argument(
+        "--src",
+        dest="src",
+        type=str,
+        required=True,
+        help="Input scene directory or tar / zip archive"
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        type=str,
+        default=None,
+        help="Packed scene file (default: <src>{})".format(PACKED_SCENE_EXT)
+    )
+    parser.add_argument(
+        "--compress",
+        dest="compress",
+        action="store_true",
+        help="zlib-compress every column chunk"
+    )
+    parser.add_argument(
+        "--catalog",
+        dest="catalog",
+        type=str,
+        default=None,
+        help="Dataset catalog index built by app/build_catalog.py"
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = arg_parser()
+
+    output = args.output
+    if output is None:
+        src_dir = os.path.dirname(args.src.rstrip('/'))
+        output = os.path.join(src_dir, get_scene_name(args.src) + PACKED_SCENE_EXT)
+
+    catalog = DatasetCatalog(args.catalog) if args.catalog is not None else None
+
+    pack_scene(args.src, output, compress=args.compress, catalog=catalog)
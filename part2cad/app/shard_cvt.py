@@ -0,0 +1,132 @@
+import os
+import sys
+import glob
+import json
+import argparse
+from functools import partial
+
+from part2cad.batch import list_scenes
+from part2cad.shard import build_manifest, load_manifest, partition_manifest, run_shard, merge_shard_reports
+from part2cad.shard import SHARD_REPORT_FILE
+from part2cad.utils import save_json, mkdir
+
+from cvt_scene import arg_parser as cvt_arg_parser
+from batch_cvt import convert_scene_job, scene_cost_fn
+
+##############################################################
+# Split a dataset across machines
+#
+#   manifest    list the scenes and their predicted costs, once
+#   run         convert one shard, on every node
+#   merge       check the shard reports and combine them
+##############################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Shard Convert Part Scenes',
+        description="In `manifest` and `run` modes, other arguments are those of app/cvt_scene.py, applied to every scene")
+    parser.add_argument(
+        "command",
+        type=str,
+        choices=["manifest", "run", "merge"],
+        help="Step to perform"
+    )
+    parser.add_argument(
+        "--manifest",
+        dest="manifest",
+        type=str,
+        required=True,
+        help="Manifest file, written by `manifest`, read by `run` and `merge`"
+    )
+    parser.add_argument(
+        "--src",
+        dest="src",
+        type=str,
+        default=None,
+        help="manifest: dataset root or text file listing one scene per line"
+    )
+    parser.add_argument(
+        "--shards",
+        dest="shards",
+        type=int,
+        default=1,
+        help="Number of shards (default: 1)"
+    )
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        type=int,
+        default=None,
+        help="run: index of the shard to convert, from 0"
+    )
+    parser.add_argument(
+        "--report-dir",
+        dest="report_dir",
+        type=str,
+        default="shard_reports",
+        help="Directory of the shard checkpoints and reports (default: shard_reports)"
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        help="run: number of scenes converted at once (default: #cpu)"
+    )
+    parser.add_argument(
+        "--out",
+        dest="out",
+        type=str,
+        default=None,
+        help="merge: merged report file (default: <report-dir>/merged.json)"
+    )
+
+    args, cvt_argv = parser.parse_known_args()
+
+    if args.command == "manifest":
+        if args.src is None:
+            raise Exception("`manifest` requires --src")
+
+        # costs are predicted with the loader and cost model of the conversion
+        manifest = build_manifest(list_scenes(args.src), scene_cost_fn(cvt_arg_parser(["--src", args.src] + cvt_argv)))
+        save_json(manifest, args.manifest)
+
+        print("[INFO] Manifest `{}` of {} scenes saved at `{}`".format(manifest["id"], len(manifest["scenes"]), args.manifest))
+        for i, entries in enumerate(partition_manifest(manifest, args.shards)):
+            print("    shard {}: {} scenes, {:.1f}s".format(i, len(entries), sum([e["cost"] for e in entries])))
+
+    elif args.command == "run":
+        if args.shard is None:
+            raise Exception("`run` requires --shard")
+
+        manifest = load_manifest(args.manifest)
+
+        # fail early on invalid conversion arguments
+        cvt_arg_parser(["--src", args.manifest] + cvt_argv)
+
+        report = run_shard(manifest, args.shard, args.shards, partial(convert_scene_job, cvt_argv),
+            args.report_dir, args.jobs)
+
+        sys.exit(0 if all([s["ok"] for s in report["scenes"]]) else 1)
+
+    else:
+        manifest = load_manifest(args.manifest)
+
+        reports = []
+        for report_file in sorted(glob.glob("{}/{}".format(args.report_dir, SHARD_REPORT_FILE.format("*", "*")))):
+            with open(report_file, "r") as fin:
+                reports.append(json.load(fin))
+
+        merged = merge_shard_reports(manifest, reports)
+
+        out_file = args.out or "{}/merged.json".format(args.report_dir)
+        mkdir(os.path.dirname(os.path.abspath(out_file)))
+        save_json(merged, out_file)
+
+        print("[INFO] {} of {} scenes converted over {} shards".format(merged["n_converted"], merged["n_scenes"], merged["n_shards"]))
+        for problem in merged["problems"]:
+            print("[ERROR] {}".format(problem))
+        for failed in merged["failed"]:
+            print("[ERROR] Failed `{}`: {}".format(failed["scene"], failed["error"]))
+        for scene in merged["missing"]:
+            print("[ERROR] Missing `{}`".format(scene))
+
+        sys.exit(0 if merged["complete"] else 1)
@@ -0,0 +1,128 @@
+import argparse
+from functools import partial
+
+from part2cad.core import ObjectCache, ShapeLibrary
+from part2cad.precision import set_precision
+from part2cad.watcher import SceneWatcher
+
+from cvt_scene import fit_scene_object, get_output_dir
+
+##############################################################
+# Convert a scene directory while it is being written
+##############################################################
+def arg_parser():
+    parser = argparse.ArgumentParser(prog='Watch Part Scene')
+    parser.add_argument(
+        "--src",
+        dest="src",
+        type=str,
+        required=True,
+        help="Watched scene directory"
+    )
+    parser.add_argument(
+        "--loader",
+        dest="loader",
+        type=str,
+        required=True,
+        help="Loader mode: <gt>, <snet>"
+    )
+    parser.add_argument(
+        "--interval",
+        dest="interval",
+        type=float,
+        default=1.0,
+        help="Seconds between two polls (default: 1)"
+    )
+    parser.add_argument(
+        "--idle-exit",
+        dest="idle_exit",
+        type=float,
+        default=None,
+        help="Stop after this many seconds without new objects (default: run until interrupted)"
+    )
+    parser.add_argument(
+        "--bundle",
+        dest="bundle",
+        type=str,
+        default=None,
+        help="Bundle part meshes: <object> (default: one .stl per part)"
+    )
+    parser.add_argument(
+        "--dedup",
+        dest="dedup",
+        action="store_true",
+        help="Save each distinct part geometry once, named by its content hash"
+    )
+    parser.add_argument(
+        "--graph-format",
+        dest="graph_format",
+        type=str,
+        default="json",
+        help="Kinematic graph format: <json>, <json-stream>, <npz>"
+    )
+    parser.add_argument(
+        "--bg-voxel",
+        dest="bg_voxel",
+        type=float,
+        default=None,
+        help="Voxel-downsample the background to this resolution in meters (default: keep all points)"
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        type=str,
+        default=None,
+        help="Cache fitted objects in this directory"
+    )
+    parser.add_argument(
+        "--library",
+        dest="library",
+        type=str,
+        default=None,
+        help="Shape library directory, near-duplicate objects reuse stored fits"
+    )
+    parser.add_argument(
+        "--precision",
+        dest="precision",
+        type=str,
+        default="float64",
+        help="Point cloud precision: <float64>, <float32>"
+    )
+
+    args = parser.parse_args()
+
+    if args.loader not in ["gt", "snet"]:
+        raise Exception("Does not support loader: `{}`".format(args.loader))
+
+    if args.bundle not in [None, "object"]:
+        raise Exception("Does not support mesh bundle mode: `{}`".format(args.bundle))
+
+    if args.graph_format not in ["json", "json-stream", "npz"]:
+        raise Exception("Does not support graph format: `{}`".format(args.graph_format))
+
+    return args
+
+
+if __name__ == "__main__":
+    args = arg_parser()
+
+    set_precision(args.precision)
+
+    cache = ObjectCache(args.cache) if args.cache is not None else None
+    library = ShapeLibrary(args.library) if args.library is not None else None
+
+    fit_fn = partial(fit_scene_object, loader_mode=args.loader, cache=cache, library=library)
+
+    watcher = SceneWatcher(
+        args.src,
+        args.loader,
+        get_output_dir(args.src),
+        fit_fn=fit_fn,
+        bundle=args.bundle,
+        dedup=args.dedup,
+        graph_format=args.graph_format,
+        bg_voxel=args.bg_voxel
+    )
+
+    print("Watching {}".format(args.src))
+    watcher.run(args.interval, args.idle_exit)
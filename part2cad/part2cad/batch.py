@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from part2cad.constants import PACKED_SCENE_EXT
+from part2cad.cost_model import CostModel, scan_scene
+from part2cad.loader import BACKGROUND_NPY_FILE
+from part2cad.loader.backend import TAR_EXTS, ZIP_EXTS, has_ext
+
+
+def is_scene(path):
+    """Whether a path is a scene folder, archive or packed scene file"""
+    if os.path.isdir(path):
+        return os.path.isfile(os.path.join(path, BACKGROUND_NPY_FILE))
+
+    return os.path.isfile(path) and (path.endswith(PACKED_SCENE_EXT) or has_ext(path, TAR_EXTS + ZIP_EXTS))
+
+
+def list_scenes(source):
+    """Scenes of a dataset root, or listed in a text file
+
+    Args:
+        source (str): directory holding one scene per entry, a scene
+            itself, or a text file with one scene path per line (blank
+            lines and lines starting with # are skipped)
+
+    Returns:
+        list of str: scene paths
+    """
+    if os.path.isfile(source) and not is_scene(source):
+        with open(source, "r") as fin:
+            lines = [l.strip() for l in fin]
+        return [l for l in lines if len(l) > 0 and not l.startswith("#")]
+
+    if is_scene(source):
+        return [source]
+
+    if not os.path.isdir(source):
+        raise Exception("Does not find scenes in: `{}`".format(source))
+
+    return [os.path.join(source, name) for name in sorted(os.listdir(source)) if is_scene(os.path.join(source, name))]
+
+
+def estimate_scene_cost(scene, loader_mode="gt", model=None):
+    """Predicted fitting time of a scene in seconds, see cost_model.py
+
+    Only array headers and part labels are read.
+
+    Args:
+        scene (str): scene path
+        loader_mode (str): "gt" or "snet"
+        model (CostModel): default: the built-in model
+    """
+    if not os.path.exists(scene):
+        # left to the conversion to report
+        return 0
+
+    try:
+        scan = scan_scene(scene, loader_mode)
+    except Exception as e:
+        print("[ERROR] Cannot estimate the cost of `{}`: {}".format(scene, e))
+        return 0
+
+    return round((model or CostModel()).estimate_scene(scan)["seconds"], 2)
+
+
+def read_checkpoint(checkpoint_file):
+    """
+    Returns:
+        dict: scene path (absolute) -> last record of the scene
+    """
+    records = dict()
+
+    if not os.path.isfile(checkpoint_file):
+        return records
+
+    with open(checkpoint_file, "r") as fin:
+        for line in fin:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # line cut by an interruption
+                continue
+            records[record["scene"]] = record
+
+    return records
+
+
+def convert_scene_task(convert_fn, scene):
+    # runs in a worker process, errors are reported, not raised, so one
+    # broken scene does not stop the batch
+    start = time.time()
+    try:
+        convert_fn(scene)
+        error = None
+    except Exception as e:
+        traceback.print_exc()
+        error = "{}: {}".format(type(e).__name__, e)
+
+    return {"scene": scene, "ok": error is None, "error": error, "elapsed": time.time() - start}
+
+
+class BatchRunner(object):
+
+    def __init__(self, convert_fn, checkpoint_file, n_workers=None, cost_fn=estimate_scene_cost):
+        """Convert many scenes with resume
+
+        Scenes are converted by a pool of processes, costliest first so that
+        long scenes do not start last and stretch the run. Each finished
+        scene appends a line to the checkpoint file, a rerun with the same
+        checkpoint skips the scenes already converted; failed scenes are
+        tried again.
+
+        Args:
+            convert_fn (callable): convert_fn(scene path), picklable
+            checkpoint_file (str): JSON lines file, one record per
+                finished scene: "scene", "ok", "error", "elapsed"
+            n_workers (int): number of scenes converted at once (default:
+                #cpu), 1 converts in this process
+            cost_fn (callable): cost_fn(scene path), estimated cost of a
+                scene, see estimate_scene_cost()
+        """
+        self.convert_fn_ = convert_fn
+        self.checkpoint_file_ = checkpoint_file
+        self.n_workers_ = n_workers or os.cpu_count()
+        self.cost_fn_ = cost_fn
+
+
+    def plan(self, scenes):
+        """Scenes left to convert, largest estimated cost first
+
+        Returns:
+            list of tuple: (scene path, estimated cost)
+            int: number of scenes already converted
+        """
+        done = set([s for s, r in read_checkpoint(self.checkpoint_file_).items() if r["ok"]])
+
+        scenes = list(dict.fromkeys([os.path.abspath(s) for s in scenes]))
+        todo = [s for s in scenes if s not in done]
+
+        jobs = sorted([(s, self.cost_fn_(s)) for s in todo], key=lambda x: x[1], reverse=True)
+
+        return jobs, len(scenes) - len(todo)
+
+
+    def record_(self, result):
+        with open(self.checkpoint_file_, "a") as fout:
+            fout.write(json.dumps(result) + "\n")
+            fout.flush()
+            os.fsync(fout.fileno())
+
+
+    def run(self, scenes):
+        """
+        Args:
+            scenes (list of str): scene paths
+
+        Returns:
+            list of dict: records of the scenes converted by this run
+        """
+        jobs, n_skipped = self.plan(scenes)
+
+        print("[INFO] {} scenes to convert, {} already done".format(len(jobs), n_skipped))
+
+        results = []
+        start = time.time()
+
+        def report(result):
+            self.record_(result)
+            results.append(result)
+
+            status = "Done" if result["ok"] else "Failed"
+            print("[INFO] [{}/{}] {} `{}` in {:.2f}s".format(
+                len(results), len(jobs), status, result["scene"], result["elapsed"]))
+
+        if self.n_workers_ == 1:
+            for scene, _ in jobs:
+                report(convert_scene_task(self.convert_fn_, scene))
+        else:
+            executor = ProcessPoolExecutor(max_workers=self.n_workers_)
+            futures = []
+            try:
+                # submitted in cost order, the pool picks them up in that order
+                futures = [executor.submit(convert_scene_task, self.convert_fn_, scene) for scene, _ in jobs]
+                for future in as_completed(futures):
+                    report(future.result())
+            finally:
+                # shutdown(cancel_futures=True) needs python 3.9
+                for future in futures:
+                    future.cancel()
+                executor.shutdown()
+
+        n_failed = len([r for r in results if not r["ok"]])
+        print("[INFO] Converted {} scenes in {:.2f}s, {} failed".format(len(results) - n_failed, time.time() - start, n_failed))
+
+        return results
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+
+from part2cad.constants import CATALOG_FILENAME, COMPLETE_OBJECT_FILENAME
+from part2cad.loader import BACKGROUND_NPY_FILE, RAW_SCENE_PLY
+from part2cad.loader import RAW_OBJECT_FILENAME, GT_OBJECT_FILENAME
+from part2cad.loader import SEG_INPUT_FILENAME, SEG_LABEL_FILENAME
+from part2cad.loader import STRUCTURENET_OBJECT_FILENAME, STRUCTURENET_OBJECT_SCENENN_FILENAME
+from part2cad.loader import sort_object_names
+
+
+CATALOG_VERSION = 1
+
+# files of a scene folder recorded by the catalog
+SCENE_FILES = [
+    BACKGROUND_NPY_FILE,
+    RAW_SCENE_PLY
+]
+
+# files of an object folder recorded by the catalog
+OBJECT_FILES = [
+    RAW_OBJECT_FILENAME,
+    GT_OBJECT_FILENAME,
+    SEG_INPUT_FILENAME,
+    SEG_LABEL_FILENAME,
+    COMPLETE_OBJECT_FILENAME,
+    STRUCTURENET_OBJECT_FILENAME,
+    STRUCTURENET_OBJECT_SCENENN_FILENAME
+]
+
+
+def scan_files_(root, known_files):
+    """Scan a single directory once
+
+    Returns:
+        dict: known filename -> [size, mtime]
+        list of str: names of the sub-directories
+    """
+    files, sub_dirs = dict(), []
+
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir():
+                sub_dirs.append(entry.name)
+            elif entry.name in known_files:
+                st = entry.stat()
+                files[entry.name] = [st.st_size, st.st_mtime]
+
+    return files, sub_dirs
+
+
+def scan_scene_(scene_root):
+    files, obj_names = scan_files_(scene_root, SCENE_FILES)
+
+    # recorded in scene order, see sort_object_names()
+    objects = dict()
+    for name in sort_object_names(obj_names):
+        objects[name], _ = scan_files_(os.path.join(scene_root, name), OBJECT_FILES)
+
+    return {"files": files, "objects": objects}
+
+
+def build_catalog(dataset_root, output_file=None):
+    """Scan a dataset root once and write the catalog index
+
+    The dataset root is either a single scene folder or a folder of
+    scene folders. Every scene records its known scene-level files and,
+    for each object folder, which of the known object files exist with
+    their sizes and modification times.
+
+    Args:
+        dataset_root (str): root directory of the dataset
+        output_file (str): index file, defaults to
+            <dataset_root>/CATALOG_FILENAME
+
+    Returns:
+        str: the index file
+    """
+    if output_file is None:
+        output_file = os.path.join(dataset_root, CATALOG_FILENAME)
+
+    scenes = dict()
+
+    _, sub_dirs = scan_files_(dataset_root, [])
+    if os.path.isfile(os.path.join(dataset_root, BACKGROUND_NPY_FILE)):
+        scenes["."] = scan_scene_(dataset_root)
+    else:
+        for name in sorted(sub_dirs):
+            scenes[name] = scan_scene_(os.path.join(dataset_root, name))
+
+    catalog = {
+        "version": CATALOG_VERSION,
+        "created": time.time(),
+        "scenes": scenes
+    }
+
+    with open(output_file, "w") as fout:
+        json.dump(catalog, fout)
+
+    n_objects = sum([len(s["objects"]) for s in scenes.values()])
+    print("[INFO] Catalog of {} scenes, {} objects saved at: {}".format(
+        len(scenes), n_objects, output_file))
+
+    return output_file
+
+
+class DatasetCatalog(object):
+
+    def __init__(self, catalog_file):
+        """Read-only view of a catalog index
+
+        Paths are resolved relative to the folder of the index file, so the
+        dataset can be mounted at a different location than where it was
+        scanned.
+
+        Args:
+            catalog_file (str): index file created by build_catalog(), or
+                the dataset root containing CATALOG_FILENAME
+        """
+        if os.path.isdir(catalog_file):
+            catalog_file = os.path.join(catalog_file, CATALOG_FILENAME)
+
+        with open(catalog_file, "r") as fin:
+            catalog = json.load(fin)
+
+        if catalog.get("version") != CATALOG_VERSION:
+            raise Exception("Unsupported catalog version: `{}`".format(catalog.get("version")))
+
+        self.root_ = os.path.dirname(os.path.abspath(catalog_file))
+        self.scenes_ = catalog["scenes"]
+
+
+    @property
+    def scene_names(self):
+        return list(self.scenes_.keys())
+
+
+    def scene_dir(self, scene_name):
+        return os.path.normpath(os.path.join(self.root_, scene_name))
+
+
+    def object_dirs(self, scene_root):
+        scene_root = scene_root.rstrip('/')
+        objects = self.scene_(scene_root)["objects"]
+
+        return ["{}/{}".format(scene_root, name) for name in objects]
+
+
+    def scene_file_info(self, scene_root, filename):
+        """Return [size, mtime] of a scene-level file or None"""
+        return self.scene_(scene_root)["files"].get(filename)
+
+
+    def file_info(self, obj_dir, filename):
+        """Return [size, mtime] of an object file or None"""
+        obj_dir = obj_dir.rstrip('/')
+        scene = self.scene_(os.path.dirname(obj_dir))
+        obj = scene["objects"].get(os.path.basename(obj_dir))
+
+        if obj is None:
+            raise Exception("Object `{}` is not in the catalog".format(obj_dir))
+
+        return obj.get(filename)
+
+
+    def has_file(self, obj_dir, filename):
+        return self.file_info(obj_dir, filename) is not None
+
+
+    def scene_(self, scene_root):
+        key = os.path.relpath(os.path.abspath(scene_root), self.root_)
+
+        if key not in self.scenes_:
+            raise Exception("Scene `{}` is not in the catalog".format(scene_root))
+
+        return self.scenes_[key]
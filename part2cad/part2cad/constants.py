@@ -18,10 +18,25 @@ PRISMATIC_PART_ID = [
 ]
 
 SCENE_GRAPH_FILE = "kino_graph.json"
+SCENE_GRAPH_NPZ_FILE = "kino_graph.npz"
+# per-object graph fragments of a streaming export, removed once stitched
+GRAPH_FRAGMENT_DIR = ".fragments"
 ASSET_DIR = "assets"
+CATALOG_FILENAME = "part2cad_catalog.json"
+PACKED_SCENE_EXT = ".p2cs"
+# mesh bundles in ASSET_DIR, per object (by root node id) or per scene
+OBJECT_MESH_BUNDLE = "bundle_{}.npz"
+SCENE_MESH_BUNDLE = "bundle.npz"
 
 GRAVITY_DIRECTION = [0, 0, -1]
 
+# DBSCAN radius splitting a part label into instances, in meters
+DBSCAN_EPS = 0.1
+# contact between two parts: cos of the max angle between facing OBB
+# planes, and max distance between them
+CONTACT_ANGLE_THRESHOLD = 0.99
+CONTACT_DIST_THRESHOLD = 0.03
+
 #############################################
 # dataset filename format
 #############################################
@@ -1,3 +1,5 @@
 from part2cad.core.cad_replacement import object_to_part_cad
 from part2cad.core.cad_assemble import assemble_object
-from part2cad.core.cad_scene import CadScene
\ No newline at end of file
+from part2cad.core.cad_scene import CadScene, fit_object
+from part2cad.core.object_cache import ObjectCache
+from part2cad.core.shape_library import ShapeLibrary
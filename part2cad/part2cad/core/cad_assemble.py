@@ -4,14 +4,18 @@ from transforms3d.quaternions import mat2quat
 from transforms3d.affines import compose
 
 from part2cad.types import PartGraph
-from part2cad.geom import calc_contact_score
+from part2cad.geom import calc_contact_score, calc_center_dist_score
 from part2cad.core.part_alignment import refine_part_alignment
 from part2cad.visualization import create_palette
+from part2cad.tracing import span
 from part2cad.constants import REVOLUTE_PART_ID, PRISMATIC_PART_ID, OBJ_ID_TO_SEMANTIC
 from part2cad.constants import GRAVITY_DIRECTION
+from part2cad.constants import CONTACT_ANGLE_THRESHOLD, CONTACT_DIST_THRESHOLD
 
 
-def infer_kinematic_relation(mesh_states):
+@span("infer_kinematic_relation")
+def infer_kinematic_relation(mesh_states, contact_angle=CONTACT_ANGLE_THRESHOLD,
+        contact_dist=CONTACT_DIST_THRESHOLD, budget=None):
     """Infer kinematic relations between parts in terms of contact
     
     Args:
@@ -21,6 +25,10 @@ def infer_kinematic_relation(mesh_states):
                     mesh (trimesh.Trimesh): mesh of the part
                 tf (4x4 matrix): a homogenenous transformation matrix
                 metadata (dictionary): a dictionary of metadata
+        contact_angle (float): cos of the max angle between contact planes
+        contact_dist (float): max distance between contact planes
+        budget (TimeBudget): time budget of the object, the remaining
+            pairs are scored by center distance once it runs low
     """
     # there is a single part that forms the whole
     if len(mesh_states) == 1:
@@ -29,10 +37,15 @@ def infer_kinematic_relation(mesh_states):
     edges = dict()
     for i in range(len(mesh_states)):
         for j in range(i + 1, len(mesh_states)):
-            score_ij, score_ji = calc_contact_score(
-                mesh_states[i][0], mesh_states[i][1],
-                mesh_states[j][0], mesh_states[j][1]
-            )
+            if budget is not None and budget.degrade("distance_contact"):
+                score_ij, score_ji = calc_center_dist_score(mesh_states[i][1], mesh_states[j][1])
+            else:
+                score_ij, score_ji = calc_contact_score(
+                    mesh_states[i][0], mesh_states[i][1],
+                    mesh_states[j][0], mesh_states[j][1],
+                    angle_threshold=contact_angle,
+                    dist_threshold=contact_dist
+                )
             edges[(i, j)] = np.exp(score_ij)
             edges[(j, i)] = np.exp(score_ji)
     
@@ -78,7 +91,7 @@ def register_rigid_node(pg, mesh, object_id, nid, global_tf, parent_tf, meta):
     )
 
 
-def register_revolute_node(pg, mesh, object_idx, nid, tf, parent_tf, meta):
+def register_revolute_node(pg, mesh, object_idx, nid, global_tf, parent_tf, meta):
     # each row presents an axis
     xyz_axis = global_tf[:3, :3].T
 
@@ -103,11 +116,11 @@ def register_revolute_node(pg, mesh, object_idx, nid, tf, parent_tf, meta):
     local_tf = np.dot(np.linalg.inv(parent_tf), global_tf)
 
     pg.set_node_info(
-        id,
+        nid,
         mesh,
         {
-            "id": id,
-            "cad_id": id,
+            "id": nid,
+            "cad_id": nid,
             "label": OBJ_ID_TO_SEMANTIC[meta["obj_id"]],
             "part_label": int(meta["part_id"]),
             "type": "ObjectNode",
@@ -122,7 +135,7 @@ def register_revolute_node(pg, mesh, object_idx, nid, tf, parent_tf, meta):
         }
     )
 
-def register_prismatic_node(pg, mesh, object_idx, nid, tf, parent_tf, meta):
+def register_prismatic_node(pg, mesh, object_idx, nid, global_tf, parent_tf, meta):
     # each row presents an axis
     xyz_axis = global_tf[:3, :3].T
 
@@ -147,11 +160,11 @@ def register_prismatic_node(pg, mesh, object_idx, nid, tf, parent_tf, meta):
     local_tf = np.dot(np.linalg.inv(parent_tf), global_tf)
 
     pg.set_node_info(
-        id,
+        nid,
         mesh,
         {
-            "id": id,
-            "cad_id": id,
+            "id": nid,
+            "cad_id": nid,
             "label": OBJ_ID_TO_SEMANTIC[meta["obj_id"]],
             "part_label": int(meta["part_id"]),
             "type": "ObjectNode",
@@ -167,9 +180,14 @@ def register_prismatic_node(pg, mesh, object_idx, nid, tf, parent_tf, meta):
     )
 
 
-def assemble_object(mesh_states, object_idx=-1, refine_alignment=True):
+@span("assemble_object")
+def assemble_object(mesh_states, object_idx=-1, refine_alignment=True, contact_angle=CONTACT_ANGLE_THRESHOLD,
+        contact_dist=CONTACT_DIST_THRESHOLD, budget=None):
     # infer kinematic relations between parts
-    nxg, root = infer_kinematic_relation(mesh_states)
+    nxg, root = infer_kinematic_relation(mesh_states, contact_angle, contact_dist, budget)
+
+    if refine_alignment and budget is not None and budget.degrade("no_alignment_refinement"):
+        refine_alignment = False
 
     if refine_alignment:
         mesh_states = refine_part_alignment(mesh_states, nxg, root)
@@ -188,5 +206,9 @@ def assemble_object(mesh_states, object_idx=-1, refine_alignment=True):
             register_prismatic_node(pg, mesh, object_idx, nid, tf, parent_tf, meta)  
         else:
             register_rigid_node(pg, mesh, object_idx, nid, tf, parent_tf, meta)
+
+    # shortcuts taken to fit the time budget, kept in the graph
+    if budget is not None and len(budget.applied) > 0:
+        pg.node_info(pg.root_idx)["degradations"] = budget.applied
             
     return pg, mesh_states
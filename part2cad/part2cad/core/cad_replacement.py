@@ -2,8 +2,25 @@ import trimesh
 import numpy as np
 
 from part2cad.geom import centerialize_mesh
+from part2cad.precision import as_float64
+from part2cad.types import PartPointCloud
+from part2cad.tracing import span
 
 
+# warm start: ICP iterations from the prior pose, and the cost increase over
+# the prior cost, as a ratio, beyond which the full search is run instead;
+# re-observed points alone move the cost by about 1.5
+WARM_START_ICP_ITERATIONS = 20
+WARM_START_COST_RATIO = 2.0
+# the cost is measured in the primitive frame and drops as the points shrink
+# onto it, refined sizes must stay within this ratio of the prior size
+WARM_START_SIZE_RATIO = 1.5
+
+# time budget: candidates kept once running low, and number of points
+# registered once the point budget degradation applies
+DEGRADED_PRIMITIVES = ["box", "cylinder"]
+DEGRADED_POINT_BUDGET = 512
+
 
 def create_box(extents):
         return trimesh.primitives.Box(extents=extents)
@@ -33,18 +50,34 @@ def create_cone(extents):
     return cone
 
 
-def create_part_candidates(pc):
+# primitive candidates, the name is kept in the part metadata
+PRIMITIVE_CREATORS = [
+    ("box", create_box),
+    ("sphere", create_sphere),
+    ("cylinder", create_cylinder),
+    ("capsule", create_capsule),
+    ("cone", create_cone)
+]
+
+
+def create_part_candidates(pc, primitives=None):
+    """
+    Args:
+        pc (PartPointCloud): part points
+        primitives (list of str): names of the candidates to create, all
+            of PRIMITIVE_CREATORS by default
+
+    Returns:
+        list of tuple: (name, primitive mesh) sized by the part OBB
+    """
     obb_extents = pc.get_obb_extents()
 
     if obb_extents is None:
         return []
 
     candidates = [
-        create_box(obb_extents),
-        create_sphere(obb_extents),
-        create_cylinder(obb_extents),
-        create_capsule(obb_extents),
-        create_cone(obb_extents)
+        (name, create(obb_extents)) for name, create in PRIMITIVE_CREATORS
+            if primitives is None or name in primitives
     ]
 
     return candidates
@@ -57,23 +90,47 @@ def split_tf_scale(tf):
     return tf, scale
 
 
-def align_primitive_cad(pc, enable_scale=True):
-    candidates = create_part_candidates(pc)
+def subsample_part_(pc, n_points):
+    if pc.n_points <= n_points:
+        return pc
+
+    # evenly spaced, the same subsample on every run
+    idx = np.linspace(0, pc.n_points - 1, n_points).astype(int)
+
+    return PartPointCloud(pc.points[idx], pc.obj_id, pc.part_id)
+
+
+def align_primitive_cad(pc, enable_scale=True, budget=None):
+    primitives = None
+
+    if budget is not None:
+        if budget.degrade("box_only"):
+            primitives = ["box"]
+        elif budget.degrade("fewer_candidates"):
+            primitives = DEGRADED_PRIMITIVES
+
+        if budget.degrade("point_budget"):
+            pc = subsample_part_(pc, DEGRADED_POINT_BUDGET)
+
+    candidates = create_part_candidates(pc, primitives)
     results = []
 
     # failed to generate any candidate
     if len(candidates) == 0:
         return None
 
-    for mesh_part in candidates:
-        tf, cost = trimesh.registration.mesh_other(mesh_part, pc.points, scale=enable_scale)
+    # registration accumulates in double precision
+    points = as_float64(pc.points)
+
+    for name, mesh_part in candidates:
+        if budget is not None and len(results) > 0 and budget.degrade("truncated_search"):
+            break
 
-        # if the determinant of tf is negative, then take it complement
-        if np.linalg.det(tf[:3, :3]) < 0:
-            tf[:3, :3] *= -1
+        with span("fit_candidate", primitive=name, n_points=len(points)):
+            tf, cost = trimesh.registration.mesh_other(mesh_part, points, scale=enable_scale)
 
-        tf, scale = split_tf_scale(tf)
-        results.append( (mesh_part, tf, scale, cost) )
+        tf, scale = fix_tf_(tf)
+        results.append( (mesh_part, tf, scale, cost, name) )
     
     results.sort(key=lambda x: x[3])
     
@@ -81,20 +138,158 @@ def align_primitive_cad(pc, enable_scale=True):
     return results[0]
 
 
-def object_to_part_cad(part_pcs, enable_scale):
+def obb_primitive_cad(pc):
+    """Box of the part OBB, without registration
+
+    The fallback once the time budget is spent.
+
+    Returns:
+        tuple: (mesh, tf, scale, cost, primitive name) as
+            align_primitive_cad(), the cost is unknown: np.inf
+    """
+    points = as_float64(pc.points)
+
+    try:
+        to_origin_tf, extents = trimesh.bounds.oriented_bounds(points)
+        tf = np.linalg.inv(to_origin_tf)
+    except:
+        # degenerate part, axis aligned box
+        lower, upper = points.min(axis=0), points.max(axis=0)
+        extents = upper - lower
+        tf = np.eye(4)
+        tf[:3, 3] = (lower + upper) / 2
+
+    tf, scale = fix_tf_(tf)
+
+    return create_box(extents), tf, scale, np.inf, "box"
+
+
+def fix_tf_(tf):
+    # if the determinant of tf is negative, then take it complement
+    if np.linalg.det(tf[:3, :3]) < 0:
+        tf[:3, :3] *= -1
+
+    return split_tf_scale(tf)
+
+
+@span("refine_primitive_cad")
+def refine_primitive_cad(pc, prior_state, enable_scale=True):
+    """Refine a prior fit of a part with a short ICP
+
+    Args:
+        pc (PartPointCloud): part points
+        prior_state (tuple): (mesh, tf, meta) of the part from a previous
+            fit, the metadata holding the primitive name, scale and cost
+
+    Returns:
+        tuple: (mesh, tf, scale, cost, primitive name) as
+            align_primitive_cad(), None if the fit got worse than the
+            prior beyond WARM_START_COST_RATIO or changed size beyond
+            WARM_START_SIZE_RATIO
+    """
+    prior_mesh, prior_tf, prior_meta = prior_state
+
+    candidates = create_part_candidates(pc, [prior_meta["primitive"]])
+    if len(candidates) == 0:
+        return None
+
+    name, mesh_part = candidates[0]
+    points = as_float64(pc.points)
+
+    initial = np.array(prior_tf, dtype=np.float64)
+    initial[:3, :3] *= prior_meta["scale"]
+
+    # same direction as mesh_other(): points onto the primitive
+    matrix, _, cost = trimesh.registration.icp(
+        a=points,
+        b=mesh_part,
+        initial=np.linalg.inv(initial),
+        max_iterations=WARM_START_ICP_ITERATIONS,
+        scale=enable_scale
+    )
+    cost /= len(points)
+
+    if cost > prior_meta["cost"] * WARM_START_COST_RATIO:
+        return None
+
+    tf, scale = fix_tf_(np.linalg.inv(matrix))
+
+    size_ratio = (scale * max(mesh_part.extents)) / (prior_meta["scale"] * max(prior_mesh.extents))
+    if size_ratio > WARM_START_SIZE_RATIO or size_ratio < 1 / WARM_START_SIZE_RATIO:
+        return None
+
+    return mesh_part, tf, scale, cost, name
+
+
+def match_prior_(pc, prior, claimed):
+    """Index of the prior state of the same part id closest to the part
+    points, among those not claimed by another part"""
+    center = np.mean(as_float64(pc.points), axis=0)
+
+    best, best_dist = None, np.inf
+    for i, state in enumerate(prior):
+        if i in claimed or state[2]["part_id"] != pc.part_id or "primitive" not in state[2]:
+            continue
+
+        # primitives are centered, the translation is the part center
+        dist = np.linalg.norm(np.asarray(state[1])[:3, 3] - center)
+        if dist < best_dist:
+            best, best_dist = i, dist
+
+    return best
+
+
+@span("object_to_part_cad")
+def object_to_part_cad(part_pcs, enable_scale, prior=None, budget=None):
+    """Fit a primitive to every part
+
+    Args:
+        part_pcs (list of PartPointCloud): segmented parts
+        enable_scale (bool): fit primitives with free scales
+        prior (list of tuple): mesh states of a previous fit of the object;
+            each part is refined from the closest prior part of the same
+            part id not already refined into another instance, and searched
+            from scratch if there is none or the refined cost is too high
+        budget (TimeBudget): time budget of the object, parts are fitted
+            with fewer candidates and points as it runs low, and as OBB
+            boxes once spent
+
+    Returns:
+        list of tuple: (mesh, tf, meta) mesh states of the parts
+    """
     mesh_parts = []
+    n_warm = 0
+    # prior states already warm-starting a part
+    claimed = set()
 
     for pc in part_pcs:
         # skip point cloud with super low resolution
         if pc.n_points < 4:
             continue
         
-        mesh_state = align_primitive_cad(pc, enable_scale)
+        mesh_state = None
+
+        if budget is not None and budget.degrade("obb_box"):
+            mesh_state = obb_primitive_cad(pc)
+
+        prior_idx = match_prior_(pc, prior, claimed) if prior is not None and mesh_state is None else None
+        if prior_idx is not None:
+            mesh_state = refine_primitive_cad(pc, prior[prior_idx], enable_scale)
+            if mesh_state is not None:
+                claimed.add(prior_idx)
+                n_warm += 1
+
+        if mesh_state is None:
+            mesh_state = align_primitive_cad(pc, enable_scale, budget)
 
         if mesh_state is None:
             continue
 
-        mesh, tf, scale, cost = mesh_state
-        mesh_parts.append( (mesh, tf, {"obj_id": pc.obj_id, "part_id": pc.part_id, "scale": scale, "cost": cost}) )
+        mesh, tf, scale, cost, name = mesh_state
+        mesh_parts.append( (mesh, tf, {"obj_id": pc.obj_id, "part_id": pc.part_id, "scale": scale, "cost": cost,
+            "primitive": name}) )
+
+    if prior is not None:
+        print("[INFO] Warm-started {} of {} parts".format(n_warm, len(mesh_parts)))
 
     return mesh_parts
\ No newline at end of file
@@ -1,25 +1,121 @@
+import os
+import json
 import random
+import shutil
 import trimesh
 import numpy as np
 from transforms3d.quaternions import mat2quat
 
 from part2cad.core.cad_assemble import assemble_object
 from part2cad.core.cad_replacement import object_to_part_cad
+from part2cad.core.time_budget import as_time_budget
+from part2cad.tracing import span
 from part2cad.types import PartGraph, KinoGraph
+from part2cad.types import parse_seg_object_pointclouds
+from part2cad.graph_io import stitch_graph_fragments
+from part2cad.scene_delta import empty_delta, apply_scene_delta
+from part2cad.constants import ASSET_DIR, GRAPH_FRAGMENT_DIR
+from part2cad.constants import SCENE_GRAPH_FILE, SCENE_GRAPH_NPZ_FILE
+from part2cad.constants import DBSCAN_EPS, CONTACT_ANGLE_THRESHOLD, CONTACT_DIST_THRESHOLD
+from part2cad.utils import mkdir
+
+
+def fit_object(obj_points, object_idx=-1, enable_scale=True, dbscan_eps=DBSCAN_EPS,
+        contact_angle=CONTACT_ANGLE_THRESHOLD, contact_dist=CONTACT_DIST_THRESHOLD, prior=None, time_budget=None):
+    """Segment, fit and assemble a single object
+
+    Self-contained so that it can be shipped to a worker process.
+
+    Args:
+        obj_points (np.ndarray (n_points, 9)): segmented object points
+        object_idx (int): index of the object in the scene
+        enable_scale (bool): fit primitives with free scales
+        dbscan_eps (float): see parse_seg_object_pointclouds()
+        contact_angle, contact_dist (float): see assemble_object()
+        prior (list of tuple): mesh states of a previous fit of the
+            object, see object_to_part_cad()
+        time_budget (float or TimeBudget): seconds to fit the object, the
+            fit degrades as they run out; the degradations applied are
+            listed in the "degradations" of the root node
+
+    Returns:
+        PartGraph: the object part graph indexed from 0
+        list of tuple: fitted mesh states of the parts
+    """
+    with span("fit_object", object_idx=object_idx, n_points=len(obj_points)):
+        # segmentation counts in the budget
+        budget = as_time_budget(time_budget)
+        part_pcs = parse_seg_object_pointclouds(obj_points, dbscan_eps)
+
+        return fit_part_pointclouds(part_pcs, object_idx, enable_scale, contact_angle, contact_dist, prior, budget)
+
+
+def fit_part_pointclouds(part_pcs, object_idx=-1, enable_scale=True, contact_angle=CONTACT_ANGLE_THRESHOLD,
+        contact_dist=CONTACT_DIST_THRESHOLD, prior=None, time_budget=None):
+    """Fit and assemble the segmented parts of an object, see fit_object()"""
+    budget = as_time_budget(time_budget)
+
+    mesh_states = object_to_part_cad(part_pcs, enable_scale=enable_scale, prior=prior, budget=budget)
+    pg, _ = assemble_object(mesh_states, object_idx, contact_angle=contact_angle, contact_dist=contact_dist,
+        budget=budget)
+
+    return pg, mesh_states
 
 
 class CadScene(object):
 
-    def __init__(self):
+    def __init__(self, output_dir=None, bundle=None, dedup=False):
+        """Scene of part-based CAD objects
+
+        By default every object graph and its meshes are kept until
+        create_kino_graph(). Given an output directory, the scene is
+        exported in streaming mode instead: each object (and background)
+        is written as soon as it is added, meshes into ASSET_DIR and its
+        graph into a fragment file, and its meshes are released.
+        finish_export() then stitches the fragments into the scene graph.
+
+        Otherwise `bundle` and `dedup` give the asset layout the scene deltas
+        of update_object() / remove_object() refer to.
+
+        Args:
+            output_dir (str): output scene directory, enables streaming
+            bundle (str): see KinoGraph.save(), "scene" is not supported in
+                streaming mode
+            dedup (bool): see KinoGraph.save()
+        """
+        if bundle not in [None, "object"] and output_dir is not None:
+            raise Exception("Streaming export does not support mesh bundle mode: `{}`".format(bundle))
+
         self.id_cnt_ = 0
 
+        # object graphs, or their fragment files in streaming mode, None
+        # for removed objects so that object indices stay stable
         self.objects_ = []
         self.backgrounds_ = []
 
+        self.output_dir_ = output_dir
+        self.bundle_ = bundle
+        self.dedup_ = dedup
+
         self.rg_ = self.create_scene_root_()
 
         random.seed(10)
 
+
+    @property
+    def streaming(self):
+        return self.output_dir_ is not None
+
+
+    @property
+    def backgrounds(self):
+        return self.backgrounds_
+
+    
+    @property
+    def objects(self):
+        return [og for og in self.objects_ if og is not None]
+
     
     def next_object_idx_(self):
         return len(self.objects_)
@@ -42,16 +138,151 @@ class CadScene(object):
         return pgraph
 
 
-    def add_object(self, part_pcs):
-        mesh_states = object_to_part_cad(part_pcs, enable_scale=True)
-        pg, _ = assemble_object(mesh_states, self.next_object_idx_())
+    def add_object(self, part_pcs, time_budget=None, **fit_params):
+        """
+        Args:
+            part_pcs (list of PartPointCloud): segmented parts
+            time_budget (float): seconds to fit the object, see fit_object()
+            fit_params: enable_scale, contact_angle and contact_dist, see
+                fit_part_pointclouds()
+        """
+        pg, _ = fit_part_pointclouds(part_pcs, self.next_object_idx_(), time_budget=time_budget, **fit_params)
         
+        self.add_object_graph(pg)
+
+
+    def add_object_graph(self, pg):
+        """Append an already assembled object graph to the scene
+
+        Graphs must be added in object order, node indices are re-assigned
+        from the current scene counter.
+        """
         pg.offset_idx(self.id_cnt_)
         
-        self.objects_.append(pg)
+        self.objects_.append(self.stream_graph_(pg) if self.streaming else pg)
 
         self.id_cnt_ += pg.n_nodes
 
+        return pg
+
+
+    def update_object(self, object_idx, part_pcs, prior=None, time_budget=None, **fit_params):
+        """Re-fit a single object, the other objects are left untouched
+
+        Takes the fitting parameters of add_object(), so that the same
+        points give the same graph as the initial fit.
+
+        Args:
+            object_idx (int): index of the object
+            part_pcs (list of PartPointCloud): new segmented parts
+            prior (list of tuple): mesh states of the previous fit to start
+                from, see object_to_part_cad()
+            time_budget (float): see add_object()
+            fit_params: see add_object()
+
+        Returns:
+            dict: scene delta, see scene_delta.py
+        """
+        pg, _ = fit_part_pointclouds(part_pcs, object_idx, prior=prior, time_budget=time_budget, **fit_params)
+
+        return self.replace_object_graph(object_idx, pg)
+
+
+    def replace_object_graph(self, object_idx, pg):
+        """Replace an object by an already assembled object graph
+
+        The new graph takes fresh node indices after every index in use,
+        the nodes of the other objects keep theirs.
+
+        Returns:
+            dict: scene delta, see scene_delta.py
+        """
+        old = self.check_object_(object_idx)
+
+        pg.offset_idx(self.id_cnt_)
+        self.id_cnt_ += pg.n_nodes
+
+        self.objects_[object_idx] = pg
+
+        return self.object_delta_(object_idx, old, pg)
+
+
+    def remove_object(self, object_idx):
+        """
+        Returns:
+            dict: scene delta, see scene_delta.py
+        """
+        old = self.check_object_(object_idx)
+
+        self.objects_[object_idx] = None
+
+        return self.object_delta_(object_idx, old, None)
+
+
+    def check_object_(self, object_idx):
+        if self.streaming:
+            raise Exception("Objects of a streaming export cannot be changed")
+
+        if self.bundle_ == "scene":
+            raise Exception("Objects of a scene bundle cannot be changed one by one")
+
+        if object_idx < 0 or object_idx >= len(self.objects_) or self.objects_[object_idx] is None:
+            raise Exception("Object does not exist: `{}`".format(object_idx))
+
+        return self.objects_[object_idx]
+
+
+    def object_delta_(self, object_idx, old, new):
+        """Nodes, edges and asset files changed by replacing `old` by `new`"""
+        bundle = self.bundle_ == "object"
+        delta = empty_delta(object_idx)
+
+        # file names must match what save_mesh() writes
+        if self.dedup_:
+            for og in [old, new]:
+                if og is not None:
+                    og.assign_content_ids()
+
+        delta["removed_nodes"] = list(old.node_indices)
+        delta["removed_edges"] = [{"dst_id": d, "src_id": s} for s, d in old.edges]
+        delta["removed_edges"].append({"dst_id": old.root_idx, "src_id": self.rg_.root_idx})
+
+        if new is not None:
+            delta["added_nodes"] = list(new.iter_nodes())
+            delta["added_edges"] = [{"dst_id": d, "src_id": s} for s, d in new.edges]
+            delta["added_edges"].append({"dst_id": new.root_idx, "src_id": self.rg_.root_idx})
+            delta["added_files"] = new.mesh_files(bundle)
+
+        # deduplicated meshes may still be used by other objects
+        in_use = set()
+        for og in self.objects + self.backgrounds_:
+            in_use.update(og.mesh_files(bundle))
+
+        delta["removed_files"] = [f for f in old.mesh_files(bundle) if f not in in_use]
+
+        return delta
+
+
+    def save_delta(self, output_dir, delta):
+        """Patch a scene exported by KinoGraph.save(), with the same bundle
+        and dedup settings as this scene
+
+        Args:
+            output_dir (str): output scene directory
+            delta (dict): scene delta returned by update_object() or
+                remove_object()
+        """
+        og = self.objects_[delta["object_idx"]]
+
+        if og is not None:
+            og.save_mesh(
+                "{}/{}".format(output_dir, ASSET_DIR),
+                bundle=self.bundle_ == "object",
+                dedup=self.dedup_
+            )
+
+        apply_scene_delta(output_dir, delta)
+
 
     def add_background(self, points, global_tf=np.eye(4)):
         colors_rgba = np.ones((len(points), 4), dtype="uint8") * 255
@@ -77,24 +308,97 @@ class CadScene(object):
         )
 
         self.id_cnt_ += 1
-        self.backgrounds_.append(pgraph)
+        self.backgrounds_.append(self.stream_graph_(pgraph) if self.streaming else pgraph)
+
+
+    def stream_graph_(self, pg):
+        """Save the meshes and the graph fragment of an object, then
+        release its meshes
+
+        Returns:
+            str: the fragment file
+        """
+        pg.save_mesh(
+            "{}/{}".format(self.output_dir_, ASSET_DIR),
+            bundle=self.bundle_ == "object",
+            dedup=self.dedup_
+        )
+        pg.release_meshes()
+
+        fragment_dir = "{}/{}".format(self.output_dir_, GRAPH_FRAGMENT_DIR)
+        mkdir(fragment_dir)
+
+        fragment_file = "{}/{}.json".format(fragment_dir, pg.root_idx)
+        with open(fragment_file, "w") as fout:
+            json.dump(pg.dump(), fout)
+
+        return fragment_file
 
     
-    def create_kino_graph(self):
+    def finish_export(self, graph_format="json"):
+        """Stitch the fragments of a streaming export into the scene graph
+
+        Args:
+            graph_format (str): "json" / "json-stream" for a compact
+                SCENE_GRAPH_FILE, "npz" for SCENE_GRAPH_NPZ_FILE
+
+        Returns:
+            str: the scene graph file
+        """
+        if not self.streaming:
+            raise Exception("Scene is not exported in streaming mode")
+
+        fragment_dir = "{}/{}".format(self.output_dir_, GRAPH_FRAGMENT_DIR)
+
+        root_file = "{}/{}.json".format(fragment_dir, self.rg_.root_idx)
+        with open(root_file, "w") as fout:
+            json.dump(self.rg_.dump(), fout)
+
+        graph_file = SCENE_GRAPH_NPZ_FILE if graph_format == "npz" else SCENE_GRAPH_FILE
+
+        output_file = stitch_graph_fragments(
+            self.objects_ + self.backgrounds_ + [root_file],
+            self.rg_.root_idx,
+            self.contact_relations_(),
+            "{}/{}".format(self.output_dir_, graph_file),
+            graph_format
+        )
+
+        shutil.rmtree(fragment_dir)
+
+        return output_file
+
+
+    def contact_relations_(self):
         contact_relations = []
 
         # add objects to root
-        for og in self.objects_:
-            contact_relations.append( (self.rg_.root_idx, og.root_idx) )
+        for og in self.objects:
+            contact_relations.append( (self.rg_.root_idx, self.root_of_(og)) )
 
         # add background to root
         for bg in self.backgrounds_:
-            contact_relations.append( (self.rg_.root_idx, bg.root_idx) )
-        
+            contact_relations.append( (self.rg_.root_idx, self.root_of_(bg)) )
+
+        return contact_relations
+
+
+    def root_of_(self, og):
+        if isinstance(og, PartGraph):
+            return og.root_idx
+
+        # fragment files are named by the root index
+        return int(os.path.basename(og).split('.')[0])
+
+
+    def create_kino_graph(self):
+        if self.streaming:
+            raise Exception("Scene was exported in streaming mode, use finish_export()")
+
         kinog = KinoGraph(
             self.rg_.root_idx,
-            self.objects_ + self.backgrounds_ + [self.rg_],
-            contact_relations
+            self.objects + self.backgrounds_ + [self.rg_],
+            self.contact_relations_()
         )
 
         return kinog
\ No newline at end of file
@@ -0,0 +1,178 @@
+import os
+import json
+import glob
+import pickle
+import hashlib
+import tempfile
+
+import numpy as np
+
+from part2cad.core.cad_scene import fit_object
+from part2cad.precision import get_precision
+
+
+# bump when the fitting or the pickled layout changes
+OBJECT_CACHE_VERSION = 1
+OBJECT_CACHE_EXT = ".pkl"
+
+
+class ObjectCache(object):
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        """Persistent cache of fitted objects
+
+        An entry holds the part graph and the mesh states returned by
+        fit_object(), keyed by a hash of the object points, the loader mode
+        and the fitting parameters. The object index is not part of the
+        key, so adding or removing objects keeps the others cached; it is
+        set in the graph on every hit. Entries are touched on every hit and
+        the least recently used ones are evicted beyond `max_bytes`.
+
+        Only the directory and the bound are kept, so the cache can be
+        shipped to worker processes; entries are written atomically. The
+        directory is made absolute, workers may run from another working
+        directory.
+
+        Args:
+            cache_dir (str): cache directory, created if missing
+            max_bytes (int): size bound of the cache
+        """
+        self.cache_dir_ = os.path.abspath(cache_dir)
+        self.max_bytes_ = max_bytes
+
+        self.n_hits_ = 0
+        self.n_misses_ = 0
+
+        os.makedirs(self.cache_dir_, exist_ok=True)
+
+
+    @property
+    def stats(self):
+        return {"hits": self.n_hits_, "misses": self.n_misses_}
+
+
+    def add_stats(self, stats):
+        """Count the hits and misses of a copy used in another process"""
+        self.n_hits_ += stats["hits"]
+        self.n_misses_ += stats["misses"]
+
+
+    def key(self, obj_points, loader_mode, params):
+        """Hash the inputs of fit_object(), but the object index
+
+        Args:
+            obj_points (np.ndarray): object points
+            loader_mode (str): loader the points come from
+            params (dict): fitting parameters
+
+        Returns:
+            str: hex digest
+        """
+        points = np.ascontiguousarray(obj_points)
+
+        h = hashlib.sha1()
+        h.update(json.dumps({
+            "version": OBJECT_CACHE_VERSION,
+            "precision": get_precision(),
+            "loader": loader_mode,
+            "params": params,
+            "dtype": points.dtype.str,
+            "shape": points.shape
+        }, sort_keys=True).encode())
+        h.update(points.tobytes())
+
+        return h.hexdigest()
+
+
+    def entry_file_(self, key):
+        return os.path.join(self.cache_dir_, key + OBJECT_CACHE_EXT)
+
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (PartGraph, mesh states), None if missing
+        """
+        entry_file = self.entry_file_(key)
+
+        try:
+            with open(entry_file, "rb") as fin:
+                result = pickle.load(fin)
+            # recency for eviction
+            os.utime(entry_file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+        return result
+
+
+    def put(self, key, result):
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir_, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fout:
+            pickle.dump(result, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.entry_file_(key))
+
+        self.evict_()
+
+
+    def evict_(self):
+        entries = []
+        for entry_file in glob.glob(os.path.join(self.cache_dir_, "*" + OBJECT_CACHE_EXT)):
+            try:
+                st = os.stat(entry_file)
+            except FileNotFoundError:
+                continue
+            entries.append( (st.st_mtime, st.st_size, entry_file) )
+
+        total = sum([e[1] for e in entries])
+
+        # oldest first
+        for _, size, entry_file in sorted(entries):
+            if total <= self.max_bytes_:
+                break
+            try:
+                os.remove(entry_file)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+    def fit(self, obj_points, object_idx=-1, loader_mode=None, fit_fn=fit_object, **params):
+        """fit_object() through the cache
+
+        Args:
+            obj_points (np.ndarray): object points
+            object_idx (int): index of the object in the scene
+            loader_mode (str): loader the points come from
+            fit_fn (callable): fitting on a miss, with the signature of
+                fit_object()
+            params: keyword arguments of fit_object()
+
+        Returns:
+            PartGraph: the object part graph indexed from 0
+            list of tuple: fitted mesh states of the parts
+        """
+        # a fit within its time budget is the full fit, degraded fits are
+        # not stored
+        key = self.key(obj_points, loader_mode, {k: v for k, v in params.items() if k != "time_budget"})
+
+        result = self.get(key)
+        if result is not None:
+            self.n_hits_ += 1
+
+            pg = result[0]
+            for nid in pg.node_indices:
+                if "object_id" in pg.node_info(nid):
+                    pg.node_info(nid)["object_id"] = object_idx
+
+            return result
+
+        self.n_misses_ += 1
+
+        result = fit_fn(obj_points, object_idx, **params)
+
+        pg = result[0]
+        if "degradations" not in pg.node_info(pg.root_idx):
+            self.put(key, result)
+
+        return result
@@ -4,8 +4,10 @@ import numpy as np
 from transforms3d.affines import compose
 
 from part2cad.geom import opt_rot_a2b, find_near_obb_axis
+from part2cad.tracing import span
 
 
+@span("refine_part_alignment")
 def refine_part_alignment(mesh_states, nxg, root, theta=0.97):
     if len(mesh_states) == 1:
         return mesh_states
@@ -0,0 +1,319 @@
+import os
+import glob
+import json
+import pickle
+import hashlib
+import tempfile
+
+import numpy as np
+import trimesh
+from transforms3d.euler import euler2mat
+
+from part2cad.core.cad_scene import fit_part_pointclouds
+from part2cad.core.time_budget import as_time_budget
+from part2cad.tracing import span
+from part2cad.types import parse_seg_object_pointclouds
+from part2cad.constants import DBSCAN_EPS, GRAVITY_DIRECTION
+
+
+SHAPE_LIBRARY_VERSION = 1
+
+# points kept per entry for the pose alignment
+SHAPE_SAMPLE_SIZE = 2048
+
+
+def object_descriptor(part_pcs):
+    """Rotation-invariant descriptor of a segmented object
+
+    Parts are grouped by part id, each instance is described by its PCA
+    extents (sorted) and its share of the object points.
+
+    Args:
+        part_pcs (list of PartPointCloud): segmented parts
+
+    Returns:
+        dict: "obj_id" and "parts", part id (str) -> instances sorted by
+            decreasing extents, [e0, e1, e2, point fraction]
+    """
+    # parts skipped by object_to_part_cad() are left out
+    part_pcs = [pc for pc in part_pcs if pc.n_points >= 4]
+    n_points = sum([pc.n_points for pc in part_pcs])
+
+    parts = dict()
+    for pc in part_pcs:
+        points = np.asarray(pc.points, dtype=np.float64)
+        centered = points - points.mean(axis=0)
+        _, _, axes = np.linalg.svd(centered, full_matrices=False)
+
+        proj = np.dot(centered, axes.T)
+        extents = sorted((proj.max(axis=0) - proj.min(axis=0)).tolist(), reverse=True)
+
+        parts.setdefault(str(int(pc.part_id)), []).append(extents + [pc.n_points / n_points])
+
+    for rows in parts.values():
+        rows.sort(reverse=True)
+
+    obj_id = int(part_pcs[0].obj_id) if len(part_pcs) > 0 else -1
+
+    return {"obj_id": obj_id, "parts": parts}
+
+
+def match_descriptor(desc_a, desc_b, extent_tol=0.05, fraction_tol=0.05):
+    """Whether two descriptors describe the same shape
+
+    Args:
+        extent_tol (float): tolerance on part extents, relative to the
+            largest extent of the part so that thin sides are not held to
+            a tighter bound than the sampling noise
+        fraction_tol (float): absolute tolerance on point fractions
+    """
+    if desc_a["obj_id"] != desc_b["obj_id"] or desc_a["parts"].keys() != desc_b["parts"].keys():
+        return False
+
+    for part_id, rows_a in desc_a["parts"].items():
+        rows_a, rows_b = np.array(rows_a), np.array(desc_b["parts"][part_id])
+
+        if rows_a.shape != rows_b.shape:
+            return False
+
+        ext_a, ext_b = rows_a[:, :3], rows_b[:, :3]
+        if np.any(np.abs(ext_a - ext_b) > extent_tol * ext_b[:, :1]):
+            return False
+
+        if np.any(np.abs(rows_a[:, 3] - rows_b[:, 3]) > fraction_tol):
+            return False
+
+    return True
+
+
+def upright_frame(points):
+    """Object frame: centroid and principal horizontal axis, z against
+    gravity
+
+    Returns:
+        4x4 matrix: object frame in the scene frame
+    """
+    up = -np.array(GRAVITY_DIRECTION, dtype=np.float64)
+    up /= np.linalg.norm(up)
+
+    center = points.mean(axis=0)
+    centered = points - center
+    horizontal = centered - np.outer(np.dot(centered, up), up)
+
+    _, _, axes = np.linalg.svd(horizontal, full_matrices=False)
+    x_axis = axes[0] - np.dot(axes[0], up) * up
+    x_axis /= np.linalg.norm(x_axis)
+
+    tf = np.eye(4)
+    tf[:3, :3] = np.column_stack([x_axis, np.cross(up, x_axis), up])
+    tf[:3, 3] = center
+
+    return tf
+
+
+def sample_points_(points, n):
+    if len(points) <= n:
+        return points
+
+    # deterministic subset
+    return points[np.linspace(0, len(points) - 1, n).astype(int)]
+
+
+class ShapeLibrary(object):
+
+    def __init__(self, library_dir, extent_tol=0.05, fraction_tol=0.05, align_tol=0.02):
+        """Library of fitted objects reused across runs
+
+        A new object matching a stored descriptor takes the stored part
+        graph, primitives and kinematic tree included, moved onto the new
+        points by an upright frame guess refined with ICP. Objects matching
+        nothing, or aligning poorly, are fitted and added to the library.
+
+        Each entry is a descriptor file (.json) and a pickled payload (.pkl),
+        both written atomically, so the library can be shared by worker
+        processes; the directory is made absolute for the same reason.
+
+        Args:
+            library_dir (str): library directory, created if missing
+            extent_tol (float): see match_descriptor()
+            fraction_tol (float): see match_descriptor()
+            align_tol (float): max mean distance after alignment, in meters
+        """
+        self.library_dir_ = os.path.abspath(library_dir)
+        self.extent_tol_ = extent_tol
+        self.fraction_tol_ = fraction_tol
+        self.align_tol_ = align_tol
+
+        self.descriptors_ = dict()
+
+        self.n_hits_ = 0
+        self.n_misses_ = 0
+
+        os.makedirs(self.library_dir_, exist_ok=True)
+
+
+    @property
+    def stats(self):
+        return {"hits": self.n_hits_, "misses": self.n_misses_}
+
+
+    def add_stats(self, stats):
+        """Count the hits and misses of a copy used in another process"""
+        self.n_hits_ += stats["hits"]
+        self.n_misses_ += stats["misses"]
+
+
+    def refresh_(self):
+        """Read the descriptors added since the last lookup, possibly by
+        other processes"""
+        for desc_file in glob.glob(os.path.join(self.library_dir_, "*.json")):
+            key = os.path.basename(desc_file)[:-len(".json")]
+            if key in self.descriptors_:
+                continue
+
+            with open(desc_file, "r") as fin:
+                desc = json.load(fin)
+
+            if desc.get("version") == SHAPE_LIBRARY_VERSION:
+                self.descriptors_[key] = desc
+
+
+    def write_atomic_(self, file, data, binary):
+        fd, tmp_file = tempfile.mkstemp(dir=self.library_dir_, suffix=".tmp")
+        with os.fdopen(fd, "wb" if binary else "w") as fout:
+            if binary:
+                pickle.dump(data, fout, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                json.dump(data, fout)
+        os.replace(tmp_file, file)
+
+
+    def add(self, desc, points, pg):
+        """Store a fitted object
+
+        Args:
+            desc (dict): object descriptor
+            points (np.ndarray (n, 3)): object points in the scene frame
+            pg (PartGraph): the object graph fitted on `points`
+        """
+        points = sample_points_(points, SHAPE_SAMPLE_SIZE)
+        key = hashlib.sha1(np.ascontiguousarray(points).tobytes()).hexdigest()[:16]
+
+        # payload first, the descriptor publishes the entry
+        self.write_atomic_(os.path.join(self.library_dir_, key + ".pkl"), {"points": points, "pg": pg}, True)
+        self.write_atomic_(
+            os.path.join(self.library_dir_, key + ".json"),
+            dict(desc, version=SHAPE_LIBRARY_VERSION),
+            False
+        )
+
+        self.descriptors_[key] = desc
+
+        return key
+
+
+    def align_(self, src_points, dst_points):
+        """Rigid transform moving `src_points` onto `dst_points`
+
+        Returns:
+            4x4 matrix: the transform
+            float: mean distance of the moved points to `dst_points`
+        """
+        from scipy.spatial import cKDTree
+
+        tree = cKDTree(dst_points)
+        src_frame, dst_frame = upright_frame(src_points), upright_frame(dst_points)
+
+        # the principal axis has no sign and may swap with the second one
+        # on squarish objects, try the four quarter turns around z
+        best_tf, best_dist = None, np.inf
+        for k in range(4):
+            rot = np.eye(4)
+            rot[:3, :3] = euler2mat(0, 0, k * np.pi / 2)
+            tf = np.linalg.multi_dot([dst_frame, rot, np.linalg.inv(src_frame)])
+
+            dist = tree.query(trimesh.transform_points(src_points, tf))[0].mean()
+            if dist < best_dist:
+                best_tf, best_dist = tf, dist
+
+        tf, _, _ = trimesh.registration.icp(src_points, dst_points, best_tf, scale=False, reflection=False)
+        dist = tree.query(trimesh.transform_points(src_points, tf))[0].mean()
+
+        return tf, dist
+
+
+    def lookup(self, desc, points):
+        """Find a stored object matching the descriptor and aligning onto
+        `points`
+
+        Returns:
+            PartGraph: the stored graph moved onto `points`, None if missing
+        """
+        self.refresh_()
+
+        points = sample_points_(points, SHAPE_SAMPLE_SIZE)
+
+        for key, stored in self.descriptors_.items():
+            if not match_descriptor(desc, stored, self.extent_tol_, self.fraction_tol_):
+                continue
+
+            try:
+                with open(os.path.join(self.library_dir_, key + ".pkl"), "rb") as fin:
+                    entry = pickle.load(fin)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                continue
+
+            tf, dist = self.align_(entry["points"], points)
+            if dist > self.align_tol_:
+                continue
+
+            entry["pg"].transform(tf)
+            return entry["pg"]
+
+        return None
+
+
+    @span("ShapeLibrary.fit")
+    def fit(self, obj_points, object_idx=-1, dbscan_eps=DBSCAN_EPS, **params):
+        """fit_object() through the library
+
+        Args:
+            obj_points (np.ndarray): object points
+            object_idx (int): index of the object in the scene
+            dbscan_eps (float): see parse_seg_object_pointclouds()
+            params: keyword arguments of fit_part_pointclouds()
+
+        Returns:
+            PartGraph: the object part graph indexed from 0
+            list of tuple: fitted mesh states of the parts, None when reused
+        """
+        if params.get("time_budget") is not None:
+            # segmentation and lookup count in the budget
+            params["time_budget"] = as_time_budget(params["time_budget"])
+
+        part_pcs = parse_seg_object_pointclouds(obj_points, dbscan_eps)
+        desc = object_descriptor(part_pcs)
+        points = np.asarray(obj_points[:, :3], dtype=np.float64)
+
+        pg = self.lookup(desc, points)
+
+        if pg is not None:
+            self.n_hits_ += 1
+            print("[INFO] Shape library hit for object {}".format(object_idx))
+
+            for idx in pg.node_indices:
+                if "object_id" in pg.node_info(idx):
+                    pg.node_info(idx)["object_id"] = object_idx
+
+            return pg, None
+
+        self.n_misses_ += 1
+        print("[INFO] Shape library miss for object {}".format(object_idx))
+
+        pg, mesh_states = fit_part_pointclouds(part_pcs, object_idx, **params)
+
+        # a fit degraded by the time budget is not worth reusing
+        if "degradations" not in pg.node_info(pg.root_idx):
+            self.add(desc, points, pg)
+
+        return pg, mesh_states
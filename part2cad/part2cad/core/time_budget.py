@@ -0,0 +1,89 @@
+import time
+
+
+# fraction of the budget spent from which each degradation applies, from
+# the cheapest loss of quality to the coarsest fit
+DEGRADATION_THRESHOLDS = {
+    # fit box and cylinder candidates only
+    "fewer_candidates": 0.25,
+    # register a subsample of the part points
+    "point_budget": 0.5,
+    # fit box candidates only
+    "box_only": 0.75,
+    # contact scores from the distance between part centers
+    "distance_contact": 0.75,
+    # stop the candidate search, keep the best candidate so far
+    "truncated_search": 1.0,
+    # part OBB as a box, no registration
+    "obb_box": 1.0,
+    # keep the fitted orientations of the parts
+    "no_alignment_refinement": 1.0
+}
+
+
+class TimeBudget(object):
+
+    def __init__(self, seconds):
+        """Time allowed to fit one object
+
+        The fitting code asks degrade() before each costly step, and falls
+        back to a cheaper one once enough of the budget is spent. Every
+        degradation applied is recorded.
+
+        Args:
+            seconds (float): budget, from now
+        """
+        if seconds <= 0:
+            raise Exception("Invalid time budget: `{}`".format(seconds))
+
+        self.seconds_ = seconds
+        self.start_ = time.time()
+        self.applied_ = []
+
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start_
+
+
+    @property
+    def used(self):
+        """Fraction of the budget spent, above 1 once expired"""
+        return self.elapsed / self.seconds_
+
+
+    @property
+    def applied(self):
+        """Names of the degradations applied, in order"""
+        return list(self.applied_)
+
+
+    def degrade(self, name):
+        """Whether degradation `name` is due, recorded the first time
+
+        Args:
+            name (str): key of DEGRADATION_THRESHOLDS
+        """
+        if self.used < DEGRADATION_THRESHOLDS[name]:
+            return False
+
+        if name not in self.applied_:
+            self.applied_.append(name)
+            print("[INFO] {:.2f}s of the {:.2f}s budget spent, degrade: {}".format(self.elapsed, self.seconds_, name))
+
+        return True
+
+
+def as_time_budget(time_budget):
+    """
+    Args:
+        time_budget (float or TimeBudget): seconds, or a budget already
+            running
+
+    Returns:
+        TimeBudget: None without budget
+    """
+    if time_budget is None or isinstance(time_budget, TimeBudget):
+        return time_budget
+
+    return TimeBudget(time_budget)
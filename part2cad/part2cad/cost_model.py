@@ -0,0 +1,233 @@
+import json
+
+import numpy as np
+
+from part2cad.loader import scene_backend, structurenet_object_file
+from part2cad.loader import BACKGROUND_NPY_FILE, GT_OBJECT_FILENAME
+
+
+COST_MODEL_VERSION = 1
+
+# calibrated on the sample scene with app/calibrate_cost_model.py,
+#   seconds = sum(seconds[k] * feature k), memory = sum(memory[k] * feature k)
+# over the features of CostModel.object_features(); "instances" is the
+# mean number of instances of a part label, 1 for labels never seen
+DEFAULT_COST_MODEL = {
+    "version": COST_MODEL_VERSION,
+    "seconds": {"object": 0.0, "points": 0.05, "parts": 0.0, "pairs": 0.0007},
+    "memory": {"object": 0.0, "points": 1.9e5, "parts": 0.0, "pairs": 0.0},
+    "instances": {"0": 1.7, "1": 2.0}
+}
+
+COST_FEATURES = ["object", "points", "parts", "pairs"]
+
+
+def object_label_column(shape):
+    # structurenet outputs are <x, y, z, part_id>, the others follow the
+    # layout of parse_seg_object_pointclouds()
+    return 3 if shape[1] == 4 else 8
+
+
+def part_label_histogram(points):
+    """
+    Args:
+        points (np.ndarray (n_points, n_attr)): object points, possibly
+            memory-mapped, only the label column is read
+
+    Returns:
+        dict: part label -> number of points
+    """
+    labels = np.asarray(points[:, object_label_column(points.shape)]).astype(int)
+    ids, counts = np.unique(labels, return_counts=True)
+
+    return {int(i): int(c) for i, c in zip(ids, counts)}
+
+
+def object_file_(backend, obj_name, loader_mode):
+    if loader_mode == "snet":
+        return structurenet_object_file(backend, obj_name)
+
+    return GT_OBJECT_FILENAME
+
+
+def scan_scene(scene_root, loader_mode="gt", catalog=None):
+    """Array shapes and part label histograms of a scene
+
+    Arrays are memory-mapped when the storage allows it, so only the npy
+    headers and the label columns are read; archives are read in full.
+
+    Args:
+        scene_root (str): scene directory, archive or packed scene file
+        loader_mode (str): "gt" or "snet", the object files to scan
+
+    Returns:
+        dict: "background_shape" and "objects", [{"name", "n_points",
+            "labels"}], see part_label_histogram()
+    """
+    with scene_backend(scene_root, catalog, read_ahead=0) as backend:
+        objects = []
+        for name in backend.list_objects():
+            points = backend.load_npy(name, object_file_(backend, name, loader_mode), mmap=backend.can_mmap)
+            objects.append({
+                "name": name,
+                "n_points": int(points.shape[0]),
+                "labels": part_label_histogram(points)
+            })
+
+        bg_shape = (0, 0)
+        if backend.exists(None, BACKGROUND_NPY_FILE):
+            bg_shape = backend.load_npy(None, BACKGROUND_NPY_FILE, mmap=backend.can_mmap).shape
+
+    return {"background_shape": [int(n) for n in bg_shape], "objects": objects}
+
+
+class CostModel(object):
+
+    def __init__(self, params=None):
+        """Predict the fitting time and memory of objects from their point
+        and part counts
+
+        Fitting registers every part instance against the primitive
+        candidates, then scores every pair of parts for contact, so the
+        cost is linear in the number of points, parts and part pairs.
+
+        Args:
+            params (dict): see DEFAULT_COST_MODEL
+        """
+        params = params or DEFAULT_COST_MODEL
+
+        if params.get("version") != COST_MODEL_VERSION:
+            raise Exception("Does not support cost model version: `{}`".format(params.get("version")))
+
+        self.params_ = params
+
+
+    @staticmethod
+    def load(model_file):
+        with open(model_file, "r") as fin:
+            return CostModel(json.load(fin))
+
+
+    def save(self, model_file):
+        with open(model_file, "w") as fout:
+            json.dump(self.params_, fout, indent=4)
+
+
+    @property
+    def params(self):
+        return self.params_
+
+
+    def n_parts(self, labels):
+        """Expected number of part instances from a label histogram"""
+        instances = self.params_["instances"]
+        return sum([instances.get(str(l), 1.0) for l in labels.keys()])
+
+
+    def object_features(self, n_points, labels):
+        n_parts = self.n_parts(labels)
+
+        return {"object": 1.0, "points": float(n_points), "parts": n_parts, "pairs": n_parts * (n_parts - 1) / 2}
+
+
+    def predict(self, n_points, labels):
+        """
+        Args:
+            n_points (int): number of object points
+            labels (dict): part label histogram
+
+        Returns:
+            dict: "parts", expected number of part instances, "seconds"
+                to fit and peak "memory" in bytes
+        """
+        features = self.object_features(n_points, labels)
+
+        return {
+            "parts": features["parts"],
+            "seconds": sum([self.params_["seconds"][k] * features[k] for k in COST_FEATURES]),
+            "memory": sum([self.params_["memory"][k] * features[k] for k in COST_FEATURES])
+        }
+
+
+    def predict_points(self, obj_points):
+        """predict() from the object points themselves"""
+        return self.predict(obj_points.shape[0], part_label_histogram(obj_points))
+
+
+    def estimate_scene(self, scan, n_workers=1):
+        """Runtime and memory of a scene conversion
+
+        Args:
+            scan (dict): see scan_scene()
+            n_workers (int): objects fitted at once
+
+        Returns:
+            dict: "objects", the scan entries with their predict() fields,
+                "seconds" of fitting time, the "wall" time with n_workers,
+                and the "memory" peak, background points included
+        """
+        objects = [dict(o, **self.predict(o["n_points"], o["labels"])) for o in scan["objects"]]
+
+        seconds = sum([o["seconds"] for o in objects])
+
+        # background loaded as float64, plus the largest objects fitted at once
+        largest = sorted([o["memory"] for o in objects], reverse=True)[:n_workers]
+        memory = int(np.prod(scan["background_shape"])) * 8 + sum(largest)
+
+        return {
+            "objects": objects,
+            "seconds": seconds,
+            "wall": schedule_length([o["seconds"] for o in objects], n_workers),
+            "memory": memory
+        }
+
+
+def schedule_length(costs, n_workers):
+    """Wall time of tasks run by n_workers, longest first, each on the
+    first free worker"""
+    loads = [0.0] * max(n_workers, 1)
+
+    for c in sorted(costs, reverse=True):
+        loads[loads.index(min(loads))] += c
+
+    return max(loads)
+
+
+def fit_cost_model(samples):
+    """Calibrate a cost model on measured fits
+
+    Args:
+        samples (list of dict): one per fitted object, "n_points",
+            "labels", "instances", the number of instances found for each
+            label, and the measured "seconds" and peak "memory"
+
+    Returns:
+        CostModel: non-negative least squares fit
+    """
+    from scipy.optimize import nnls
+
+    if len(samples) == 0:
+        raise Exception("No sample to calibrate the cost model")
+
+    counts = dict()
+    for s in samples:
+        for label, n in s["instances"].items():
+            counts.setdefault(str(label), []).append(n)
+
+    params = {
+        "version": COST_MODEL_VERSION,
+        "seconds": dict(),
+        "memory": dict(),
+        "instances": {label: float(np.mean(n)) for label, n in sorted(counts.items())}
+    }
+
+    model = CostModel(params)
+    features = np.array([
+        [model.object_features(s["n_points"], s["labels"])[k] for k in COST_FEATURES] for s in samples
+    ])
+
+    for target in ["seconds", "memory"]:
+        coeffs, _ = nnls(features, np.array([s[target] for s in samples], dtype=np.float64))
+        params[target] = {k: float(c) for k, c in zip(COST_FEATURES, coeffs)}
+
+    return model
@@ -1,3 +1,4 @@
 from part2cad.geom.geom_transform import *
 from part2cad.geom.geom_computation import *
 from part2cad.geom.meshlab_operation import *
+from part2cad.geom.voxel_grid import *
@@ -234,6 +234,18 @@ def calc_contact_score(ma, tfa, mb, tfb, angle_threshold=0.99, dist_threshold=0.
     return dist_score, dist_score
 
 
+def calc_center_dist_score(tfa, tfb):
+    """Cheap contact score: negative distance between the part centers,
+    the last fallback of calc_contact_score()
+
+    Args:
+        tfa, tfb (4x4 matrix): transformation matrices of centered meshes
+    """
+    dist_score = -np.linalg.norm(np.asarray(tfa)[:3, 3] - np.asarray(tfb)[:3, 3])
+
+    return dist_score, dist_score
+
+
 def get_obb_axis_extents(mesh, tf=None):
     print(mesh.extents)
     if tf is not None:
@@ -2,6 +2,8 @@ import numpy as np
 import trimesh
 from transforms3d.affines import compose
 
+from part2cad.precision import as_float64
+
 
 def normalize_vec(v):
     return v / np.sqrt(np.sum(v ** 2))
@@ -33,7 +35,7 @@ def centeralize_points(data):
     data[:, :3] = pc.vertices
     data[:, 3:6] = pcn.vertices
 
-    global_tf = compose(trans, np.eye(3), np.ones(3))
+    global_tf = compose(trans, np.eye(3), np.ones(3)).astype(data.dtype)
 
     return data, global_tf
 
@@ -48,8 +50,9 @@ def opt_rot_a2b(V_a, V_b):
     Returns:
         3x3 matrix: rotation matrix
     """
-    V_a = np.array(V_a).T
-    V_b = np.array(V_b).T
+    # always solved in double precision
+    V_a = as_float64(V_a).T
+    V_b = as_float64(V_b).T
 
     H = np.dot(V_a, V_b.T)
     U, S, V = np.linalg.svd(H)
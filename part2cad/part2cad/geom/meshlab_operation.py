@@ -1,8 +1,13 @@
 import os
-import pymeshlab
 
+from part2cad.tracing import span
 
+
+@span("export_pc_to_mesh_ply")
 def export_pc_to_mesh_ply(trimesh_pcd, file_out):
+    # deferred, pymeshlab takes long to load and is only needed here
+    import pymeshlab
+
     tmp_file_dir = "tmp.ply"
 
     # convert to absolute path
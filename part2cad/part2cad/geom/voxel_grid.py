@@ -0,0 +1,87 @@
+import numpy as np
+
+from part2cad.precision import as_float
+
+
+# points per chunk read from a (memory-mapped) array
+VOXEL_CHUNK_SIZE = 1 << 20
+
+# bits per axis of a packed voxel key, indices are offset to stay positive
+VOXEL_KEY_BITS = 21
+VOXEL_KEY_OFFSET = 1 << (VOXEL_KEY_BITS - 1)
+
+
+def voxel_keys(xyz, voxel_size):
+    """Pack the voxel indices of points into int64 keys
+
+    Args:
+        xyz (np.ndarray (n, 3)): point positions
+        voxel_size (float): voxel edge length
+
+    Returns:
+        np.ndarray (n,): int64 keys, ordered by x, then y, then z index
+    """
+    idx = np.floor(np.asarray(xyz, dtype=np.float64) / voxel_size).astype(np.int64) + VOXEL_KEY_OFFSET
+
+    if len(idx) > 0 and (idx.min() < 0 or idx.max() >= 1 << VOXEL_KEY_BITS):
+        raise Exception("Points exceed the voxel grid range, increase voxel size: `{}`".format(voxel_size))
+
+    return (idx[:, 0] << (2 * VOXEL_KEY_BITS)) | (idx[:, 1] << VOXEL_KEY_BITS) | idx[:, 2]
+
+
+def merge_voxels_(keys, sums, counts):
+    """Sum the rows sharing a key"""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+
+    merged = np.empty((len(uniq), sums.shape[1]), dtype=np.float64)
+    for c in range(sums.shape[1]):
+        merged[:, c] = np.bincount(inverse, weights=sums[:, c], minlength=len(uniq))
+
+    return uniq, merged, np.bincount(inverse, weights=counts, minlength=len(uniq))
+
+
+def fold_voxels_(grids):
+    """Merge (keys, sums, counts) reductions into one"""
+    return merge_voxels_(*[np.concatenate(g) for g in zip(*grids)])
+
+
+def voxel_downsample(points, voxel_size, chunk_size=VOXEL_CHUNK_SIZE):
+    """Voxel-downsample a point array chunk by chunk
+
+    Every column (position, color, ...) is averaged over the points of a
+    voxel. Only one chunk of `points` is read at a time, so a memory-mapped
+    array is never fully loaded; the memory used is bounded by the number
+    of occupied voxels.
+
+    Args:
+        points (np.ndarray (n, d)): points, xyz in the first 3 columns
+        voxel_size (float): voxel edge length
+        chunk_size (int): number of points read at once
+
+    Returns:
+        np.ndarray (m, d): one averaged point per occupied voxel, sorted
+            by voxel key
+    """
+    if voxel_size <= 0:
+        raise Exception("Voxel size must be positive: `{}`".format(voxel_size))
+
+    # every chunk is reduced on its own, the reductions are folded into
+    # the running grid once they outgrow it, so each voxel row is merged
+    # O(log n_chunks) times and memory stays bounded by the occupied voxels
+    grid = (np.empty(0, dtype=np.int64), np.empty((0, points.shape[1]), dtype=np.float64), np.empty(0))
+    pending, n_pending = [], 0
+
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+
+        reduced = merge_voxels_(voxel_keys(chunk[:, :3], voxel_size), chunk, np.ones(len(chunk)))
+        pending.append(reduced)
+        n_pending += len(reduced[0])
+
+        if n_pending >= max(chunk_size, len(grid[0])):
+            grid = fold_voxels_([grid] + pending)
+            pending, n_pending = [], 0
+
+    _, sums, counts = fold_voxels_([grid] + pending)
+
+    return as_float(sums / counts[:, None] if len(counts) > 0 else sums)
@@ -0,0 +1,247 @@
+import json
+import itertools
+
+import numpy as np
+
+
+#############################################
+# Binary kinematic graph (.npz)
+#
+#   version, root_id
+#   edges           (E, 2)  int64    <src_id, dst_id>
+#   strings         (S,)    unicode  string table
+#   schema          ()      unicode  JSON list of [key, kind]
+#
+# and one column per node attribute, in node order:
+#   int     col:<key> int64,   mask:<key> bool
+#   float   col:<key> float64, mask:<key> bool
+#   str     col:<key> int32    index in the string table, -1 if absent
+#   vec     col:<key> float64  (N, L) NaN padded, len:<key> int16, -1 if absent
+#   json    col:<key> int32    index of the JSON encoded value, -1 if absent
+#
+# Ints in float / vec columns are read back as floats.
+#############################################
+GRAPH_NPZ_VERSION = 1
+
+
+def is_number_(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def column_kind_(values):
+    """Pick the narrowest column type holding every present value"""
+    if all([isinstance(v, int) and not isinstance(v, bool) for v in values]):
+        return "int"
+    if all([is_number_(v) for v in values]):
+        return "float"
+    if all([isinstance(v, str) for v in values]):
+        return "str"
+    if all([isinstance(v, list) and all([is_number_(x) for x in v]) for v in values]):
+        return "vec"
+    return "json"
+
+
+class StringTable(object):
+
+    def __init__(self):
+        self.index_ = dict()
+        self.strings_ = []
+
+
+    def add(self, s):
+        if s not in self.index_:
+            self.index_[s] = len(self.strings_)
+            self.strings_.append(s)
+
+        return self.index_[s]
+
+
+    def to_array(self):
+        return np.array(self.strings_, dtype=np.str_)
+
+
+def save_graph_npz(gjson, output_file):
+    """Save a dumped graph, see KinoGraph.dump(), as typed arrays
+
+    Args:
+        gjson (dict): graph with "root_id", "edges" and "nodes"
+        output_file (str): output .npz file
+    """
+    nodes = gjson["nodes"]
+    n = len(nodes)
+
+    edges = np.array([[e["src_id"], e["dst_id"]] for e in gjson["edges"]], dtype=np.int64).reshape((-1, 2))
+
+    # attribute keys in order of first appearance
+    keys = []
+    for node in nodes:
+        for k in node.keys():
+            if k not in keys:
+                keys.append(k)
+
+    strings = StringTable()
+    arrays, schema = dict(), []
+
+    for key in keys:
+        present = [i for i, node in enumerate(nodes) if key in node]
+        values = [nodes[i][key] for i in present]
+        kind = column_kind_(values)
+
+        if kind in ["int", "float"]:
+            col = np.zeros(n, dtype=np.int64 if kind == "int" else np.float64)
+            mask = np.zeros(n, dtype=bool)
+            col[present] = values
+            mask[present] = True
+            arrays["mask:" + key] = mask
+        elif kind == "vec":
+            width = max([len(v) for v in values])
+            col = np.full((n, width), np.nan, dtype=np.float64)
+            length = np.full(n, -1, dtype=np.int16)
+            for i, v in zip(present, values):
+                col[i, :len(v)] = v
+                length[i] = len(v)
+            arrays["len:" + key] = length
+        else:
+            col = np.full(n, -1, dtype=np.int32)
+            for i, v in zip(present, values):
+                col[i] = strings.add(v if kind == "str" else json.dumps(v))
+
+        arrays["col:" + key] = col
+        schema.append([key, kind])
+
+    np.savez(
+        output_file,
+        version=np.int64(GRAPH_NPZ_VERSION),
+        root_id=np.int64(gjson["root_id"]),
+        edges=edges,
+        strings=strings.to_array(),
+        schema=np.array(json.dumps(schema)),
+        **arrays
+    )
+
+    return output_file
+
+
+def load_graph_npz(graph_file):
+    """Load a binary graph back into the dumped dict layout"""
+    with np.load(graph_file, allow_pickle=False) as data:
+        if int(data["version"]) != GRAPH_NPZ_VERSION:
+            raise Exception("Unsupported graph version: `{}`".format(int(data["version"])))
+
+        schema = json.loads(str(data["schema"]))
+        strings = data["strings"].tolist()
+
+        columns = []
+        for key, kind in schema:
+            col = data["col:" + key]
+
+            if kind in ["int", "float"]:
+                present = data["mask:" + key]
+                values = col.tolist()
+            elif kind == "vec":
+                length = data["len:" + key]
+                present = length >= 0
+                values = [row[:l] for row, l in zip(col.tolist(), length.tolist())]
+            else:
+                present = col >= 0
+                values = [strings[i] for i in col.tolist()]
+                if kind == "json":
+                    values = [json.loads(v) if p else None for v, p in zip(values, present)]
+
+            columns.append( (key, present.tolist(), values) )
+
+        n = len(columns[0][1]) if len(columns) > 0 else 0
+        nodes = [dict() for _ in range(n)]
+
+        for key, present, values in columns:
+            for i in range(n):
+                if present[i]:
+                    nodes[i][key] = values[i]
+
+        gjson = {
+            "edges": [{"dst_id": int(d), "src_id": int(s)} for s, d in data["edges"].tolist()],
+            "nodes": nodes,
+            "root_id": int(data["root_id"])
+        }
+
+    return gjson
+
+
+#############################################
+# Streaming JSON
+#############################################
+def write_graph_json_stream(fout, root_id, edges, nodes):
+    """Write a graph as compact JSON, one edge / node at a time
+
+    Args:
+        fout (file): opened text file
+        root_id (int): root node id
+        edges (iterable of dict): edges, as in KinoGraph.dump()
+        nodes (iterable of dict): nodes, as in KinoGraph.dump()
+    """
+    fout.write("{\"edges\": [")
+    for i, e in enumerate(edges):
+        fout.write(", " if i > 0 else "")
+        fout.write(json.dumps(e))
+
+    fout.write("], \"nodes\": [")
+    for i, node in enumerate(nodes):
+        fout.write(", " if i > 0 else "")
+        fout.write(json.dumps(node))
+
+    fout.write("], \"root_id\": {}}}".format(json.dumps(root_id)))
+
+
+def iter_fragment_items_(fragment_files, key):
+    for fragment_file in fragment_files:
+        with open(fragment_file, "r") as fin:
+            for item in json.load(fin)[key]:
+                yield item
+
+
+def stitch_graph_fragments(fragment_files, root_id, edges, output_file, graph_format="json"):
+    """Merge per-object graph fragments into the scene graph
+
+    Fragments are read one at a time for the JSON formats, only the
+    binary format needs the whole graph in memory.
+
+    Args:
+        fragment_files (list of str): dumped PartGraph of each object,
+            in scene order
+        root_id (int): root node id of the scene
+        edges (list of tuple): edges between the fragments
+        output_file (str): output graph file
+        graph_format (str): "json", "json-stream" (both written compact)
+            or "npz"
+    """
+    edges = [{"dst_id": e[1], "src_id": e[0]} for e in edges]
+
+    if graph_format == "npz":
+        gjson = {
+            "edges": list(iter_fragment_items_(fragment_files, "edges")) + edges,
+            "nodes": list(iter_fragment_items_(fragment_files, "nodes")),
+            "root_id": root_id
+        }
+        return save_graph_npz(gjson, output_file)
+
+    if graph_format not in ["json", "json-stream"]:
+        raise Exception("Does not support graph format: `{}`".format(graph_format))
+
+    with open(output_file, "w") as fout:
+        write_graph_json_stream(
+            fout,
+            root_id,
+            itertools.chain(iter_fragment_items_(fragment_files, "edges"), edges),
+            iter_fragment_items_(fragment_files, "nodes")
+        )
+
+    return output_file
+
+
+def load_graph(graph_file):
+    """Load a kinematic graph saved as .json or .npz"""
+    if graph_file.endswith(".npz"):
+        return load_graph_npz(graph_file)
+
+    with open(graph_file, "r") as fin:
+        return json.load(fin)
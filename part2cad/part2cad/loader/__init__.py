@@ -0,0 +1,197 @@
+import io
+import contextlib
+
+import trimesh
+import numpy as np
+
+from part2cad.precision import as_float, get_float_dtype
+from part2cad.tracing import span
+from part2cad.geom.voxel_grid import voxel_downsample
+from part2cad.loader.backend import StorageBackend, DirectoryBackend, ArchiveBackend
+from part2cad.loader.backend import TarBackend, ZipBackend, ReadAheadBackend
+from part2cad.loader.backend import open_scene, get_scene_name, sort_object_names
+
+
+BACKGROUND_NPY_FILE = "scen_without_objects_nature_color.npy"
+RAW_OBJECT_FILENAME = "source_object_point.npy"
+GT_OBJECT_FILENAME = "gt_partnet_in_sannet_xyz_normals_24id_307id_ourid.npy"
+SEG_INPUT_FILENAME = "6144_gt_input.npy"
+SEG_LABEL_FILENAME = "net_pred_id.npy"
+STRUCTURENET_OBJECT_FILENAME = "source_object_point_xyz_partid_structurenet.npy"
+STRUCTURENET_OBJECT_SCENENN_FILENAME = "gt_partnet_in_sannet_xyz_normals_24id_307id_ourid_xyz_partid_structurenet.npy"
+RAW_SCENE_PLY = "soure_scen_point_clouds.ply"
+
+
+@contextlib.contextmanager
+def scene_backend(scene_root, catalog=None, read_ahead=1):
+    """Open a scene for the duration of a with block
+
+    A backend passed in is used as is and left open for its owner.
+    """
+    if isinstance(scene_root, StorageBackend):
+        yield scene_root
+        return
+
+    backend = open_scene(scene_root, catalog, read_ahead)
+    try:
+        yield backend
+    finally:
+        backend.close()
+
+
+def get_object_dir(scene_root, catalog=None):
+    """List object folders of a scene directory
+
+    Args:
+        scene_root (str): scene directory
+        catalog (DatasetCatalog): optional catalog index, replaces the
+            directory listing when given
+    """
+    backend = DirectoryBackend(scene_root, catalog)
+
+    return [backend.object_dir(name) for name in backend.list_objects()]
+
+
+@span("load_background")
+def load_background(backend, voxel_size=None):
+    """Load the background points
+
+    Args:
+        backend (StorageBackend): opened scene
+        voxel_size (float): voxel-downsample the points to this resolution,
+            the array is memory-mapped and reduced chunk by chunk when the
+            backend allows it
+
+    Returns:
+        np.ndarray (n, 6): background points with colors
+    """
+    if voxel_size is None:
+        return as_float(backend.load_npy(None, BACKGROUND_NPY_FILE))
+
+    points = backend.load_npy(None, BACKGROUND_NPY_FILE, mmap=backend.can_mmap)
+    return voxel_downsample(points, voxel_size)
+
+
+def load_raw_scene_ply(backend):
+    data = backend.read_bytes(None, RAW_SCENE_PLY)
+    return trimesh.load(io.BytesIO(data), file_type="ply")
+
+
+@span("load_gt_object")
+def load_gt_object(backend, obj_name):
+    return as_float(backend.load_npy(obj_name, GT_OBJECT_FILENAME))
+
+
+def structurenet_object_file(backend, obj_name):
+    filename = STRUCTURENET_OBJECT_FILENAME
+
+    if not backend.exists(obj_name, filename):
+        filename = STRUCTURENET_OBJECT_SCENENN_FILENAME
+
+        if not backend.exists(obj_name, filename):
+            filename = GT_OBJECT_FILENAME
+
+    return filename
+
+
+@span("load_structurenet_object")
+def load_structurenet_object(backend, obj_name):
+    points = backend.load_npy(obj_name, structurenet_object_file(backend, obj_name))
+
+    if points.shape[1] == 4:
+        points = expand_structurenet_points(points, backend.load_npy(obj_name, GT_OBJECT_FILENAME))
+
+    return as_float(points)
+
+
+def expand_structurenet_points(points, gt_pts):
+    """Expand (n, 4) <x, y, z, part_id> structurenet outputs to the
+    (n, 9) layout, taking the object id from the ground-truth points"""
+    tmp = np.ones((points.shape[0], 9), dtype=get_float_dtype())
+    tmp[:, :3] = points[:, :3]
+    tmp[:, 6] = gt_pts[0, 6]
+    tmp[:, 7] = points[:, 3]
+    tmp[:, 8] = points[:, 3]
+
+    return tmp
+
+
+# per-object loaders used by the streaming pipeline, keyed by loader mode
+OBJECT_LOADERS = {
+    "gt": load_gt_object,
+    "snet": load_structurenet_object
+}
+
+
+##############################################################
+# Scene loaders, `scene_root` is a scene directory, a tar / zip
+# archive, a packed scene file or an opened StorageBackend
+##############################################################
+@span("load_seg_scene")
+def load_seg_scene(scene_root, catalog=None):
+    with scene_backend(scene_root, catalog) as backend:
+        obj_names = backend.list_objects()
+
+        bg_points = backend.load_npy(None, BACKGROUND_NPY_FILE)
+        obj_points_list, part_labels_list = [], []
+        for name in obj_names:
+            obj_points_list.append(backend.load_npy(name, SEG_INPUT_FILENAME))
+            part_labels_list.append(backend.load_npy(name, SEG_LABEL_FILENAME))
+
+    for points, labels in zip(obj_points_list, part_labels_list):
+        points[:, 7] = labels
+        points[:, 8] = labels
+
+    return bg_points, obj_points_list
+
+
+@span("load_raw_scene")
+def load_raw_scene(scene_root, catalog=None):
+    with scene_backend(scene_root, catalog) as backend:
+        bg_points = backend.load_npy(None, BACKGROUND_NPY_FILE)
+        obj_points_list = [backend.load_npy(name, RAW_OBJECT_FILENAME) for name in backend.list_objects()]
+
+    return bg_points, obj_points_list
+
+
+@span("load_det_scene")
+def load_det_scene(scene_root, catalog=None):
+    with scene_backend(scene_root, catalog) as backend:
+        bg_points = backend.load_npy(None, BACKGROUND_NPY_FILE)
+        obj_points_list, gt_pts_list = [], []
+        for name in backend.list_objects():
+            obj_points_list.append(backend.load_npy(name, RAW_OBJECT_FILENAME))
+            gt_pts_list.append(backend.load_npy(name, GT_OBJECT_FILENAME))
+
+    obj_types = [int(pts[0][6]) for pts in gt_pts_list]
+
+    return bg_points, obj_points_list, obj_types
+
+
+@span("load_gt_scene")
+def load_gt_scene(scene_root, catalog=None, bg_voxel=None):
+    with scene_backend(scene_root, catalog) as backend:
+        bg_points = load_background(backend, bg_voxel)
+        obj_points_list = [load_gt_object(backend, name) for name in backend.list_objects()]
+
+    return bg_points, obj_points_list
+
+
+@span("load_structurenet_scene")
+def load_structurenet_scene(scene_root, catalog=None, bg_voxel=None):
+    with scene_backend(scene_root, catalog) as backend:
+        obj_points_list = [load_structurenet_object(backend, name) for name in backend.list_objects()]
+        bg_points = load_background(backend, bg_voxel)
+
+    return bg_points, obj_points_list
+
+
+def load_object_sample(scene_root, object_dir):
+    obj_name = object_dir.strip('/').split('/')[-1]
+
+    with scene_backend(scene_root, read_ahead=0) as backend:
+        raw_scene_ply = load_raw_scene_ply(backend)
+        raw_obj_pts = backend.load_npy(obj_name, RAW_OBJECT_FILENAME)
+        gt_obj_pts = backend.load_npy(obj_name, GT_OBJECT_FILENAME)
+
+    return raw_obj_pts, gt_obj_pts, raw_scene_ply
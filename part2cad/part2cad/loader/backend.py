@@ -0,0 +1,434 @@
+import io
+import os
+import abc
+import glob
+import queue
+import tarfile
+import zipfile
+import threading
+
+import numpy as np
+
+from part2cad.constants import PACKED_SCENE_EXT, BACKGROUND_NPY_FILE
+
+
+TAR_EXTS = [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"]
+ZIP_EXTS = [".zip"]
+
+
+def sort_object_names(obj_names):
+    """Scene order of the objects, object indices follow it
+
+    Shared by every storage backend and the catalog, so that a scene read
+    from a folder, an archive or a packed file gives the same indices.
+    """
+    return sorted(obj_names)
+
+
+class StorageBackend(abc.ABC):
+    """Read-only access to the files of a single scene
+
+    A file is addressed by an object name and a filename, the object name
+    being None for the scene-level files (background, raw scene ply).
+    """
+
+    @abc.abstractmethod
+    def list_objects(self):
+        pass
+
+
+    @abc.abstractmethod
+    def exists(self, obj_name, filename):
+        pass
+
+
+    @abc.abstractmethod
+    def read_bytes(self, obj_name, filename):
+        pass
+
+
+    @property
+    def can_mmap(self):
+        """Whether load_npy() can memory-map arrays"""
+        return False
+
+
+    def load_npy(self, obj_name, filename, mmap=False):
+        if mmap:
+            raise Exception("`{}` cannot memory-map `{}`".format(type(self).__name__, filename))
+
+        return np.load(io.BytesIO(self.read_bytes(obj_name, filename)))
+
+
+    def close(self):
+        pass
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DirectoryBackend(StorageBackend):
+
+    def __init__(self, scene_root, catalog=None):
+        """Scene stored as a plain folder
+
+        Args:
+            scene_root (str): scene directory
+            catalog (DatasetCatalog): optional catalog index, replaces the
+                directory listing and file checks when given
+        """
+        self.root_ = scene_root.rstrip('/')
+        self.catalog_ = catalog
+
+
+    def object_dir(self, obj_name):
+        return "{}/{}".format(self.root_, obj_name)
+
+
+    def list_objects(self):
+        if self.catalog_ is not None:
+            obj_dirs = self.catalog_.object_dirs(self.root_)
+        else:
+            obj_dirs = [d[:-1] for d in glob.glob("{}/*/".format(self.root_))]
+
+        return sort_object_names([d.split('/')[-1] for d in obj_dirs])
+
+
+    def exists(self, obj_name, filename):
+        if self.catalog_ is not None:
+            if obj_name is None:
+                return self.catalog_.scene_file_info(self.root_, filename) is not None
+            return self.catalog_.has_file(self.object_dir(obj_name), filename)
+
+        return os.path.isfile(self.path_(obj_name, filename))
+
+
+    def read_bytes(self, obj_name, filename):
+        with open(self.path_(obj_name, filename), "rb") as fin:
+            return fin.read()
+
+
+    @property
+    def can_mmap(self):
+        return True
+
+
+    def load_npy(self, obj_name, filename, mmap=False):
+        return np.load(self.path_(obj_name, filename), mmap_mode="r" if mmap else None)
+
+
+    def path_(self, obj_name, filename):
+        if obj_name is None:
+            return "{}/{}".format(self.root_, filename)
+
+        return "{}/{}/{}".format(self.root_, obj_name, filename)
+
+
+class ArchiveBackend(StorageBackend):
+
+    def __init__(self, archive_file):
+        """Scene stored as members of an archive, read without extraction
+
+        Archives may or may not wrap the scene in a top-level folder, see
+        scene_prefix_(). Reads are serialized, the archive handle is not
+        thread-safe.
+        """
+        self.file_ = archive_file
+        self.lock_ = threading.Lock()
+
+        members = dict()
+        for name, member in self.list_members_():
+            if name.startswith("./"):
+                name = name[2:]
+            members[tuple(name.split('/'))] = member
+
+        if len(members) == 0:
+            raise Exception("Archive `{}` is empty".format(archive_file))
+
+        prefix = self.scene_prefix_(members.keys())
+
+        # (obj_name, filename) -> member, obj_name is None at the scene root
+        self.members_ = dict()
+        for key, member in members.items():
+            if key[:len(prefix)] != prefix:
+                continue
+
+            rel = key[len(prefix):]
+            if len(rel) == 1:
+                self.members_[(None, rel[0])] = member
+            elif len(rel) == 2:
+                self.members_[rel] = member
+
+        self.objects_ = sort_object_names(set([k[0] for k in self.members_.keys() if k[0] is not None]))
+
+
+    def list_objects(self):
+        return self.objects_[:]
+
+
+    def exists(self, obj_name, filename):
+        return (obj_name, filename) in self.members_
+
+
+    def read_bytes(self, obj_name, filename):
+        if not self.exists(obj_name, filename):
+            raise Exception("`{}` has no member `{}/{}`".format(self.file_, obj_name, filename))
+
+        with self.lock_:
+            return self.read_member_(self.members_[(obj_name, filename)])
+
+
+    @staticmethod
+    def scene_prefix_(keys):
+        """Path components of the scene root inside the archive
+
+        The folder holding the background file, or else the top-level
+        folder shared by every member when stripping it still leaves object
+        folders, i.e. members at least two levels below it.
+        """
+        backgrounds = [k for k in keys if k[-1] == BACKGROUND_NPY_FILE]
+        if len(backgrounds) > 0:
+            return min(backgrounds, key=len)[:-1]
+
+        tops = set([k[0] for k in keys])
+        if len(tops) == 1 and any([len(k) > 2 for k in keys]):
+            return (tops.pop(),)
+
+        return tuple()
+
+
+    @abc.abstractmethod
+    def list_members_(self):
+        """Yield (name, member) of every regular file of the archive"""
+        pass
+
+
+    @abc.abstractmethod
+    def read_member_(self, member):
+        pass
+
+
+class TarBackend(ArchiveBackend):
+
+    def __init__(self, tar_file):
+        """Scene stored in a tar archive, optionally gzip/bz2/xz compressed
+
+        Compressed tars cannot seek, members are cheapest to read in
+        archive order, which is the object order of list_objects() when the
+        archive was created from a scene folder.
+        """
+        self.tar_ = tarfile.open(tar_file, "r:*")
+        super(TarBackend, self).__init__(tar_file)
+
+
+    def list_members_(self):
+        for m in self.tar_.getmembers():
+            if m.isfile():
+                yield m.name, m
+
+
+    def read_member_(self, member):
+        return self.tar_.extractfile(member).read()
+
+
+    def close(self):
+        self.tar_.close()
+
+
+class ZipBackend(ArchiveBackend):
+
+    def __init__(self, zip_file):
+        """Scene stored in a zip archive"""
+        self.zip_ = zipfile.ZipFile(zip_file, "r")
+        super(ZipBackend, self).__init__(zip_file)
+
+
+    def list_members_(self):
+        for info in self.zip_.infolist():
+            if not info.is_dir():
+                yield info.filename, info
+
+
+    def read_member_(self, member):
+        return self.zip_.read(member)
+
+
+    def close(self):
+        self.zip_.close()
+
+
+class ReadAheadBackend(StorageBackend):
+
+    def __init__(self, backend, depth=1):
+        """Prefetch the arrays of the next objects in a background thread
+
+        Objects are expected to be read in list_objects() order. When an
+        object is first read, the files read so far from any object are
+        fetched and decoded for the next `depth` objects, so the next
+        members are on hand once the caller is done with the current one.
+
+        Args:
+            backend (StorageBackend): wrapped backend, closed with this one
+            depth (int): number of objects to read ahead
+        """
+        self.backend_ = backend
+        self.depth_ = depth
+
+        self.objects_ = backend.list_objects()
+        self.order_ = {name: i for i, name in enumerate(self.objects_)}
+
+        # filenames read by the caller, in the order they were first read
+        self.filenames_ = []
+        # (obj_name, filename) -> array, and keys being fetched
+        self.cache_ = dict()
+        self.pending_ = set()
+        self.scheduled_ = set()
+        # index of the object the caller is reading
+        self.current_ = -1
+
+        self.cond_ = threading.Condition()
+        self.queue_ = queue.Queue()
+
+        self.thread_ = threading.Thread(target=self.worker_)
+        self.thread_.daemon = True
+        self.thread_.start()
+
+
+    def list_objects(self):
+        return self.objects_[:]
+
+
+    def exists(self, obj_name, filename):
+        return self.backend_.exists(obj_name, filename)
+
+
+    def read_bytes(self, obj_name, filename):
+        return self.backend_.read_bytes(obj_name, filename)
+
+
+    @property
+    def can_mmap(self):
+        return self.backend_.can_mmap
+
+
+    def load_npy(self, obj_name, filename, mmap=False):
+        if mmap or obj_name not in self.order_:
+            return self.backend_.load_npy(obj_name, filename, mmap)
+
+        key = (obj_name, filename)
+        self.schedule_(obj_name, filename)
+
+        with self.cond_:
+            while key in self.pending_:
+                self.cond_.wait()
+
+            if key in self.cache_:
+                return self.cache_.pop(key)
+
+        return self.backend_.load_npy(obj_name, filename)
+
+
+    def close(self):
+        self.queue_.put(None)
+        self.thread_.join()
+        self.backend_.close()
+
+
+    def schedule_(self, obj_name, filename):
+        idx = self.order_[obj_name]
+
+        with self.cond_:
+            if filename not in self.filenames_:
+                self.filenames_.append(filename)
+
+            self.current_ = max(self.current_, idx)
+
+            # drop what was prefetched for objects the caller went past
+            for key in list(self.cache_.keys()):
+                if self.order_[key[0]] < idx:
+                    del self.cache_[key]
+
+            for name in self.objects_[idx + 1:idx + 1 + self.depth_]:
+                for fn in self.filenames_:
+                    key = (name, fn)
+                    if key not in self.scheduled_:
+                        self.scheduled_.add(key)
+                        self.pending_.add(key)
+                        self.queue_.put(key)
+
+
+    def worker_(self):
+        while True:
+            key = self.queue_.get()
+            if key is None:
+                break
+
+            arr = None
+            try:
+                if self.backend_.exists(*key):
+                    arr = self.backend_.load_npy(*key)
+            except Exception:
+                # left to the caller, which reads the file again and fails
+                arr = None
+
+            with self.cond_:
+                self.pending_.discard(key)
+                if arr is not None and self.order_[key[0]] >= self.current_:
+                    self.cache_[key] = arr
+                self.cond_.notify_all()
+
+
+def has_ext(path, exts):
+    return any([path.endswith(ext) for ext in exts])
+
+
+def open_scene(scene_root, catalog=None, read_ahead=1):
+    """Open a scene folder, archive or packed scene file
+
+    Args:
+        scene_root (str or StorageBackend): scene directory, tar / zip
+            archive or packed scene file, returned as is if already a
+            backend
+        catalog (DatasetCatalog): optional catalog index, only used for
+            scene directories
+        read_ahead (int): number of objects to prefetch, 0 to disable
+
+    Returns:
+        StorageBackend: the scene backend, to be closed by the caller
+    """
+    if isinstance(scene_root, StorageBackend):
+        return scene_root
+
+    if os.path.isdir(scene_root):
+        backend = DirectoryBackend(scene_root, catalog)
+    elif scene_root.endswith(PACKED_SCENE_EXT):
+        # imported here, packed_scene itself depends on the loader
+        from part2cad.packed_scene import PackedBackend
+        backend = PackedBackend(scene_root)
+    elif has_ext(scene_root, ZIP_EXTS):
+        backend = ZipBackend(scene_root)
+    elif has_ext(scene_root, TAR_EXTS):
+        backend = TarBackend(scene_root)
+    else:
+        raise Exception("Does not support scene storage: `{}`".format(scene_root))
+
+    if read_ahead > 0:
+        backend = ReadAheadBackend(backend, read_ahead)
+
+    return backend
+
+
+def get_scene_name(scene_root):
+    """Name of a scene, without the archive or packed file extension"""
+    name = scene_root.rstrip('/').split('/')[-1]
+
+    for ext in TAR_EXTS + ZIP_EXTS + [PACKED_SCENE_EXT]:
+        if name.endswith(ext):
+            return name[:-len(ext)]
+
+    return name
@@ -0,0 +1,101 @@
+import hashlib
+
+import numpy as np
+import trimesh
+
+
+#############################################
+# Mesh bundle: all part meshes of an object (or a scene) in one .npz
+#
+#   ids             (k,)    int64 or unicode, cad ids, mesh i is <ids[i]>.stl
+#   vertex_offsets  (k+1,)  int64    vertices of mesh i: [vo[i], vo[i+1])
+#   face_offsets    (k+1,)  int64    faces of mesh i: [fo[i], fo[i+1])
+#   vertices        (V, 3)  float32
+#   faces           (F, 3)  int32    indices local to each mesh
+#############################################
+MESH_BUNDLE_VERSION = 1
+
+# vertex quantization of mesh_content_hash(), in meters
+MESH_HASH_RESOLUTION = 1e-6
+
+
+def mesh_content_hash(mesh, resolution=MESH_HASH_RESOLUTION):
+    """Hash the geometry of a triangle mesh
+
+    Vertices are quantized to `resolution` first, so meshes built from
+    the same primitive and extents hash equally despite float noise.
+
+    Returns:
+        str: 16 hex digits
+    """
+    vertices = np.round(np.asarray(mesh.vertices) / resolution).astype(np.int64)
+    faces = np.asarray(mesh.faces, dtype=np.int64)
+
+    h = hashlib.sha1()
+    h.update(np.array(vertices.shape + faces.shape, dtype=np.int64).tobytes())
+    h.update(vertices.tobytes())
+    h.update(faces.tobytes())
+
+    return h.hexdigest()[:16]
+
+
+def save_mesh_bundle(meshes, output_file):
+    """Save triangle meshes into a single bundle file
+
+    Args:
+        meshes (dict): cad id (int or str) -> trimesh.Trimesh
+        output_file (str): bundle file (.npz)
+    """
+    ids = sorted(meshes.keys())
+
+    n_verts = [len(meshes[i].vertices) for i in ids]
+    n_faces = [len(meshes[i].faces) for i in ids]
+
+    vertex_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    face_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    vertex_offsets[1:] = np.cumsum(n_verts)
+    face_offsets[1:] = np.cumsum(n_faces)
+
+    vertices = np.empty((vertex_offsets[-1], 3), dtype=np.float32)
+    faces = np.empty((face_offsets[-1], 3), dtype=np.int32)
+
+    for k, i in enumerate(ids):
+        vertices[vertex_offsets[k]:vertex_offsets[k + 1]] = meshes[i].vertices
+        faces[face_offsets[k]:face_offsets[k + 1]] = meshes[i].faces
+
+    np.savez(
+        output_file,
+        version=np.int64(MESH_BUNDLE_VERSION),
+        ids=np.array(ids, dtype=np.int64 if all([isinstance(i, int) for i in ids]) else np.str_),
+        vertex_offsets=vertex_offsets,
+        face_offsets=face_offsets,
+        vertices=vertices,
+        faces=faces
+    )
+
+    return output_file
+
+
+def load_mesh_bundle(bundle_file):
+    """Load a bundle file back into trimesh objects
+
+    Returns:
+        dict: cad id -> trimesh.Trimesh
+    """
+    data = np.load(bundle_file)
+
+    if int(data["version"]) != MESH_BUNDLE_VERSION:
+        raise Exception("Unsupported mesh bundle version: `{}`".format(int(data["version"])))
+
+    vo, fo = data["vertex_offsets"], data["face_offsets"]
+    vertices, faces = data["vertices"], data["faces"]
+
+    meshes = dict()
+    for k, i in enumerate(data["ids"]):
+        meshes[i.item()] = trimesh.Trimesh(
+            vertices=vertices[vo[k]:vo[k + 1]],
+            faces=faces[fo[k]:fo[k + 1]],
+            process=False
+        )
+
+    return meshes
@@ -0,0 +1,307 @@
+import io
+import os
+import json
+import zlib
+import struct
+
+import trimesh
+import numpy as np
+
+from part2cad.constants import COMPLETE_OBJECT_FILENAME
+from part2cad.loader import StorageBackend, scene_backend
+from part2cad.loader import BACKGROUND_NPY_FILE, RAW_SCENE_PLY
+from part2cad.loader import RAW_OBJECT_FILENAME, GT_OBJECT_FILENAME
+from part2cad.loader import SEG_INPUT_FILENAME, SEG_LABEL_FILENAME
+from part2cad.loader import STRUCTURENET_OBJECT_FILENAME, STRUCTURENET_OBJECT_SCENENN_FILENAME
+
+
+#############################################
+# Packed scene file layout
+#
+#   MAGIC
+#   column chunks (64-byte aligned, optionally zlib compressed)
+#   footer (utf-8 JSON)
+#   footer size (uint64, little endian)
+#   MAGIC
+#
+# The footer holds, for every column, an offset table with one entry
+# per object: [offset, nbytes, shape, dtype] or null if the file is
+# missing.
+#############################################
+MAGIC = b"P2CSCENE"
+PACKED_SCENE_VERSION = 1
+CHUNK_ALIGNMENT = 64
+
+# column name -> source filename in an object folder
+OBJECT_COLUMNS = {
+    "raw": RAW_OBJECT_FILENAME,
+    "gt": GT_OBJECT_FILENAME,
+    "seg_input": SEG_INPUT_FILENAME,
+    "seg_label": SEG_LABEL_FILENAME,
+    "complete": COMPLETE_OBJECT_FILENAME,
+    "structurenet": STRUCTURENET_OBJECT_FILENAME,
+    "structurenet_scenenn": STRUCTURENET_OBJECT_SCENENN_FILENAME
+}
+
+# column name -> source filename in the scene folder
+SCENE_COLUMNS = {
+    "background": BACKGROUND_NPY_FILE,
+    "raw_ply": RAW_SCENE_PLY
+}
+
+
+class PackedSceneWriter(object):
+
+    def __init__(self, output_file, compress=False, level=6):
+        self.fout_ = open(output_file, "wb")
+        self.compress_ = compress
+        self.level_ = level
+
+        self.fout_.write(MAGIC)
+
+
+    def write_chunk(self, arr):
+        """Append an array and return its offset table entry"""
+        arr = np.ascontiguousarray(arr)
+        data = arr.tobytes()
+
+        if self.compress_:
+            data = zlib.compress(data, self.level_)
+
+        # pad to the alignment so uncompressed chunks can be memory-mapped
+        pos = self.fout_.tell()
+        pad = (-pos) % CHUNK_ALIGNMENT
+        self.fout_.write(b"\0" * pad)
+
+        offset = pos + pad
+        self.fout_.write(data)
+
+        return [offset, len(data), list(arr.shape), arr.dtype.str]
+
+
+    def close(self, footer):
+        footer = json.dumps(footer).encode("utf-8")
+
+        self.fout_.write(footer)
+        self.fout_.write(struct.pack("<Q", len(footer)))
+        self.fout_.write(MAGIC)
+        self.fout_.close()
+
+
+def pack_scene(scene_root, output_file, compress=False, catalog=None):
+    """Pack a scene into a single columnar file
+
+    Chunks of one column are written contiguously, object after object,
+    so that sweeping a single column reads the file sequentially.
+
+    Args:
+        scene_root (str): scene directory or tar / zip archive
+        output_file (str): packed scene file
+        compress (bool): zlib-compress every chunk independently
+        catalog (DatasetCatalog): optional catalog index
+    """
+    writer = PackedSceneWriter(output_file, compress)
+
+    with scene_backend(scene_root, catalog, read_ahead=0) as backend:
+        obj_names = backend.list_objects()
+
+        footer = {
+            "version": PACKED_SCENE_VERSION,
+            "compression": "zlib" if compress else "none",
+            "objects": obj_names,
+            "columns": dict(),
+            "scene": dict()
+        }
+
+        for col, filename in OBJECT_COLUMNS.items():
+            table = []
+
+            for name in obj_names:
+                if not backend.exists(name, filename):
+                    table.append(None)
+                    continue
+
+                # every chunk keeps its own dtype, objects are not cast
+                table.append(writer.write_chunk(backend.load_npy(name, filename)))
+
+            if any(chunk is not None for chunk in table):
+                footer["columns"][col] = {"chunks": table}
+
+        if backend.exists(None, BACKGROUND_NPY_FILE):
+            arr = backend.load_npy(None, BACKGROUND_NPY_FILE)
+            footer["scene"]["background"] = {"chunk": writer.write_chunk(arr)}
+
+        if backend.exists(None, RAW_SCENE_PLY):
+            arr = np.frombuffer(backend.read_bytes(None, RAW_SCENE_PLY), dtype="uint8")
+            footer["scene"]["raw_ply"] = {"chunk": writer.write_chunk(arr)}
+
+    writer.close(footer)
+
+    print("[INFO] Packed scene `{}` ({} objects) saved at: {}".format(
+        scene_root, len(obj_names), output_file))
+
+    return output_file
+
+
+class PackedScene(object):
+
+    def __init__(self, packed_file):
+        """Random access reader of a packed scene
+
+        Only the footer is read on open, every chunk is then read with a
+        single positional read, so slicing one object never touches the
+        chunks of the others. Reads are thread-safe.
+        """
+        self.file_ = packed_file
+        self.fd_ = os.open(packed_file, os.O_RDONLY)
+
+        size = os.fstat(self.fd_).st_size
+        tail = os.pread(self.fd_, 8 + len(MAGIC), size - 8 - len(MAGIC))
+
+        if tail[8:] != MAGIC or os.pread(self.fd_, len(MAGIC), 0) != MAGIC:
+            raise Exception("`{}` is not a packed scene file".format(packed_file))
+
+        footer_size = struct.unpack("<Q", tail[:8])[0]
+        footer = os.pread(self.fd_, footer_size, size - 8 - len(MAGIC) - footer_size)
+        footer = json.loads(footer.decode("utf-8"))
+
+        if footer["version"] != PACKED_SCENE_VERSION:
+            raise Exception("Unsupported packed scene version: `{}`".format(footer["version"]))
+
+        self.compressed_ = footer["compression"] == "zlib"
+        self.objects_ = footer["objects"]
+        self.columns_ = footer["columns"]
+        self.scene_ = footer["scene"]
+
+
+    def __del__(self):
+        self.close()
+
+
+    def close(self):
+        if getattr(self, "fd_", None) is not None:
+            os.close(self.fd_)
+            self.fd_ = None
+
+
+    @property
+    def object_names(self):
+        return self.objects_[:]
+
+
+    @property
+    def n_objects(self):
+        return len(self.objects_)
+
+
+    def has(self, column, obj_idx):
+        if column not in self.columns_:
+            return False
+
+        return self.columns_[column]["chunks"][obj_idx] is not None
+
+
+    def load(self, column, obj_idx, mmap=False):
+        """Load the array of one object in a column
+
+        Args:
+            column (str): column name, see OBJECT_COLUMNS
+            obj_idx (int): object index
+            mmap (bool): memory-map the chunk instead of reading it,
+                only for uncompressed files
+        """
+        if not self.has(column, obj_idx):
+            raise Exception("Object `{}` has no column `{}`".format(self.objects_[obj_idx], column))
+
+        return self.read_chunk_(self.columns_[column]["chunks"][obj_idx], mmap)
+
+
+    def has_scene(self, column):
+        return column in self.scene_
+
+
+    def load_scene(self, column, mmap=False):
+        """Load a scene-level column, see SCENE_COLUMNS"""
+        if not self.has_scene(column):
+            raise Exception("Packed scene `{}` has no column `{}`".format(self.file_, column))
+
+        return self.read_chunk_(self.scene_[column]["chunk"], mmap)
+
+
+    def load_background(self, mmap=False):
+        return self.load_scene("background", mmap)
+
+
+    def load_raw_ply(self):
+        data = self.load_scene("raw_ply")
+        return trimesh.load(io.BytesIO(data.tobytes()), file_type="ply")
+
+
+    def read_chunk_(self, chunk, mmap=False):
+        offset, nbytes, shape, dtype = chunk
+
+        if mmap:
+            if self.compressed_:
+                raise Exception("Cannot memory-map a compressed packed scene")
+            return np.memmap(self.file_, dtype=dtype, mode="r", offset=offset, shape=tuple(shape))
+
+        data = os.pread(self.fd_, nbytes, offset)
+
+        if self.compressed_:
+            data = zlib.decompress(data)
+
+        # bytearray keeps the returned array writable
+        return np.frombuffer(bytearray(data), dtype=dtype).reshape(shape)
+
+
+class PackedBackend(StorageBackend):
+
+    def __init__(self, packed_file):
+        """Storage backend over a packed scene, files map to columns"""
+        self.packed_ = PackedScene(packed_file)
+        self.order_ = {name: i for i, name in enumerate(self.packed_.object_names)}
+
+        self.object_columns_ = {v: k for k, v in OBJECT_COLUMNS.items()}
+        self.scene_columns_ = {v: k for k, v in SCENE_COLUMNS.items()}
+
+
+    def list_objects(self):
+        return self.packed_.object_names
+
+
+    def exists(self, obj_name, filename):
+        if obj_name is None:
+            return filename in self.scene_columns_ and self.packed_.has_scene(self.scene_columns_[filename])
+
+        if filename not in self.object_columns_:
+            return False
+
+        return self.packed_.has(self.object_columns_[filename], self.order_[obj_name])
+
+
+    def read_bytes(self, obj_name, filename):
+        if obj_name is not None or filename != RAW_SCENE_PLY:
+            raise Exception("Packed scene stores `{}` as an array, use load_npy()".format(filename))
+
+        return self.packed_.load_scene("raw_ply").tobytes()
+
+
+    @property
+    def can_mmap(self):
+        return not self.packed_.compressed_
+
+
+    def load_npy(self, obj_name, filename, mmap=False):
+        if obj_name is None:
+            if filename != BACKGROUND_NPY_FILE:
+                raise Exception("Packed scene has no array `{}`".format(filename))
+            return self.packed_.load_background(mmap)
+
+        if not self.exists(obj_name, filename):
+            raise Exception("Object `{}` has no file `{}`".format(obj_name, filename))
+
+        return self.packed_.load(self.object_columns_[filename], self.order_[obj_name], mmap)
+
+
+    def close(self):
+        self.packed_.close()
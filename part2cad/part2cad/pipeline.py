@@ -0,0 +1,239 @@
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from part2cad.tracing import span
+
+
+# end-of-stream marker passed between stages
+_EOS = object()
+
+
+class Stage(object):
+
+    def __init__(self, name, fn, mode="thread", n_workers=1, ordered=False, discard=None):
+        """A single stage of a StagedPipeline
+
+        Args:
+            name (str): name of the stage, used in error messages
+            fn (callable): fn(item) -> result, must be picklable in
+                process mode (module level function or functools.partial)
+            mode (str): "thread" for I/O bound stages, "process" for
+                compute bound stages
+            n_workers (int): number of worker threads / processes
+            ordered (bool): feed items to fn in source order, only
+                supported for single-worker thread stages
+            discard (callable): discard(item), called in this process on
+                the items the stage drops once the pipeline failed, or
+                loses with a failed worker process, to free what they hold
+        """
+        if mode not in ["thread", "process"]:
+            raise Exception("Does not support stage mode: `{}`".format(mode))
+
+        if ordered and (mode != "thread" or n_workers != 1):
+            raise Exception("Ordered stage `{}` must be a single thread".format(name))
+
+        self.name = name
+        self.fn = fn
+        self.mode = mode
+        self.n_workers = n_workers
+        self.ordered = ordered
+        self.discard = discard
+
+
+class StagedPipeline(object):
+
+    def __init__(self, stages, queue_size=2, executor=None):
+        """Run a sequence of stages concurrently over a stream of items
+
+        Consecutive stages are connected by bounded queues, so a slow
+        stage blocks its producers instead of buffering the whole stream.
+
+        Args:
+            stages (list of Stage): stages in execution order
+            queue_size (int): capacity of the queues between stages
+            executor (ProcessPoolExecutor): optional shared pool for
+                process stages, a private pool is created otherwise
+        """
+        self.stages_ = stages
+        self.queue_size_ = queue_size
+        self.executor_ = executor
+
+        self.error_ = None
+        self.lock_ = threading.Lock()
+
+
+    def run(self, items):
+        """Push items through all stages
+
+        Returns:
+            list: outputs of the last stage, in the order of items
+        """
+        self.error_ = None
+
+        queues = [queue.Queue(self.queue_size_) for _ in range(len(self.stages_) + 1)]
+        threads, executors = [], []
+
+        threads.append(threading.Thread(target=self.feed_, args=(items, queues[0])))
+
+        for i, stage in enumerate(self.stages_):
+            q_in, q_out = queues[i], queues[i + 1]
+
+            if stage.mode == "thread":
+                threads.extend(self.create_thread_workers_(stage, q_in, q_out))
+            else:
+                executor = self.executor_
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=stage.n_workers)
+                    executors.append(executor)
+                threads.extend(self.create_process_workers_(stage, executor, q_in, q_out))
+
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        results = []
+        while True:
+            item = queues[-1].get()
+            if item is _EOS:
+                break
+            results.append(item)
+
+        for t in threads:
+            t.join()
+
+        for executor in executors:
+            executor.shutdown()
+
+        if self.error_ is not None:
+            raise self.error_
+
+        results.sort(key=lambda x: x[0])
+
+        return [r for _, r in results]
+
+
+    def feed_(self, items, q_out):
+        for idx, item in enumerate(items):
+            if self.error_ is not None:
+                break
+            q_out.put( (idx, item) )
+
+        q_out.put(_EOS)
+
+
+    def discard_(self, stage, data):
+        if stage.discard is None:
+            return
+
+        try:
+            stage.discard(data)
+        except Exception as err:
+            print("[ERROR] Pipeline stage `{}` failed to discard an item: {}".format(stage.name, err))
+
+
+    def fail_(self, stage, err):
+        with self.lock_:
+            if self.error_ is None:
+                print("[ERROR] Pipeline stage `{}` failed: {}".format(stage.name, err))
+                self.error_ = err
+
+
+    def create_thread_workers_(self, stage, q_in, q_out):
+        n_alive = [stage.n_workers]
+
+        def worker():
+            pending = dict()
+            next_idx = 0
+
+            while True:
+                item = q_in.get()
+
+                if item is _EOS:
+                    # let sibling workers see the end of stream as well
+                    q_in.put(_EOS)
+                    break
+
+                if self.error_ is not None:
+                    # keep draining so that upstream stages never block
+                    self.discard_(stage, item[1])
+                    continue
+
+                if not stage.ordered:
+                    self.apply_(stage, item, q_out)
+                    continue
+
+                pending[item[0]] = item
+                while next_idx in pending:
+                    self.apply_(stage, pending.pop(next_idx), q_out)
+                    next_idx += 1
+
+            # items held back for an earlier one that never came
+            for _, data in pending.values():
+                self.discard_(stage, data)
+
+            with self.lock_:
+                n_alive[0] -= 1
+                is_last = n_alive[0] == 0
+
+            if is_last:
+                q_out.put(_EOS)
+
+        return [threading.Thread(target=worker) for _ in range(stage.n_workers)]
+
+
+    def create_process_workers_(self, stage, executor, q_in, q_out):
+        # futures in submission order, bounded to limit in-flight items
+        in_flight = queue.Queue(stage.n_workers)
+
+        def dispatcher():
+            while True:
+                item = q_in.get()
+
+                if item is _EOS:
+                    break
+
+                if self.error_ is not None:
+                    self.discard_(stage, item[1])
+                    continue
+
+                idx, data = item
+                in_flight.put( (idx, data, executor.submit(stage.fn, data)) )
+
+            in_flight.put(_EOS)
+
+        def collector():
+            while True:
+                item = in_flight.get()
+
+                if item is _EOS:
+                    break
+
+                idx, data, future = item
+                try:
+                    result = future.result()
+                except Exception as err:
+                    # a dead worker may not have consumed its input
+                    self.discard_(stage, data)
+                    self.fail_(stage, err)
+                    continue
+
+                # dropped by the next stage after a failure
+                q_out.put( (idx, result) )
+
+            q_out.put(_EOS)
+
+        return [threading.Thread(target=dispatcher), threading.Thread(target=collector)]
+
+
+    def apply_(self, stage, item, q_out):
+        idx, data = item
+
+        try:
+            with span(stage.name, item=idx):
+                result = stage.fn(data)
+        except Exception as err:
+            self.fail_(stage, err)
+            return
+
+        q_out.put( (idx, result) )
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+FLOAT_DTYPES = {
+    "float32": np.float32,
+    "float64": np.float64
+}
+
+# dtype of point clouds and batched geometry, see set_precision()
+_float_dtype = np.float64
+
+
+def set_precision(precision):
+    """Set the floating point precision used throughout part2cad
+
+    Point clouds are loaded, segmented and transformed in this precision.
+    Numerically sensitive steps (SVD, registration) always promote their
+    inputs to float64 regardless of this setting.
+
+    Args:
+        precision (str): "float32" or "float64"
+    """
+    global _float_dtype
+
+    if precision not in FLOAT_DTYPES:
+        raise Exception("Does not support precision: `{}`".format(precision))
+
+    _float_dtype = FLOAT_DTYPES[precision]
+
+
+def get_precision():
+    return np.dtype(_float_dtype).name
+
+
+def get_float_dtype():
+    return _float_dtype
+
+
+def as_float(arr):
+    """Cast an array to the configured precision, without copying if it
+    already has that dtype"""
+    return np.asarray(arr).astype(_float_dtype, copy=False)
+
+
+def as_float64(arr):
+    """Promote an array for numerically sensitive computation"""
+    return np.asarray(arr, dtype=np.float64)
@@ -0,0 +1,81 @@
+import os
+import json
+
+from part2cad.constants import ASSET_DIR, SCENE_GRAPH_FILE, SCENE_GRAPH_NPZ_FILE
+from part2cad.graph_io import load_graph, save_graph_npz
+
+
+#############################################
+# Scene delta, returned by CadScene.update_object() / remove_object()
+#
+#   object_idx      index of the changed object in the scene
+#   removed_nodes   [id]                     nodes to drop
+#   removed_edges   [{src_id, dst_id}]       edges to drop
+#   added_nodes     [node]                   nodes as in KinoGraph.dump()
+#   added_edges     [{src_id, dst_id}]       edges to add
+#   removed_files   [name]                   asset files to delete
+#   added_files     [name]                   asset files to (re)write
+#
+# Nodes of other objects keep their ids, a changed object gets new ids.
+#############################################
+def empty_delta(object_idx):
+    return {
+        "object_idx": object_idx,
+        "removed_nodes": [],
+        "removed_edges": [],
+        "added_nodes": [],
+        "added_edges": [],
+        "removed_files": [],
+        "added_files": []
+    }
+
+
+def apply_graph_delta(gjson, delta):
+    """Patch a dumped scene graph in place
+
+    Args:
+        gjson (dict): graph with "root_id", "edges" and "nodes"
+        delta (dict): scene delta
+
+    Returns:
+        dict: the patched graph
+    """
+    removed_nodes = set(delta["removed_nodes"])
+    removed_edges = set([(e["src_id"], e["dst_id"]) for e in delta["removed_edges"]])
+
+    gjson["nodes"] = [n for n in gjson["nodes"] if n["id"] not in removed_nodes] + delta["added_nodes"]
+    gjson["edges"] = [e for e in gjson["edges"] if (e["src_id"], e["dst_id"]) not in removed_edges] \
+        + delta["added_edges"]
+
+    return gjson
+
+
+def apply_scene_delta(output_dir, delta):
+    """Patch an exported scene: the graph files found in `output_dir` and
+    the removed asset files
+
+    Added asset files are not written here, they come with the new object
+    graph, see CadScene.save_delta().
+
+    Args:
+        output_dir (str): scene directory written by KinoGraph.save()
+        delta (dict): scene delta
+    """
+    json_file = "{}/{}".format(output_dir, SCENE_GRAPH_FILE)
+    npz_file = "{}/{}".format(output_dir, SCENE_GRAPH_NPZ_FILE)
+
+    if not os.path.isfile(json_file) and not os.path.isfile(npz_file):
+        raise Exception("No scene graph in `{}`".format(output_dir))
+
+    if os.path.isfile(json_file):
+        gjson = apply_graph_delta(load_graph(json_file), delta)
+        with open(json_file, "w") as fout:
+            fout.write(json.dumps(gjson, indent=4))
+
+    if os.path.isfile(npz_file):
+        save_graph_npz(apply_graph_delta(load_graph(npz_file), delta), npz_file)
+
+    for name in delta["removed_files"]:
+        asset_file = "{}/{}/{}".format(output_dir, ASSET_DIR, name)
+        if os.path.isfile(asset_file):
+            os.remove(asset_file)
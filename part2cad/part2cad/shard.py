@@ -0,0 +1,197 @@
+import os
+import json
+import hashlib
+
+from part2cad.batch import BatchRunner, estimate_scene_cost, read_checkpoint
+
+
+MANIFEST_VERSION = 1
+
+SHARD_REPORT_FILE = "shard_{}_of_{}.json"
+SHARD_CHECKPOINT_FILE = "shard_{}_of_{}.jsonl"
+
+
+def build_manifest(scenes, cost_fn=estimate_scene_cost):
+    """List scenes with their estimated cost
+
+    Scene paths are kept as given, every node must resolve them the same
+    way, e.g. relative to a shared dataset mount.
+
+    Args:
+        scenes (list of str): scene paths
+        cost_fn (callable): cost_fn(scene path), see estimate_scene_cost()
+
+    Returns:
+        dict: "version", "id" and "scenes", [{"scene", "cost"}]
+    """
+    entries = [{"scene": s, "cost": cost_fn(s)} for s in dict.fromkeys(scenes)]
+
+    return {"version": MANIFEST_VERSION, "id": manifest_id(entries), "scenes": entries}
+
+
+def manifest_id(entries):
+    return hashlib.sha1(json.dumps(entries, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_manifest(manifest_file):
+    with open(manifest_file, "r") as fin:
+        manifest = json.load(fin)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise Exception("Does not support manifest version: `{}`".format(manifest.get("version")))
+
+    if manifest["id"] != manifest_id(manifest["scenes"]):
+        raise Exception("Manifest `{}` was modified after it was built".format(manifest_file))
+
+    return manifest
+
+
+def save_json_(data, file):
+    tmp_file = file + ".tmp"
+    with open(tmp_file, "w") as fout:
+        json.dump(data, fout, indent=4)
+    os.replace(tmp_file, file)
+
+
+def partition_manifest(manifest, n_shards):
+    """Split the scenes into shards of balanced cost
+
+    Greedy longest-processing-time: scenes by decreasing cost, each to the
+    least loaded shard. Ties are broken by scene path and shard index, so
+    every node computes the same partition.
+
+    Returns:
+        list of list of dict: manifest entries of each shard
+    """
+    if n_shards < 1:
+        raise Exception("Invalid number of shards: `{}`".format(n_shards))
+
+    shards = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+
+    for entry in sorted(manifest["scenes"], key=lambda e: (-e["cost"], e["scene"])):
+        i = min(range(n_shards), key=lambda k: (loads[k], k))
+        shards[i].append(entry)
+        loads[i] += entry["cost"]
+
+    return shards
+
+
+def run_shard(manifest, shard_idx, n_shards, convert_fn, output_dir, n_workers=None):
+    """Convert the scenes of one shard and write its report
+
+    The shard checkpoint lives in `output_dir`, rerunning the same shard
+    resumes it.
+
+    Returns:
+        dict: the shard report, see merge_shard_reports()
+    """
+    if not 0 <= shard_idx < n_shards:
+        raise Exception("Invalid shard `{}` of `{}`".format(shard_idx, n_shards))
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    entries = partition_manifest(manifest, n_shards)[shard_idx]
+    checkpoint_file = os.path.join(output_dir, SHARD_CHECKPOINT_FILE.format(shard_idx, n_shards))
+
+    print("[INFO] Shard {} of {}: {} scenes".format(shard_idx, n_shards, len(entries)))
+
+    # ordered by the costs of the manifest, scenes are not scanned again;
+    # the runner makes scene paths absolute
+    costs = {os.path.abspath(e["scene"]): e["cost"] for e in entries}
+
+    runner = BatchRunner(convert_fn, checkpoint_file, n_workers, cost_fn=lambda s: costs.get(s, 0))
+    runner.run([e["scene"] for e in entries])
+
+    records = read_checkpoint(checkpoint_file)
+
+    scenes = []
+    for e in entries:
+        record = records.get(os.path.abspath(e["scene"]), {"ok": False, "error": "Not converted", "elapsed": 0.0})
+        scenes.append({
+            "scene": e["scene"],
+            "cost": e["cost"],
+            "ok": record["ok"],
+            "error": record["error"],
+            "elapsed": record["elapsed"]
+        })
+
+    report = {
+        "manifest_id": manifest["id"],
+        "shard": shard_idx,
+        "n_shards": n_shards,
+        "cost": sum([e["cost"] for e in entries]),
+        "elapsed": sum([s["elapsed"] for s in scenes]),
+        "scenes": scenes
+    }
+
+    save_json_(report, os.path.join(output_dir, SHARD_REPORT_FILE.format(shard_idx, n_shards)))
+
+    return report
+
+
+def merge_shard_reports(manifest, reports):
+    """Check that shard reports cover the manifest and combine them
+
+    Args:
+        manifest (dict): see build_manifest()
+        reports (list of dict): reports written by run_shard()
+
+    Returns:
+        dict: "complete", the manifest id and shard count, the "failed"
+            and "missing" scenes with the problems found, and a summary of
+            every shard
+    """
+    problems = []
+
+    n_shards = reports[0]["n_shards"] if len(reports) > 0 else 0
+    if n_shards == 0:
+        problems.append("No shard report")
+
+    for r in reports:
+        if r["manifest_id"] != manifest["id"]:
+            problems.append("Shard {} was run on manifest `{}`".format(r["shard"], r["manifest_id"]))
+        if r["n_shards"] != n_shards:
+            problems.append("Shard {} was run with {} shards, not {}".format(r["shard"], r["n_shards"], n_shards))
+
+    by_shard = dict()
+    for r in reports:
+        if r["shard"] in by_shard:
+            problems.append("Shard {} reported twice".format(r["shard"]))
+        by_shard[r["shard"]] = r
+
+    missing, failed, converted = [], [], set()
+
+    partition = partition_manifest(manifest, n_shards) if n_shards > 0 else []
+    for shard_idx, entries in enumerate(partition):
+        if shard_idx not in by_shard:
+            problems.append("Shard {} has no report".format(shard_idx))
+            missing.extend([e["scene"] for e in entries])
+            continue
+
+        records = {s["scene"]: s for s in by_shard[shard_idx]["scenes"]}
+        for e in entries:
+            record = records.pop(e["scene"], None)
+            if record is None:
+                missing.append(e["scene"])
+            elif record["ok"]:
+                converted.add(e["scene"])
+            else:
+                failed.append({"scene": e["scene"], "error": record["error"]})
+
+        for scene in records.keys():
+            problems.append("Shard {} converted `{}`, assigned to another shard".format(shard_idx, scene))
+
+    return {
+        "complete": len(problems) == 0 and len(missing) == 0 and len(failed) == 0,
+        "manifest_id": manifest["id"],
+        "n_shards": n_shards,
+        "n_scenes": len(manifest["scenes"]),
+        "n_converted": len(converted),
+        "failed": failed,
+        "missing": missing,
+        "problems": problems,
+        "shards": [
+            {k: r[k] for k in ["shard", "cost", "elapsed"]} for _, r in sorted(by_shard.items())
+        ]
+    }
@@ -0,0 +1,194 @@
+import numpy as np
+import trimesh
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    # python < 3.8, arrays are pickled instead
+    shared_memory, resource_tracker = None, None
+
+
+# smaller payloads are pickled, a shared block costs a few system calls
+SHM_MIN_BYTES = 1 << 16
+
+# start of each array in a block
+SHM_ALIGNMENT = 64
+
+# blocks are created and freed by different processes, they must report
+# to the same tracker: start it before any worker pool is forked
+if resource_tracker is not None:
+    resource_tracker.ensure_running()
+
+
+class SharedArrays(object):
+
+    def __init__(self, name, specs):
+        """Handle of arrays packed in a shared memory block, cheap to pickle
+
+        Args:
+            name (str): name of the shared memory block
+            specs (list of tuple): (offset, shape, dtype str) of each array
+        """
+        self.name = name
+        self.specs = specs
+
+
+def share_arrays(arrays):
+    """Copy arrays into a new shared memory block
+
+    The block belongs to the receiver, which frees it in receive_arrays().
+    Small payloads, and every payload without shared memory support, are
+    passed as they are.
+
+    Args:
+        arrays (list of np.ndarray): arrays to send
+
+    Returns:
+        SharedArrays or list of np.ndarray: what to send to the other process
+    """
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+
+    specs, size = [], 0
+    for a in arrays:
+        specs.append( (size, a.shape, a.dtype.str) )
+        size += (a.nbytes + SHM_ALIGNMENT - 1) // SHM_ALIGNMENT * SHM_ALIGNMENT
+
+    if size < SHM_MIN_BYTES or shared_memory is None:
+        return arrays
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    for a, (offset, shape, dtype) in zip(arrays, specs):
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = a
+
+    handle = SharedArrays(shm.name, specs)
+    shm.close()
+
+    return handle
+
+
+def receive_arrays(handle):
+    """Copy arrays out of a block written by share_arrays() and free it
+
+    Args:
+        handle (SharedArrays or list of np.ndarray): what share_arrays()
+            returned
+
+    Returns:
+        list of np.ndarray: the arrays, owning their memory
+    """
+    if not isinstance(handle, SharedArrays):
+        return handle
+
+    shm = shared_memory.SharedMemory(name=handle.name)
+    try:
+        arrays = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+            for offset, shape, dtype in handle.specs
+        ]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return arrays
+
+
+def release_arrays(handle):
+    """Free a block written by share_arrays() that will not be received,
+    e.g. dropped by a failed pipeline; a block already freed is ignored"""
+    if not isinstance(handle, SharedArrays):
+        return
+
+    try:
+        shm = shared_memory.SharedMemory(name=handle.name)
+    except FileNotFoundError:
+        return
+
+    shm.close()
+    shm.unlink()
+
+
+def share_array(array):
+    return share_arrays([array])
+
+
+def receive_array(handle):
+    return receive_arrays(handle)[0]
+
+
+def mesh_arrays_(mesh):
+    """Buffers of a mesh and how to rebuild it"""
+    if isinstance(mesh, trimesh.PointCloud):
+        arrays = [mesh.vertices]
+        if len(mesh.colors) > 0:
+            arrays.append(mesh.colors)
+        return "points", arrays
+
+    arrays = [mesh.vertices, mesh.faces]
+    if mesh.visual.kind == "vertex":
+        return "vertex_colors", arrays + [mesh.visual.vertex_colors]
+    if mesh.visual.kind == "face":
+        return "face_colors", arrays + [mesh.visual.face_colors]
+
+    return "mesh", arrays
+
+
+def build_mesh_(kind, arrays):
+    if kind == "points":
+        return trimesh.PointCloud(arrays[0], colors=arrays[1] if len(arrays) > 1 else None)
+
+    # keep the buffers as fitted, no vertex merging
+    mesh = trimesh.Trimesh(vertices=arrays[0], faces=arrays[1], process=False)
+    if kind == "vertex_colors":
+        mesh.visual.vertex_colors = arrays[2]
+    elif kind == "face_colors":
+        mesh.visual.face_colors = arrays[2]
+
+    return mesh
+
+
+def share_graph_meshes(pg):
+    """Move the meshes of a part graph into one shared memory block
+
+    The meshes are dropped from the graph and replaced by the layout of
+    the block, so pickling the result no longer copies mesh buffers.
+
+    Args:
+        pg (PartGraph): graph sent to another process, its meshes are
+            released
+
+    Returns:
+        tuple: (pg, layout, shared arrays), see receive_graph_meshes()
+    """
+    arrays, layout = [], dict()
+
+    for idx, mesh in pg.node_meshes.items():
+        if mesh is None:
+            continue
+
+        kind, mesh_arrays = mesh_arrays_(mesh)
+        layout[idx] = (kind, len(arrays), len(mesh_arrays))
+        arrays.extend(mesh_arrays)
+
+    pg.release_meshes()
+
+    return pg, layout, share_arrays(arrays)
+
+
+def release_graph_meshes(shared):
+    """Free the block of a graph that will not be received"""
+    release_arrays(shared[2])
+
+
+def receive_graph_meshes(shared):
+    """Rebuild a part graph sent by share_graph_meshes()
+
+    Returns:
+        PartGraph: the graph with its meshes
+    """
+    pg, layout, handle = shared
+    arrays = receive_arrays(handle)
+
+    for idx, (kind, start, count) in layout.items():
+        pg.set_node_mesh(idx, build_mesh_(kind, arrays[start:start + count]))
+
+    return pg
@@ -0,0 +1,187 @@
+import os
+import glob
+import json
+import time
+import threading
+import contextlib
+
+# scene_builder logs with its own print_info()
+print_info = print
+
+
+#############################################
+# Stage tracing, exported as a Chrome trace (chrome://tracing, Perfetto).
+# scene_builder/scripts/tracing.py is a copy for the scene builder, which
+# cannot import part2cad; keep the shared part below in sync with it.
+#
+#   with span("fit_candidate", primitive=name):
+#       ...
+#
+#   @span("parse_seg_object_pointclouds")
+#   def parse_seg_object_pointclouds(...):
+#
+# Spans are complete events ("ph": "X") timed on the monotonic clock,
+# which all processes share, so nested spans of every thread and worker
+# line up in one file. Spans are free while no trace is started.
+#
+# The process calling start_trace() keeps its events in memory. Other
+# processes (forked workers, or a worker told by set_trace_file()) append
+# theirs to <trace file>.<pid>.part whenever a top-level span ends, and
+# finish_trace() merges the parts.
+#############################################
+
+
+# ---- shared part: identical in part2cad/part2cad/tracing.py and
+# ---- scene_builder/scripts/tracing.py, see tests/check_tracing_copy.py
+TRACE_PART_EXT = ".part"
+
+# trace being recorded, see start_trace() / set_trace_file()
+_trace_file = None
+_owner_pid = None
+
+_events = []
+_thread_names = set()
+_lock = threading.Lock()
+_local = threading.local()
+
+# get_native_id() needs python 3.8
+get_thread_id_ = getattr(threading, "get_native_id", threading.get_ident)
+
+
+def reset_after_fork_():
+    # a forked worker starts empty, the parent still owns its events
+    global _events, _lock
+
+    _events = []
+    _thread_names.clear()
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_after_fork_)
+
+
+def start_trace(trace_file):
+    """Record spans of this process, and of the workers it passes the
+    trace file to, until finish_trace()
+
+    Args:
+        trace_file (str): output Chrome trace JSON file
+    """
+    global _trace_file, _owner_pid, _events
+
+    _trace_file = os.path.abspath(trace_file)
+    _owner_pid = os.getpid()
+    _events = []
+    _thread_names.clear()
+
+    # parts of an interrupted trace
+    for part_file in glob.glob("{}.*{}".format(_trace_file, TRACE_PART_EXT)):
+        os.remove(part_file)
+
+
+def set_trace_file(trace_file):
+    """Record spans into the trace of another process, None to stop
+
+    For worker processes, e.g. pool workers started before the trace.
+    """
+    global _trace_file
+
+    _trace_file = os.path.abspath(trace_file) if trace_file is not None else None
+
+
+def get_trace_file():
+    return _trace_file
+
+
+def finish_trace():
+    """Write the trace started by start_trace(), then stop recording
+
+    Returns:
+        str: the trace file, None if no trace was started here
+    """
+    global _trace_file, _owner_pid, _events
+
+    if _trace_file is None or _owner_pid != os.getpid():
+        return None
+
+    trace_file = _trace_file
+    events = list(_events)
+
+    for part_file in sorted(glob.glob("{}.*{}".format(trace_file, TRACE_PART_EXT))):
+        with open(part_file, "r") as fin:
+            events.extend([json.loads(line) for line in fin if len(line.strip()) > 0])
+        os.remove(part_file)
+
+    _trace_file, _owner_pid, _events = None, None, []
+    _thread_names.clear()
+
+    with open(trace_file, "w") as fout:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fout)
+
+    print_info("[INFO] Trace of {} events saved at `{}`".format(len(events), trace_file))
+
+    return trace_file
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    """Time a block, or a function when used as a decorator
+
+    Args:
+        name (str): span name
+        args: JSON values shown with the span
+    """
+    if _trace_file is None:
+        yield
+        return
+
+    _local.depth = getattr(_local, "depth", 0) + 1
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        _local.depth -= 1
+
+        record_({
+            "name": name,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": get_thread_id_(),
+            "args": args
+        })
+
+        if _local.depth == 0 and _owner_pid != os.getpid():
+            flush_()
+
+
+def record_(event):
+    key = (event["pid"], event["tid"])
+
+    with _lock:
+        if key not in _thread_names:
+            _thread_names.add(key)
+            _events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": key[0],
+                "tid": key[1],
+                "args": {"name": threading.current_thread().name}
+            })
+
+        _events.append(event)
+
+
+def flush_():
+    global _events
+
+    with _lock:
+        events, _events = _events, []
+
+        if _trace_file is None or len(events) == 0:
+            return
+
+        with open("{}.{}{}".format(_trace_file, os.getpid(), TRACE_PART_EXT), "a") as fout:
+            fout.write("".join([json.dumps(e) + "\n" for e in events]))
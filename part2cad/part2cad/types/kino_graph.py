@@ -1,12 +1,20 @@
+import os
 import json
 import copy
 
 import trimesh
+import numpy as np
 import networkx as nx
+from transforms3d.affines import compose
+from transforms3d.quaternions import mat2quat, quat2mat
 
 from part2cad.constants import ASSET_DIR
-from part2cad.constants import SCENE_GRAPH_FILE
-from part2cad.utils import mkdir
+from part2cad.constants import SCENE_GRAPH_FILE, SCENE_GRAPH_NPZ_FILE
+from part2cad.constants import OBJECT_MESH_BUNDLE, SCENE_MESH_BUNDLE
+from part2cad.utils import mkdir, export_mesh_to_ply
+from part2cad.mesh_bundle import save_mesh_bundle, mesh_content_hash
+from part2cad.graph_io import save_graph_npz, write_graph_json_stream
+from part2cad.tracing import span
 
 
 class PartGraph(object):
@@ -58,6 +66,28 @@ class PartGraph(object):
         return list(self.nxg_.successors(idx))
 
 
+    def node_info(self, node_idx):
+        return self.nodes_[node_idx]
+
+
+    def transform(self, tf):
+        """Move the whole object by a rigid transform
+
+        Only the root pose is global, the other nodes are relative to their
+        parent and follow.
+
+        Args:
+            tf (4x4 matrix): rigid transform in the scene frame
+        """
+        info = self.nodes_[self.root_idx]
+
+        root_tf = compose(info["position"], quat2mat(info["orientation"]), np.ones(3))
+        root_tf = np.dot(tf, root_tf)
+
+        info["orientation"] = mat2quat(root_tf[:3, :3]).tolist()
+        info["position"] = root_tf[:3, 3].tolist()
+
+
     def set_node_info(self, node_idx, mesh, attributes):
         if node_idx not in self.nodes_:
             raise Exception("Node ID: `{}` does not exist".format(node_idx))
@@ -90,17 +120,103 @@ class PartGraph(object):
             v["cad_id"] = k
 
 
-    def save_mesh(self, output_dir):
+    @span("PartGraph.save_mesh")
+    def save_mesh(self, output_dir, bundle=False, dedup=False):
+        """Save part meshes as <cad_id>.stl and point clouds as <id>.ply
+
+        Args:
+            output_dir (str): asset directory
+            bundle (bool): save the part meshes into a single bundle file
+                OBJECT_MESH_BUNDLE instead of one .stl per node
+            dedup (bool): name meshes by the hash of their geometry, see
+                assign_content_ids(), so equal parts share one file
+        """
         mkdir(output_dir)
 
-        for id, m in self.node_meshes_.items():
-            if m is None:
+        for id, m in self.point_clouds().items():
+            export_mesh_to_ply(m, "{}/{}.ply".format(output_dir, id))
+
+        if dedup:
+            self.assign_content_ids()
+
+        meshes = self.cad_meshes()
+
+        if bundle:
+            if len(meshes) > 0:
+                save_mesh_bundle(meshes, "{}/{}".format(output_dir, OBJECT_MESH_BUNDLE.format(self.root_idx)))
+            return
+
+        for cad_id, m in meshes.items():
+            mesh_file = "{}/{}.stl".format(output_dir, cad_id)
+
+            # content-addressed, an existing file holds the same geometry
+            if dedup and os.path.isfile(mesh_file):
                 continue
-            
-            if isinstance(m, trimesh.PointCloud):
-                m.export("{}/{}.ply".format(output_dir, id))
-            else:
-                m.export("{}/{}.stl".format(output_dir, id))
+
+            m.export(mesh_file)
+
+
+    def mesh_files(self, bundle=False):
+        """Names of the asset files written by save_mesh()
+
+        Args:
+            bundle (bool): see save_mesh()
+
+        Returns:
+            list of str: file names relative to the asset directory
+        """
+        files = ["{}.ply".format(id) for id in self.point_clouds().keys()]
+        meshes = self.cad_meshes()
+
+        if bundle:
+            if len(meshes) > 0:
+                files.append(OBJECT_MESH_BUNDLE.format(self.root_idx))
+        else:
+            files.extend(["{}.stl".format(cad_id) for cad_id in meshes.keys()])
+
+        return files
+
+
+    def assign_content_ids(self):
+        """Set the cad_id of every mesh node to the hash of its geometry
+
+        Pose and scale stay on the nodes, so parts of equal geometry,
+        e.g. the legs of a table, reference the same mesh.
+        """
+        for id, m in self.triangle_meshes().items():
+            self.nodes_[id]["cad_id"] = mesh_content_hash(m)
+
+
+    @property
+    def node_meshes(self):
+        return self.node_meshes_
+
+
+    def set_node_mesh(self, node_idx, mesh):
+        if node_idx not in self.nodes_:
+            raise Exception("Node ID: `{}` does not exist".format(node_idx))
+
+        self.node_meshes_[node_idx] = mesh
+
+
+    def release_meshes(self):
+        """Drop the meshes once saved, node attributes are kept"""
+        self.node_meshes_ = {k: None for k in self.node_meshes_.keys()}
+
+
+    def point_clouds(self):
+        return {k: m for k, m in self.node_meshes_.items() if isinstance(m, trimesh.PointCloud)}
+
+
+    def cad_meshes(self):
+        """Triangle meshes keyed by cad_id, meshes of equal cad_id share
+        one entry"""
+        return {self.nodes_[id]["cad_id"]: m for id, m in self.triangle_meshes().items()}
+
+
+    def triangle_meshes(self):
+        return {k: m for k, m in self.node_meshes_.items()
+            if m is not None and not isinstance(m, trimesh.PointCloud)}
 
 
     def dump(self):
@@ -118,14 +234,16 @@ class PartGraph(object):
                 }
             )
 
-        for node_idx, meta in self.nodes_.items():
-            gjson["nodes"].append(
-                {k: v for k, v in meta.items()}
-            )
+        gjson["nodes"].extend(self.iter_nodes())
 
         return gjson
 
 
+    def iter_nodes(self):
+        for node_idx, meta in self.nodes_.items():
+            yield {k: v for k, v in meta.items()}
+
+
 class KinoGraph(object):
 
     def __init__(self, root_idx, object_pgs, edges):
@@ -135,38 +253,119 @@ class KinoGraph(object):
         self.obj_graphs_ = object_pgs
 
 
-    def dump(self):
-        gjson = {
-            "edges": [],
-            "nodes": [],
-            "root_id": self.root_idx_
-        }
-
-        # nodes and edges of each objects
+    def iter_edges(self):
+        # edges of each objects
         for og in self.obj_graphs_:
-            data = og.dump()
-            gjson["edges"].extend(data["edges"])
-            gjson["nodes"].extend(data["nodes"])
+            for e in og.edges:
+                yield {"dst_id": e[1], "src_id": e[0]}
 
         # contextual relations
         for e in self.edges_:
-            gjson["edges"].append(
-                {
-                    "dst_id": e[1],
-                    "src_id": e[0]
-                }
-            )
+            yield {"dst_id": e[1], "src_id": e[0]}
+
+
+    def iter_nodes(self):
+        for og in self.obj_graphs_:
+            for node in og.iter_nodes():
+                yield node
+
+
+    def assign_content_ids(self):
+        """Name the part meshes of every object by their geometry, see
+        PartGraph.assign_content_ids()
+        """
+        for og in self.obj_graphs_:
+            og.assign_content_ids()
+
+
+    def meshes(self):
+        """Meshes of all objects keyed by the asset name save() gives them
+
+        Returns:
+            dict: cad_id of the triangle meshes and id of the point clouds
+                (str) -> trimesh.Trimesh or trimesh.PointCloud
+        """
+        meshes = dict()
+        for og in self.obj_graphs_:
+            meshes.update({str(id): m for id, m in og.point_clouds().items()})
+            meshes.update({str(cad_id): m for cad_id, m in og.cad_meshes().items()})
+
+        return meshes
+
+
+    def dump(self):
+        gjson = {
+            "edges": list(self.iter_edges()),
+            "nodes": list(self.iter_nodes()),
+            "root_id": self.root_idx_
+        }
 
         return gjson
 
 
-    def save(self, output_dir):
+    def save_graph(self, output_dir, graph_format="json"):
+        """Save the scene graph only
+
+        Args:
+            output_dir (str): output scene directory
+            graph_format (str): "json" (indented SCENE_GRAPH_FILE),
+                "json-stream" (compact SCENE_GRAPH_FILE written node by
+                node) or "npz" (binary SCENE_GRAPH_NPZ_FILE)
+        """
         mkdir(output_dir)
-        
-        gjson = self.dump()
-        with open("{}/{}".format(output_dir, SCENE_GRAPH_FILE), "w") as fout:
-            fout.write(json.dumps(gjson, indent=4))
+
+        if graph_format == "json":
+            with open("{}/{}".format(output_dir, SCENE_GRAPH_FILE), "w") as fout:
+                fout.write(json.dumps(self.dump(), indent=4))
+        elif graph_format == "json-stream":
+            with open("{}/{}".format(output_dir, SCENE_GRAPH_FILE), "w") as fout:
+                write_graph_json_stream(fout, self.root_idx_, self.iter_edges(), self.iter_nodes())
+        elif graph_format == "npz":
+            save_graph_npz(self.dump(), "{}/{}".format(output_dir, SCENE_GRAPH_NPZ_FILE))
+        else:
+            raise Exception("Does not support graph format: `{}`".format(graph_format))
+
+
+    @span("KinoGraph.save")
+    def save(self, output_dir, save_mesh=True, bundle=None, graph_format="json", dedup=False):
+        """Save the scene graph and the part meshes
+
+        Args:
+            output_dir (str): output scene directory
+            save_mesh (bool): export the meshes of every object graph,
+                disable it when meshes were already written elsewhere
+            bundle (str): None for one .stl per part, "object" for one
+                bundle per object, "scene" for a single SCENE_MESH_BUNDLE
+            graph_format (str): see save_graph()
+            dedup (bool): save each distinct part geometry once, see
+                PartGraph.assign_content_ids()
+        """
+        if bundle not in [None, "object", "scene"]:
+            raise Exception("Does not support mesh bundle mode: `{}`".format(bundle))
+
+        # cad ids must be final before the graph is written
+        if dedup:
+            self.assign_content_ids()
+
+        self.save_graph(output_dir, graph_format)
+
+        if not save_mesh:
+            return
         
         asset_dir = "{}/{}".format(output_dir, ASSET_DIR)
+
+        if bundle != "scene":
+            for og in self.obj_graphs_:
+                og.save_mesh(asset_dir, bundle=bundle == "object", dedup=dedup)
+            return
+
+        mkdir(asset_dir)
+
+        meshes = dict()
         for og in self.obj_graphs_:
-            og.save_mesh(asset_dir)
\ No newline at end of file
+            for id, m in og.point_clouds().items():
+                export_mesh_to_ply(m, "{}/{}.ply".format(asset_dir, id))
+            meshes.update(og.cad_meshes())
+
+        if len(meshes) > 0:
+            save_mesh_bundle(meshes, "{}/{}".format(asset_dir, SCENE_MESH_BUNDLE))
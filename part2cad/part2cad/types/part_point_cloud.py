@@ -1,20 +1,28 @@
-from sklearn.cluster import DBSCAN
 import trimesh
 import numpy as np
 
+from part2cad.precision import as_float64
+from part2cad.constants import DBSCAN_EPS
+from part2cad.tracing import span
 
-def get_instance_mask(points):
-    clusters = DBSCAN(eps=0.1, min_samples=3).fit_predict(points)
+
+def get_instance_mask(points, eps=DBSCAN_EPS):
+    from sklearn.cluster import DBSCAN
+
+    clusters = DBSCAN(eps=eps, min_samples=3).fit_predict(points)
     return clusters
 
     
-def parse_seg_object_pointclouds(data):
+@span("parse_seg_object_pointclouds")
+def parse_seg_object_pointclouds(data, dbscan_eps=DBSCAN_EPS):
     """Parse point npy cloud data to PartPointCloud object
 
     Args:
         data (np.ndarray (n_points, n_attr)):  segmented object parts where
             each row represents a 3D point with labels
                 x, y, z, nx, ny, nz, obj_id, part_id_old, our_part_id
+        dbscan_eps (float): radius splitting the points of a part label
+            into instances
 
     Returns:
         list of PartPointCloud: a list of PartPointCloud
@@ -29,7 +37,7 @@ def parse_seg_object_pointclouds(data):
     for pid in unique_part_ids:
         part_points = points[part_labels == pid]
         # segment each instances of the part (e.g., a table has four legs)
-        ins_mask = get_instance_mask(part_points)
+        ins_mask = get_instance_mask(part_points, dbscan_eps)
         unique_ins_label = np.unique(ins_mask)
         for uid in unique_ins_label:
             part_pcs.append(
@@ -66,7 +74,8 @@ class PartPointCloud(object):
 
     def get_obb_extents(self):
         try:
-            to_origin_tf, extents = trimesh.bounds.oriented_bounds(self.points)
+            # hull computation is done in double precision
+            to_origin_tf, extents = trimesh.bounds.oriented_bounds(as_float64(self.points))
         except:
             print("PointCloud::get_obb_extents(): Failed to find obb extents")
             extents = None
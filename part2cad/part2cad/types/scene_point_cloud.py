@@ -3,6 +3,7 @@ import trimesh
 import random
 
 from part2cad.visualization import create_palette
+from part2cad.utils import export_mesh_to_ply
 
 
 class ScenePointCloud(object):
@@ -31,9 +32,13 @@ class ScenePointCloud(object):
         scene.show()
 
 
-    def save(self, output_dir, viz_part=True):
+    def save(self, output_dir, viz_part=True, encoding="binary"):
         scene = self.colored_parts() if viz_part else self.colored_objects()
-        scene.export(output_dir)
+
+        if output_dir.endswith(".ply"):
+            export_mesh_to_ply(scene, output_dir, encoding)
+        else:
+            scene.export(output_dir)
 
 
     def get_object_pcds(self):
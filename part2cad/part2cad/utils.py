@@ -2,11 +2,11 @@ import os
 import json
 
 import numpy as np
-import open3d as o3d
 import trimesh
 
 from part2cad.constants import RAW_OBJECT_FILENAME, GT_OBJECT_FILENAME
 from part2cad.constants import SEG_INPUT_FILENAME, COMPLETE_OBJECT_FILENAME
+from part2cad.precision import get_float_dtype
 
 
 def mkdir(target):
@@ -17,8 +17,12 @@ def mkdir(target):
 
 
 def transform_points(points, tf):
-    pts_mat = np.ones((points.shape[0], 4), dtype="float")
-    pts_mat = np.dot(tf, pts_mat.T).T
+    # keep the precision of floating input points, integer points are
+    # promoted so the transform is not truncated
+    dtype = np.result_type(points.dtype, np.float32)
+    pts_mat = np.ones((points.shape[0], 4), dtype=dtype)
+    pts_mat[:, :3] = points
+    pts_mat = np.dot(np.asarray(tf, dtype=dtype), pts_mat.T).T
 
     return pts_mat[:, :3]
 
@@ -47,13 +51,88 @@ def transform_all_files(object_root, tf):
     np.save(COMPLETE_OBJECT_FILENAME, data)
 
 
-def export_trimesh_to_ply(mesh, output_dir):
-    res = trimesh.exchange.ply.export_ply(mesh, encoding='ascii', vertex_normal=True)
+# numpy dtype -> ply property type
+PLY_TYPES = {
+    "f4": "float",
+    "f8": "double",
+    "u1": "uchar",
+    "i4": "int"
+}
+
+
+def write_ply(output_dir, vertices, faces=None, normals=None, colors=None, encoding="binary"):
+    """Write a PLY file straight from numpy arrays
+
+    Vertex properties are packed into one structured array, so the binary
+    body is written with a single tobytes() call.
+
+    Args:
+        output_dir (str): output PLY file
+        vertices ((n, 3) np.ndarray): vertex positions, written in the
+            configured precision
+        faces ((m, 3) np.ndarray): optional triangles
+        normals ((n, 3) np.ndarray): optional vertex normals
+        colors ((n, 3 or 4) np.ndarray): optional uint8 vertex colors
+        encoding (str): "binary" (little endian) or "ascii"
+    """
+    if encoding not in ["binary", "ascii"]:
+        raise Exception("Does not support PLY encoding: `{}`".format(encoding))
+
+    float_dtype = np.dtype(get_float_dtype()).newbyteorder("<")
+
+    fields = [("x", float_dtype), ("y", float_dtype), ("z", float_dtype)]
+    columns = [vertices[:, 0], vertices[:, 1], vertices[:, 2]]
+
+    if normals is not None:
+        fields += [("nx", float_dtype), ("ny", float_dtype), ("nz", float_dtype)]
+        columns += [normals[:, 0], normals[:, 1], normals[:, 2]]
+
+    if colors is not None:
+        names = ["red", "green", "blue", "alpha"][:colors.shape[1]]
+        fields += [(name, "u1") for name in names]
+        columns += [colors[:, i] for i in range(len(names))]
+
+    vert = np.empty(len(vertices), dtype=fields)
+    for (name, _), col in zip(fields, columns):
+        vert[name] = col
+
+    header = ["ply"]
+    header.append("format {} 1.0".format("binary_little_endian" if encoding == "binary" else "ascii"))
+    header.append("element vertex {}".format(len(vert)))
+    for name, dtype in fields:
+        header.append("property {} {}".format(PLY_TYPES[np.dtype(dtype).str[1:]], name))
+
+    if faces is not None:
+        face = np.empty(len(faces), dtype=[("count", "u1"), ("index", "<i4", (3,))])
+        face["count"] = 3
+        face["index"] = faces
+
+        header.append("element face {}".format(len(face)))
+        header.append("property list uchar int vertex_indices")
+
+    header.append("end_header\n")
+
     with open(output_dir, "wb") as fout:
-        fout.write(res)
+        fout.write("\n".join(header).encode("ascii"))
+
+        if encoding == "binary":
+            fout.write(vert.tobytes())
+            if faces is not None:
+                fout.write(face.tobytes())
+        else:
+            fmt = ["%d" if np.dtype(dtype).kind == "u" else "%.9g" for _, dtype in fields]
+            np.savetxt(fout, np.column_stack(columns), fmt=fmt)
+            if faces is not None:
+                np.savetxt(fout, np.column_stack([face["count"], faces]), fmt="%d")
+
+
+def export_trimesh_to_ply(mesh, output_dir, encoding="binary"):
+    export_mesh_to_ply(mesh, output_dir, encoding)
 
 
 def to_o3d_pcd(data):
+    import open3d as o3d
+
     pcd = o3d.geometry.PointCloud()
     pcd.points = o3d.utility.Vector3dVector(data[:,:3])
     pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamKNN(20))
@@ -62,6 +141,8 @@ def to_o3d_pcd(data):
 
 
 def to_o3d_color_pcd(data):
+    import open3d as o3d
+
     pcd = o3d.geometry.PointCloud()
     pcd.points = o3d.utility.Vector3dVector(data[:,:3])
     pcd.colors = o3d.utility.Vector3dVector(data[:, 3:6])
@@ -72,10 +153,14 @@ def to_o3d_color_pcd(data):
 
 
 def show_o3d_object(pcd):
+    import open3d as o3d
+
     o3d.visualization.draw_geometries([pcd])
 
 
 def o3d_pcd_to_mesh(pcd):
+    import open3d as o3d
+
     distances = pcd.compute_nearest_neighbor_distance()
     avg_dist = np.mean(distances)
     radius = 3 * avg_dist
@@ -106,10 +191,19 @@ def to_color_trimesh_pcd(points):
     return pcd
 
 
-def export_mesh_to_ply(mesh, output_dir):
-    res = trimesh.exchange.ply.export_ply(mesh, encoding='ascii', vertex_normal=True)
-    with open(output_dir, "wb") as fout:
-        fout.write(res)
+def export_mesh_to_ply(mesh, output_dir, encoding="binary"):
+    """Export a trimesh.Trimesh (with vertex normals) or a
+    trimesh.PointCloud to PLY, see write_ply()"""
+    if isinstance(mesh, trimesh.PointCloud):
+        colors = mesh.colors if len(mesh.colors) > 0 else None
+        write_ply(output_dir, mesh.vertices, colors=colors, encoding=encoding)
+        return
+
+    colors = None
+    if mesh.visual.kind == "vertex":
+        colors = mesh.visual.vertex_colors
+
+    write_ply(output_dir, mesh.vertices, mesh.faces, mesh.vertex_normals, colors, encoding)
 
 
 def save_json(dic, output_dir):
@@ -1,10 +1,8 @@
 
 import trimesh
-from matplotlib.pyplot import cm
 import random
 
 import numpy as np
-import igraph as ig
 
 from part2cad.utils import mkdir
 
@@ -14,6 +12,10 @@ def create_palette(labels, shuffle=False):
     if shuffle:
         random.shuffle(labels)
 
+    # matplotlib and igraph are imported on first use, they dominate the
+    # import time of the package
+    from matplotlib import cm
+
     colors = cm.rainbow(np.linspace(0, 1, len(labels)))
 
     palette = dict()
@@ -87,6 +89,8 @@ def show_nx_graph(nxg):
     Args:
         nxg (networkx.Graph): Graph object
     """
+    import igraph as ig
+
     node_set = set(nxg.nodes)
     for e in nxg.edges:
         if e[1] in node_set:
@@ -0,0 +1,286 @@
+import os
+import time
+import shutil
+from functools import partial
+
+from part2cad.core import CadScene, fit_object
+from part2cad.constants import ASSET_DIR, SCENE_GRAPH_FILE, SCENE_GRAPH_NPZ_FILE
+from part2cad.loader import DirectoryBackend, BACKGROUND_NPY_FILE, OBJECT_LOADERS, load_background
+from part2cad.utils import mkdir
+
+
+# temporary folder in the output directory, graphs are written there
+# then moved in place
+WATCH_TMP_DIR = ".watch_tmp"
+
+
+def folder_signature_(folder):
+    """Names, sizes and modification times of the files in a folder"""
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return None
+
+    sig = []
+    for e in entries:
+        if e.is_file():
+            st = e.stat()
+            sig.append( (e.name, st.st_size, st.st_mtime_ns) )
+
+    return tuple(sorted(sig))
+
+
+def file_signature_(file):
+    try:
+        st = os.stat(file)
+    except FileNotFoundError:
+        return None
+
+    return (st.st_size, st.st_mtime_ns)
+
+
+class SceneWatcher(object):
+
+    def __init__(self, scene_root, loader_mode, output_dir, fit_fn=None, bundle=None, dedup=False,
+            graph_format="json", bg_voxel=None):
+        """Convert a scene directory while it is being written
+
+        The scene root is polled for object folders. A folder is complete
+        once its files are unchanged between two polls and its points load;
+        it is then fitted and added to the scene, its meshes are saved and
+        the scene graph is rewritten. Objects whose files change later are
+        fitted again and replaced, objects whose folder disappears are
+        removed. The background is added once it is complete.
+
+        The scene graph is written atomically, readers never see a partial
+        file.
+
+        Args:
+            scene_root (str): watched scene directory
+            loader_mode (str): "gt" or "snet"
+            output_dir (str): output scene directory
+            fit_fn (callable): fit_fn(obj_points, object_idx, prior=...) ->
+                (PartGraph, mesh states), defaults to fit_object(); the
+                mesh states of the last fit of an object are its prior
+                when it is fitted again
+            bundle (str): None or "object", see KinoGraph.save()
+            dedup (bool): see KinoGraph.save()
+            graph_format (str): see KinoGraph.save_graph()
+            bg_voxel (float): see load_background()
+        """
+        if bundle not in [None, "object"]:
+            raise Exception("Watch mode does not support mesh bundle mode: `{}`".format(bundle))
+
+        self.scene_root_ = scene_root
+        self.backend_ = DirectoryBackend(scene_root)
+        self.loader_ = OBJECT_LOADERS[loader_mode]
+        self.fit_fn_ = fit_fn or partial(fit_object, enable_scale=True)
+
+        self.output_dir_ = output_dir
+        self.asset_dir_ = "{}/{}".format(output_dir, ASSET_DIR)
+        self.bundle_ = bundle
+        self.dedup_ = dedup
+        self.graph_format_ = graph_format
+        self.bg_voxel_ = bg_voxel
+
+        self.scene_ = CadScene(bundle=bundle, dedup=dedup)
+        self.n_objects_ = 0
+
+        # object name -> object index in the scene
+        self.object_idx_ = dict()
+        # object name -> signature when last processed
+        self.processed_ = dict()
+        # object name -> signature at the previous poll
+        self.pending_ = dict()
+        # object name -> mesh states of the last fit
+        self.priors_ = dict()
+
+        self.bg_pending_ = None
+        self.has_background_ = False
+
+        mkdir(output_dir)
+
+
+    @property
+    def scene(self):
+        return self.scene_
+
+
+    def poll(self):
+        """Process the objects completed since the last poll
+
+        Returns:
+            int: number of objects added, updated or removed
+        """
+        n_changes = self.poll_background_()
+
+        obj_names = self.backend_.list_objects()
+
+        for obj_name in obj_names:
+            sig = folder_signature_(self.backend_.object_dir(obj_name))
+
+            if sig is None or len(sig) == 0 or sig == self.processed_.get(obj_name):
+                self.pending_.pop(obj_name, None)
+                continue
+
+            # still being written, check again at the next poll
+            if self.pending_.get(obj_name) != sig:
+                self.pending_[obj_name] = sig
+                continue
+
+            changed = self.process_object_(obj_name)
+            if changed is None:
+                continue
+
+            # failed objects are recorded too, retried once they change
+            self.processed_[obj_name] = sig
+            self.pending_.pop(obj_name)
+            if changed:
+                n_changes += 1
+
+        for obj_name in list(self.pending_.keys()):
+            if obj_name not in obj_names:
+                self.pending_.pop(obj_name)
+
+        for obj_name in list(self.object_idx_.keys()):
+            if obj_name not in obj_names:
+                self.remove_object_(obj_name)
+                n_changes += 1
+
+        if n_changes > 0:
+            self.save_graph_()
+
+        return n_changes
+
+
+    def poll_background_(self):
+        if self.has_background_:
+            return 0
+
+        sig = file_signature_(os.path.join(self.scene_root_, BACKGROUND_NPY_FILE))
+        if sig is None or sig != self.bg_pending_:
+            self.bg_pending_ = sig
+            return 0
+
+        try:
+            points = load_background(self.backend_, self.bg_voxel_)
+        except (OSError, ValueError, EOFError):
+            return 0
+
+        self.scene_.add_background(points)
+        for bg in self.scene_.backgrounds:
+            bg.save_mesh(self.asset_dir_)
+
+        self.has_background_ = True
+        print("[INFO] Added background")
+
+        return 1
+
+
+    def process_object_(self, obj_name):
+        """Fit an object and save its meshes
+
+        Returns:
+            bool: whether the scene changed, None if the points do not load
+                yet
+        """
+        try:
+            obj_points = self.loader_(self.backend_, obj_name)
+        except (OSError, ValueError, EOFError):
+            return None
+
+        start = time.time()
+        changed = False
+
+        # a failing object must not stop the watcher, it is tried again
+        # once its folder changes
+        try:
+            if obj_name in self.object_idx_:
+                object_idx = self.object_idx_[obj_name]
+                pg, mesh_states = self.fit_fn_(obj_points, object_idx, prior=self.priors_.get(obj_name))
+
+                delta = self.scene_.replace_object_graph(object_idx, pg)
+                changed = True
+                self.remove_files_(delta["removed_files"])
+                action = "Updated"
+            else:
+                # objects are only added here, indices follow the scene slots
+                object_idx = self.n_objects_
+                pg, mesh_states = self.fit_fn_(obj_points, object_idx)
+
+                self.scene_.add_object_graph(pg)
+                changed = True
+                self.object_idx_[obj_name] = object_idx
+                self.n_objects_ += 1
+                action = "Added"
+
+            # with dedup, this assigns the content ids saved in the graph
+            pg.save_mesh(self.asset_dir_, bundle=self.bundle_ == "object", dedup=self.dedup_)
+        except Exception as e:
+            print("[ERROR] Failed to process object `{}`: {}".format(obj_name, e))
+            return changed
+
+        # reused results (shape library) come without mesh states
+        if mesh_states is not None:
+            self.priors_[obj_name] = mesh_states
+
+        print("[INFO] {} object {} ({}) in {:.2f}s".format(action, object_idx, obj_name, time.time() - start))
+
+        return True
+
+
+    def remove_object_(self, obj_name):
+        object_idx = self.object_idx_.pop(obj_name)
+        self.processed_.pop(obj_name, None)
+        self.priors_.pop(obj_name, None)
+
+        delta = self.scene_.remove_object(object_idx)
+        self.remove_files_(delta["removed_files"])
+
+        print("[INFO] Removed object {} ({})".format(object_idx, obj_name))
+
+
+    def remove_files_(self, names):
+        for name in names:
+            asset_file = "{}/{}".format(self.asset_dir_, name)
+            if os.path.isfile(asset_file):
+                os.remove(asset_file)
+
+
+    def save_graph_(self):
+        tmp_dir = "{}/{}".format(self.output_dir_, WATCH_TMP_DIR)
+        graph_file = SCENE_GRAPH_NPZ_FILE if self.graph_format_ == "npz" else SCENE_GRAPH_FILE
+
+        # content ids were assigned as each object was saved, only the
+        # changed objects are hashed, see process_object_()
+        kgraph = self.scene_.create_kino_graph()
+        kgraph.save(tmp_dir, save_mesh=False, graph_format=self.graph_format_)
+
+        # same file system, the rename is atomic
+        os.replace("{}/{}".format(tmp_dir, graph_file), "{}/{}".format(self.output_dir_, graph_file))
+
+
+    def run(self, interval=1.0, idle_exit=None):
+        """Poll until interrupted
+
+        Args:
+            interval (float): seconds between two polls
+            idle_exit (float): stop after this many seconds without changes,
+                None to run until interrupted
+        """
+        last_change = time.time()
+
+        try:
+            while True:
+                if self.poll() > 0:
+                    last_change = time.time()
+                elif idle_exit is not None and time.time() - last_change > idle_exit:
+                    break
+
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            shutil.rmtree("{}/{}".format(self.output_dir_, WATCH_TMP_DIR), ignore_errors=True)
+
+        print("[INFO] Stopped watching, {} objects in the scene".format(len(self.object_idx_)))
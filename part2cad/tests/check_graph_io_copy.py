@@ -0,0 +1,57 @@
+import os
+import sys
+import ast
+
+
+PART2CAD_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GRAPH_IO_FILES = [
+    os.path.join(PART2CAD_ROOT, "part2cad", "graph_io.py"),
+    os.path.join(os.path.dirname(PART2CAD_ROOT), "scene_builder", "scripts", "graph_io.py")
+]
+
+# module level names both copies share, docstrings aside
+SHARED_NAMES = ["GRAPH_NPZ_VERSION", "load_graph_npz"]
+
+
+def shared_part(graph_io_file):
+    with open(graph_io_file, "r") as fin:
+        module = ast.parse(fin.read(), graph_io_file)
+
+    part = dict()
+    for node in module.body:
+        if isinstance(node, ast.FunctionDef) and node.name in SHARED_NAMES:
+            body = node.body[1:] if ast.get_docstring(node) is not None else node.body
+            part[node.name] = (ast.dump(node.args), [ast.dump(n) for n in body])
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id in SHARED_NAMES:
+                    part[target.id] = ast.dump(node.value)
+
+    missing = [name for name in SHARED_NAMES if name not in part]
+    if len(missing) > 0:
+        raise Exception("`{}` does not define `{}`".format(graph_io_file, ", ".join(missing)))
+
+    return part
+
+
+#################################################################
+# Check that the scene_builder copy of the binary graph reader keeps
+# the code of part2cad/graph_io.py
+#
+#   python tests/check_graph_io_copy.py
+#################################################################
+if __name__ == "__main__":
+    parts = [shared_part(f) for f in GRAPH_IO_FILES]
+
+    differ = [name for name in SHARED_NAMES if parts[0][name] != parts[1][name]]
+    if len(differ) == 0:
+        print("[OK] Binary graph readers are identical ({})".format(", ".join(SHARED_NAMES)))
+        sys.exit(0)
+
+    for name in differ:
+        print("[FAIL] `{}` differs between the graph readers:".format(name))
+        print("    {}".format(GRAPH_IO_FILES[0]))
+        print("    {}".format(GRAPH_IO_FILES[1]))
+
+    sys.exit(1)
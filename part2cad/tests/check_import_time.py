@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import subprocess
+
+
+# optional dependencies that must only load on first use
+DEFERRED_MODULES = ["pymeshlab", "open3d", "sklearn", "matplotlib", "cv2"]
+
+PART2CAD_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENE_BUILDER_SCRIPTS = os.path.join(os.path.dirname(PART2CAD_ROOT), "scene_builder", "scripts")
+
+CHECKS = [
+    # (python path, statement, deferred modules)
+    (PART2CAD_ROOT, "import part2cad.core, part2cad.geom, part2cad.utils, part2cad.loader", DEFERRED_MODULES),
+    (PART2CAD_ROOT, "import part2cad.visualization", DEFERRED_MODULES + ["igraph"]),
+    # igraph holds the scene graph and loads matplotlib for its drawing
+    (SCENE_BUILDER_SCRIPTS, "import xacro_scene_builder", ["pymeshlab", "open3d", "sklearn", "cv2"]),
+]
+
+
+def measure_import(python_path, statement):
+    """Import in a fresh interpreter
+
+    Returns:
+        float: import time in seconds
+        list of str: names of the loaded top-level modules
+    """
+    code = "\n".join([
+        "import sys, time, json",
+        "start = time.perf_counter()",
+        statement,
+        "elapsed = time.perf_counter() - start",
+        "print(json.dumps([elapsed, sorted(set(m.split('.')[0] for m in sys.modules))]))"
+    ])
+
+    env = dict(os.environ, PYTHONPATH=python_path)
+    out = subprocess.check_output([sys.executable, "-c", code], env=env, cwd=python_path)
+    elapsed, modules = json.loads(out.decode().strip().splitlines()[-1])
+
+    return elapsed, modules
+
+
+#################################################################
+# Import-time regression check: heavy optional dependencies stay
+# unloaded until used, and imports stay under a time budget
+#
+#   python tests/check_import_time.py [budget in seconds, default 2]
+#################################################################
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+
+    failed = False
+    for python_path, statement, deferred in CHECKS:
+        try:
+            elapsed, modules = measure_import(python_path, statement)
+        except subprocess.CalledProcessError:
+            print("[ERROR] `{}` failed".format(statement))
+            failed = True
+            continue
+
+        loaded = [m for m in deferred if m in modules]
+
+        status = "OK"
+        if len(loaded) > 0 or elapsed > budget:
+            status = "FAIL"
+            failed = True
+
+        print("[{}] `{}` in {:.2f}s".format(status, statement, elapsed))
+        if len(loaded) > 0:
+            print("    loaded at import: {}".format(", ".join(loaded)))
+
+    sys.exit(1 if failed else 0)
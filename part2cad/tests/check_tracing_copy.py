@@ -0,0 +1,47 @@
+import os
+import sys
+
+
+PART2CAD_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRACING_FILES = [
+    os.path.join(PART2CAD_ROOT, "part2cad", "tracing.py"),
+    os.path.join(os.path.dirname(PART2CAD_ROOT), "scene_builder", "scripts", "tracing.py")
+]
+
+# first line of the part both copies share
+SHARED_MARKER = "# ---- shared part:"
+
+
+def shared_part(tracing_file):
+    with open(tracing_file, "r") as fin:
+        lines = fin.readlines()
+
+    starts = [i for i, l in enumerate(lines) if l.startswith(SHARED_MARKER)]
+    if len(starts) != 1:
+        raise Exception("`{}` has no shared part marker".format(tracing_file))
+
+    return lines[starts[0]:]
+
+
+#################################################################
+# Check that the scene_builder copy of the tracing module keeps the
+# shared part of part2cad/tracing.py
+#
+#   python tests/check_tracing_copy.py
+#################################################################
+if __name__ == "__main__":
+    parts = [shared_part(f) for f in TRACING_FILES]
+
+    if parts[0] == parts[1]:
+        print("[OK] Shared part of the tracing modules is identical ({} lines)".format(len(parts[0])))
+        sys.exit(0)
+
+    for i, (a, b) in enumerate(zip(parts[0] + [""] * len(parts[1]), parts[1] + [""] * len(parts[0]))):
+        if a != b:
+            print("[FAIL] Tracing modules differ at shared line {}:".format(i + 1))
+            print("    {}: {}".format(TRACING_FILES[0], a.rstrip()))
+            print("    {}: {}".format(TRACING_FILES[1], b.rstrip()))
+            break
+
+    sys.exit(1)
@@ -28,7 +28,9 @@ MESHLAB_TEXTURE_FILE_TEMPLATE = "{}_texture.png"
 
 
 SCENE_PG_FILENAME = "kino_graph.json"
+SCENE_PG_NPZ_FILENAME = "kino_graph.npz"
 SCENE_SEGMENTS_DIR = "assets"
+MESH_BUNDLE_PATTERN = "bundle*.npz"
 
 MAIN_XACRO_FILENAME = "main.xacro"
 RIGIT_OBJ_XACRO_FILENAME = "rigid_objects.xacro"
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+from utils import load_json
+
+
+#################################################################
+# Reader of the binary kinematic graph written by part2cad, see
+# part2cad/graph_io.py for the layout. Kept in sync by hand since the
+# scene builder does not depend on part2cad, checked by
+# part2cad/tests/check_graph_io_copy.py.
+#################################################################
+GRAPH_NPZ_VERSION = 1
+
+
+def load_graph_npz(graph_file):
+    """
+    Load a binary graph into the same dictionary as kino_graph.json
+
+    @param graph_file (string): kino_graph.npz
+    @return (dict) the graph with "edges", "nodes" and "root_id"
+    """
+    with np.load(graph_file, allow_pickle=False) as data:
+        if int(data["version"]) != GRAPH_NPZ_VERSION:
+            raise Exception("Unsupported graph version: `{}`".format(int(data["version"])))
+
+        schema = json.loads(str(data["schema"]))
+        strings = data["strings"].tolist()
+
+        columns = []
+        for key, kind in schema:
+            col = data["col:" + key]
+
+            if kind in ["int", "float"]:
+                present = data["mask:" + key]
+                values = col.tolist()
+            elif kind == "vec":
+                length = data["len:" + key]
+                present = length >= 0
+                values = [row[:l] for row, l in zip(col.tolist(), length.tolist())]
+            else:
+                present = col >= 0
+                values = [strings[i] for i in col.tolist()]
+                if kind == "json":
+                    values = [json.loads(v) if p else None for v, p in zip(values, present)]
+
+            columns.append( (key, present.tolist(), values) )
+
+        n = len(columns[0][1]) if len(columns) > 0 else 0
+        nodes = [dict() for _ in range(n)]
+
+        for key, present, values in columns:
+            for i in range(n):
+                if present[i]:
+                    nodes[i][key] = values[i]
+
+        gjson = {
+            "edges": [{"dst_id": int(d), "src_id": int(s)} for s, d in data["edges"].tolist()],
+            "nodes": nodes,
+            "root_id": int(data["root_id"])
+        }
+
+    return gjson
+
+
+def load_graph(graph_file):
+    """
+    Load a kinematic graph saved as .json or .npz
+    """
+    if graph_file.endswith(".npz"):
+        return load_graph_npz(graph_file)
+
+    return load_json(graph_file)
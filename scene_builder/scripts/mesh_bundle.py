@@ -0,0 +1,112 @@
+import os
+import sys
+import glob
+
+import numpy as np
+
+from global_settings import MESH_BUNDLE_PATTERN
+from utils import print_info
+
+
+# binary STL triangle record
+STL_TRIANGLE_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attr", "<u2")
+])
+
+
+def write_binary_stl(file_out, vertices, faces):
+    """
+    Write a triangle mesh as binary STL with a single structured array
+
+    @param file_out (string): output .stl file
+    @param vertices ((n, 3) np.ndarray): vertex positions
+    @param faces ((m, 3) np.ndarray): triangle vertex indices
+    """
+    tri = vertices[faces].astype(np.float32)
+
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(norm > 0, norm, 1)
+
+    data = np.zeros(len(faces), dtype=STL_TRIANGLE_DTYPE)
+    data["normal"] = normals
+    data["vertices"] = tri
+
+    with open(file_out, "wb") as fout:
+        fout.write(b"\0" * 80)
+        fout.write(np.uint32(len(faces)).tobytes())
+        fout.write(data.tobytes())
+
+
+class MeshBundleIndex(object):
+
+    def __init__(self, asset_dir):
+        """
+        Index of the part meshes stored in the bundles of an asset folder
+
+        Bundles are written by part2cad (`--bundle object|scene`), each one
+        holds the meshes of several nodes with their vertex / face ranges.
+
+        @param asset_dir (string): the asset folder of the input scene
+        """
+        self.bundles_ = dict()
+        self.index_ = dict()
+
+        for bundle_file in sorted(glob.glob("{}/{}".format(asset_dir, MESH_BUNDLE_PATTERN))):
+            # NpzFile reads an array on every access, load them once
+            with np.load(bundle_file) as npz:
+                data = {k: npz[k] for k in npz.files}
+            self.bundles_[bundle_file] = data
+
+            for k, cad_id in enumerate(data["ids"]):
+                self.index_[str(cad_id)] = (bundle_file, k)
+
+
+    def __contains__(self, cad_id):
+        return str(cad_id) in self.index_
+
+
+    def __len__(self):
+        return len(self.index_)
+
+
+    def get_mesh(self, cad_id):
+        """
+        @return (tuple): vertices (n, 3) and faces (m, 3) of the node mesh
+        """
+        bundle_file, k = self.index_[str(cad_id)]
+        data = self.bundles_[bundle_file]
+
+        vo, fo = data["vertex_offsets"], data["face_offsets"]
+
+        return data["vertices"][vo[k]:vo[k + 1]], data["faces"][fo[k]:fo[k + 1]]
+
+
+    def dump_stl(self, cad_id, file_out):
+        vertices, faces = self.get_mesh(cad_id)
+        write_binary_stl(file_out, vertices, faces)
+
+
+def unpack_mesh_bundles(asset_dir, output_dir):
+    """
+    Unpack every bundle of an asset folder into `<cad_id>.stl` files
+    """
+    bundles = MeshBundleIndex(asset_dir)
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    for cad_id in bundles.index_.keys():
+        bundles.dump_stl(cad_id, "{}/{}.stl".format(output_dir, cad_id))
+
+    print_info("[INFO] Unpacked {} meshes at {}".format(len(bundles), output_dir))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python mesh_bundle.py <asset-dir> <output-dir>")
+        exit(1)
+
+    unpack_mesh_bundles(sys.argv[1], sys.argv[2])
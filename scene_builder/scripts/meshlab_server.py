@@ -1,11 +1,16 @@
 import sys
 import os
 
-import pymeshlab
+import numpy as np
 
+from ply_io import read_ply_arrays
 from global_settings import VERTEX_TO_FACE_TEXTURE_DIM
 from global_settings import MESHLAB_TEXTURE_FILE_TEMPLATE
 from utils import print_warn, print_err, print_info
+from tracing import span
+
+# pymeshlab is imported by the methods, it is slow to load and only
+# needed once meshes are converted
 
 
 class MeshlabServer(object):
@@ -14,7 +19,10 @@ class MeshlabServer(object):
         pass
 
 
+    @span("MeshlabServer.convert_obj_to_dae")
     def convert_obj_to_dae(self, file_in, file_out):
+        import pymeshlab
+
         # convert to absolute path
         abs_file_in = os.path.abspath(file_in)
         abs_file_out = os.path.abspath(file_out)
@@ -32,20 +40,69 @@ class MeshlabServer(object):
             raise
     
 
+    def load_ply_(self, ms, file_in):
+        """Load a PLY point cloud with the numpy reader, much faster than
+        meshlab's own importer on large binary clouds"""
+        vertices, faces, colors = read_ply_arrays(file_in)
+        self.add_arrays_(ms, vertices, faces, colors)
+
+
+    def add_arrays_(self, ms, vertices, faces=None, colors=None):
+        """
+        @param vertices ((n, 3) np.ndarray): vertex positions
+        @param faces ((m, 3) np.ndarray): triangle indices, None for a point cloud
+        @param colors ((n, 4) np.ndarray): uint8 RGBA vertex colors or None
+        """
+        import pymeshlab
+
+        kwargs = {"vertex_matrix": np.asarray(vertices, dtype=np.float64)}
+        if faces is not None:
+            kwargs["face_matrix"] = faces
+        if colors is not None:
+            kwargs["v_color_matrix"] = np.asarray(colors).astype(np.float64) / 255.0
+
+        ms.add_mesh(pymeshlab.Mesh(**kwargs))
+
+
+    @span("MeshlabServer.convert_pc_to_obj")
     def convert_pc_to_obj(self, file_in, file_out):
+        import pymeshlab
+
         # convert to absolute path
         abs_file_in = os.path.abspath(file_in)
+
+        ms = pymeshlab.MeshSet()
+        if abs_file_in.endswith(".ply"):
+            self.load_ply_(ms, abs_file_in)
+        else:
+            ms.load_new_mesh(abs_file_in)
+
+        self.reconstruct_to_obj_(ms, file_in, file_out)
+
+
+    @span("MeshlabServer.convert_points_to_obj")
+    def convert_points_to_obj(self, vertices, colors, file_out, name="points"):
+        """
+        Same as convert_pc_to_obj() for a point cloud held in memory
+
+        @param vertices ((n, 3) np.ndarray): point positions
+        @param colors ((n, 4) np.ndarray): uint8 RGBA point colors or None
+        @param file_out (string): output .obj file
+        @param name (string): name of the point cloud in the messages
+        """
+        import pymeshlab
+
+        ms = pymeshlab.MeshSet()
+        self.add_arrays_(ms, vertices, None, colors)
+
+        self.reconstruct_to_obj_(ms, name, file_out)
+
+
+    def reconstruct_to_obj_(self, ms, file_in, file_out):
         abs_file_out = os.path.abspath(file_out)
-        
-        # ditrectory configuration
-        input_dir = "/".join(abs_file_in.split("/")[:-1])
         output_dir = "/".join(abs_file_out.split("/")[:-1])
-        filename = file_out.split("/")[-1].split('.')[0]
-        
-        tmp_fileout = "{}/tmp.obj".format(output_dir)
 
-        ms = pymeshlab.MeshSet()
-        ms.load_new_mesh(abs_file_in)
+        tmp_fileout = "{}/tmp.obj".format(output_dir)
 
         print("Processing `{}` ply to obj, waiting...".format(file_in))
 
@@ -71,7 +128,10 @@ class MeshlabServer(object):
             raise
 
 
+    @span("MeshlabServer.convert_ply_to_obj")
     def convert_ply_to_obj(self, file_in, file_out, verbose=True):
+        import pymeshlab
+
         # convert to absolute path
         abs_file_in = os.path.abspath(file_in)
         abs_file_out = os.path.abspath(file_out)
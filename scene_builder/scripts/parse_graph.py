@@ -1,8 +1,6 @@
 import igraph as ig
-import cv2
 
-
-from utils import load_json
+from graph_io import load_graph
 
 
 COLOR_DICT = {
@@ -13,8 +11,16 @@ COLOR_DICT = {
 
 class ParseGraph(object):
 
-    def __init__(self, json_file):
-        self.g_, self.root_id_ = self.parse_(load_json(json_file))
+    def __init__(self, graph):
+        """
+        @param graph (string or dict): kinematic graph saved by part2cad,
+            either kino_graph.json or the binary kino_graph.npz, or the
+            graph itself as returned by KinoGraph.dump(), re-indexed in place
+        """
+        if isinstance(graph, dict):
+            self.g_, self.root_id_ = self.parse_(graph)
+        else:
+            self.g_, self.root_id_ = self.parse_(load_graph(graph))
 
 
     def __str__(self):
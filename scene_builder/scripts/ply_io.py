@@ -0,0 +1,157 @@
+import numpy as np
+
+
+# ply property type -> numpy dtype
+PLY_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2",
+    "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4",
+    "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4",
+    "double": "f8", "float64": "f8"
+}
+
+PLY_FORMATS = {
+    "binary_little_endian": "<",
+    "binary_big_endian": ">",
+    "ascii": None
+}
+
+
+def read_ply_header_(fin):
+    """Parse the header and leave `fin` at the start of the body
+
+    Returns:
+        str: byte order, None for ascii
+        list: (element name, count, [(property, type, list count type)])
+    """
+    if fin.readline().strip() != b"ply":
+        raise Exception("Not a PLY file: `{}`".format(fin.name))
+
+    byte_order, elements = None, []
+
+    while True:
+        line = fin.readline()
+        if len(line) == 0:
+            raise Exception("Unexpected end of PLY header: `{}`".format(fin.name))
+
+        tokens = line.decode("ascii").split()
+        if len(tokens) == 0 or tokens[0] in ["comment", "obj_info"]:
+            continue
+
+        if tokens[0] == "format":
+            if tokens[1] not in PLY_FORMATS:
+                raise Exception("Does not support PLY format: `{}`".format(tokens[1]))
+            byte_order = PLY_FORMATS[tokens[1]]
+        elif tokens[0] == "element":
+            elements.append( (tokens[1], int(tokens[2]), []) )
+        elif tokens[0] == "property":
+            if tokens[1] == "list":
+                elements[-1][2].append( (tokens[4], PLY_TYPES[tokens[3]], PLY_TYPES[tokens[2]]) )
+            else:
+                elements[-1][2].append( (tokens[2], PLY_TYPES[tokens[1]], None) )
+        elif tokens[0] == "end_header":
+            return byte_order, elements
+
+
+def read_binary_element_(buf, offset, byte_order, count, props):
+    """Read one element, list properties must have a constant length,
+    which holds for the triangle meshes and point clouds we export"""
+    fields = []
+
+    for name, dtype, count_dtype in props:
+        if count_dtype is None:
+            fields.append( (name, byte_order + dtype) )
+            continue
+
+        # peek the length of the first list to lay out a fixed record
+        head = np.dtype([(n, byte_order + d) for n, d in fields] + [("n", byte_order + count_dtype)])
+        n = int(np.frombuffer(buf, dtype=head, count=1, offset=offset)["n"][0]) if count > 0 else 0
+
+        fields.append( (name + "_count", byte_order + count_dtype) )
+        fields.append( (name, byte_order + dtype, (n,)) )
+
+    dtype = np.dtype(fields)
+    data = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+
+    for name, _, count_dtype in props:
+        if count_dtype is not None and count > 0:
+            if np.any(data[name + "_count"] != data[name + "_count"][0]):
+                raise Exception("Does not support PLY lists of varying length: `{}`".format(name))
+
+    return data, offset + dtype.itemsize * count
+
+
+def read_ply(ply_file):
+    """Read a PLY file into numpy arrays
+
+    Binary files are read with one np.frombuffer() call per element.
+
+    Args:
+        ply_file (str): PLY file, binary or ascii
+
+    Returns:
+        dict: element name -> structured np.ndarray, list properties are
+            (count, n) sub-arrays
+    """
+    with open(ply_file, "rb") as fin:
+        byte_order, elements = read_ply_header_(fin)
+        body = fin.read()
+
+    result = dict()
+
+    if byte_order is not None:
+        offset = 0
+        for name, count, props in elements:
+            result[name], offset = read_binary_element_(body, offset, byte_order, count, props)
+        return result
+
+    lines = body.decode("ascii").split("\n")
+    start = 0
+    for name, count, props in elements:
+        rows = np.array([l.split() for l in lines[start:start + count]], dtype="f8")
+        start += count
+
+        fields, col = [], 0
+        for prop, dtype, count_dtype in props:
+            if count_dtype is None:
+                fields.append( (prop, dtype, rows[:, col]) )
+                col += 1
+            else:
+                n = int(rows[0, col]) if count > 0 else 0
+                fields.append( (prop, dtype, rows[:, col + 1:col + 1 + n]) )
+                col += 1 + n
+
+        data = np.empty(count, dtype=[(f, d) if v.ndim == 1 else (f, d, (v.shape[1],)) for f, d, v in fields])
+        for prop, _, v in fields:
+            data[prop] = v
+        result[name] = data
+
+    return result
+
+
+def read_ply_arrays(ply_file):
+    """Read a PLY mesh or point cloud
+
+    Returns:
+        (n, 3) np.ndarray: vertices
+        (m, 3) np.ndarray or None: faces
+        (n, 4) np.ndarray or None: uint8 RGBA vertex colors
+    """
+    data = read_ply(ply_file)
+    vert = data["vertex"]
+
+    vertices = np.column_stack([vert["x"], vert["y"], vert["z"]]).astype("f8")
+
+    faces = None
+    if "face" in data:
+        faces = data["face"]["vertex_indices"].astype("i4")
+
+    colors = None
+    if "red" in vert.dtype.names:
+        alpha = vert["alpha"] if "alpha" in vert.dtype.names else np.full(len(vert), 255)
+        colors = np.column_stack([vert["red"], vert["green"], vert["blue"], alpha]).astype("u1")
+
+    return vertices, faces, colors
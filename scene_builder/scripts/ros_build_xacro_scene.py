@@ -6,6 +6,7 @@ import rospy
 from xacro_scene_builder import XacroSceneBuilder
 from scene_builder_config import SceneBuilderConfig
 from utils import print_warn, print_info, print_ok, print_err
+from tracing import start_trace, finish_trace
 
 
 def build_xacro_scene(config):
@@ -24,6 +25,7 @@ if __name__ == "__main__":
     enable_vrgym = rospy.get_param("~enable_vrgym")
     enable_physics = rospy.get_param("~enable_physics")
     enable_gazebo = rospy.get_param("~enable_gazebo")
+    trace_file = rospy.get_param("~trace_file", "")
 
     config = SceneBuilderConfig(
         input_scene_dir=input_scene_dir,
@@ -39,4 +41,10 @@ if __name__ == "__main__":
     print(config)
     input("Press <Enter> to continue...")
 
-    build_xacro_scene(config)
+    if trace_file != "":
+        start_trace(trace_file)
+
+    try:
+        build_xacro_scene(config)
+    finally:
+        finish_trace()
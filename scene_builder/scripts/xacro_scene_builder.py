@@ -1,5 +1,6 @@
 import os
 import sys
+import shutil
 
 # import trimesh
 # import open3d as o3d
@@ -7,12 +8,14 @@ import sys
 from xacro_scene import XacroScene
 from parse_graph import ParseGraph
 from meshlab_server import MeshlabServer
+from mesh_bundle import MeshBundleIndex
 from db_loader import DbLoader
 from utils import arg_parser
 from utils import print_ok, print_warn, print_info, print_err
 from obj_type import ObjType
+from tracing import span
 
-from global_settings import SCENE_PG_FILENAME
+from global_settings import SCENE_PG_FILENAME, SCENE_PG_NPZ_FILENAME
 from global_settings import SCENE_SEGMENTS_DIR
 
 from global_settings import MAIN_XACRO_FILENAME
@@ -30,19 +33,42 @@ class XacroSceneBuilder(object):
 
     def __init__(self):
         self.meshlab_ = MeshlabServer()
+        self.meshes_ = None
 
 
-    def generate(self, config):
+    @span("XacroSceneBuilder.generate")
+    def generate(self, config, graph=None, meshes=None):
+        """
+        Generate the xacro scene
+
+        By default the kinematic graph and the meshes are read from the
+        scene saved by part2cad in `config.input_scene_dir`. A converted
+        scene can be handed over in memory instead, then nothing is read
+        from the input directory and the meshes are written once, into the
+        output scene.
+
+        @param config (SceneBuilderConfig): builder configuration
+        @param graph (dict): kinematic graph as returned by KinoGraph.dump()
+        @param meshes (dict): asset name (cad id of the part meshes, node id
+            of the background point clouds) -> trimesh.Trimesh or
+            trimesh.PointCloud, required with `graph`
+        """
         self.config_ = config
+        self.meshes_ = meshes
 
-        pg = ParseGraph(self.get_pg_file_(self.config_.input_scene_dir))
+        with span("ParseGraph"):
+            if graph is None:
+                pg = ParseGraph(self.get_pg_file_(self.config_.input_scene_dir))
+            else:
+                pg = ParseGraph(graph)
 
         xscene = XacroScene(self.config_.output_dir_name, SCENE_BUILDER_OUTPUT_DIR, pg, 
             self.config_.enable_physics, self.config_.enable_gazebo)
 
         self.add_to_scene_(xscene, pg, pg.get_root_idx())
 
-        saved_dir = xscene.save(self.config_.scene_builder_root)
+        with span("XacroScene.save"):
+            saved_dir = xscene.save(self.config_.scene_builder_root)
 
         # if scene xacro files are succesfully saved
         if saved_dir != "":
@@ -127,6 +153,7 @@ class XacroSceneBuilder(object):
                 fout.write("{},{},{},{}\n".format(link_name, mesh_dir, mesh_filename, scale))
 
 
+    @span("XacroSceneBuilder.dump_scaled_mesh")
     def dump_scaled_mesh_(self, link_to_mesh, out_dir):
         """
         Dump pre-scaled mesh file VRGym
@@ -161,28 +188,56 @@ class XacroSceneBuilder(object):
                 # print("[INFO] Save scaled mesh at: {}".format(out_mesh_dir))
 
 
+    @span("XacroSceneBuilder.dump_rigid_files")
     def dump_rigid_files_(self, dst_rigid_files):
         if len(dst_rigid_files) == 0:
             return
+
+        if self.meshes_ is not None:
+            self.dump_rigid_meshes_(dst_rigid_files)
+            return
         
         src_dir = self.config_.rigid_mesh_db
 
-        for file in dst_rigid_files:
+        # meshes saved as bundles by part2cad are unpacked on the fly
+        bundles = MeshBundleIndex(src_dir)
+
+        # parts sharing a content-addressed mesh point to the same file
+        for file in list(dict.fromkeys(dst_rigid_files)):
             filename = file.split('/')[-1].split('.')[0]
 
             # output dir wrt to scene_builder
             output_root_dir = "/".join(file.split('/')[:-1])
             
             abs_output_root_dir = "{}/{}".format(self.config_.scene_builder_root, output_root_dir)
+            file_in = "{}/{}.stl".format(src_dir, filename)
+            file_out = "{}/{}.stl".format(abs_output_root_dir, filename)
 
             print_info("[INFO] Copying rigid object `{}`".format(filename))
 
-            cmd = "cp {}/{}.stl {}".format(src_dir, filename, abs_output_root_dir)
-            if os.system(cmd) != 0:
+            if os.path.isfile(file_in):
+                shutil.copyfile(file_in, file_out)
+            elif filename in bundles:
+                bundles.dump_stl(filename, file_out)
+            else:
                 print_err("[ERROR] Fail to dump {}/{}".format(src_dir, filename))
                 exit(1)
 
 
+    @span("XacroSceneBuilder.dump_rigid_meshes")
+    def dump_rigid_meshes_(self, dst_rigid_files):
+        for file in list(dict.fromkeys(dst_rigid_files)):
+            filename = file.split('/')[-1].split('.')[0]
+            file_out = "{}/{}".format(self.config_.scene_builder_root, file)
+
+            if filename not in self.meshes_:
+                print_err("[ERROR] No mesh `{}` in the converted scene".format(filename))
+                exit(1)
+
+            print_info("[INFO] Writing rigid object `{}`".format(filename))
+            self.meshes_[filename].export(file_out)
+
+
     def dump_interactive_files_(self, dst_interactive_files):
         if len(dst_interactive_files) == 0:
             return
@@ -204,6 +259,7 @@ class XacroSceneBuilder(object):
                 exit(1)
 
 
+    @span("XacroSceneBuilder.dump_bgm_files")
     def dump_bgm_files_(self, dst_bgm_files):
         if len(dst_bgm_files) == 0:
             return
@@ -220,6 +276,11 @@ class XacroSceneBuilder(object):
             file_in = "{}/{}.ply".format(src_dir, mesh_filename)
             abs_file_out = "{}/{}".format(self.config_.scene_builder_root, file_out)
 
+            if self.meshes_ is not None:
+                pc = self.meshes_[mesh_filename]
+                self.meshlab_.convert_points_to_obj(pc.vertices, pc.colors, abs_file_out, mesh_filename)
+                continue
+
             self.meshlab_.convert_pc_to_obj(file_in, abs_file_out)
 
             # cmd = "cp -r {} {}".format(file_in, abs_file_out)
@@ -230,6 +291,7 @@ class XacroSceneBuilder(object):
         print_info("[INFO] Dumped background mesh files at {}".format(dump_bgm_dir))
 
     
+    @span("XacroSceneBuilder.dump_gazebo_pkg")
     def dump_gazebo_pkg_(self, scene_output_dir, bg_mesh_files):
         scene_name = scene_output_dir.split('/')[-1]
 
@@ -247,4 +309,17 @@ class XacroSceneBuilder(object):
 
 
     def get_pg_file_(self, scene_dir):
-        return "{}/{}".format(scene_dir, SCENE_PG_FILENAME)
\ No newline at end of file
+        """
+        Get the kinematic graph of the scene, the most recent one if it was
+        saved both as .json and as binary .npz
+        """
+        pg_files = [
+            "{}/{}".format(scene_dir, filename)
+            for filename in [SCENE_PG_FILENAME, SCENE_PG_NPZ_FILENAME]
+            if os.path.isfile("{}/{}".format(scene_dir, filename))
+        ]
+
+        if len(pg_files) == 0:
+            return "{}/{}".format(scene_dir, SCENE_PG_FILENAME)
+
+        return max(pg_files, key=os.path.getmtime)
\ No newline at end of file